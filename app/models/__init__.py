@@ -1,6 +1,8 @@
 from app.models.user import User
 from app.models.role import Role
 from app.models.postal_zone import PostalZone
+from app.models.postal_zone_range import PostalZoneRange
 from app.models.product import Product
+from app.models.import_job import ImportJob
 
-__all__ = ['User', 'Role', 'PostalZone', 'Product'] 
\ No newline at end of file
+__all__ = ['User', 'Role', 'PostalZone', 'PostalZoneRange', 'Product', 'ImportJob'] 
\ No newline at end of file
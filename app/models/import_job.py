@@ -0,0 +1,62 @@
+import json
+import uuid
+from app.extensions import db
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+
+class ImportJob(db.Model):
+    """后台导入任务
+
+    上传的文件在请求中保存后立即返回任务ID，由导入任务线程池解析和写入数据库，
+    任务状态、进度和结果保存在数据库中，多个 gunicorn 工作进程都可以查询。
+    """
+    __tablename__ = 'import_jobs'
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    # 尚未结束的状态
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    kind = db.Column(db.String(50), nullable=False, comment='导入类型')
+    status = db.Column(db.String(20), nullable=False, default=PENDING, comment='状态')
+    progress = db.Column(db.Integer, nullable=False, default=0, comment='进度百分比')
+    message = db.Column(db.String(255), nullable=True, comment='当前步骤')
+    file_name = db.Column(db.String(255), nullable=True, comment='文件名')
+    # 导入结果的JSON，产品导入的预览文本可能较大
+    result = db.Column(db.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=True, comment='导入结果')
+    error = db.Column(db.Text, nullable=True, comment='错误信息')
+    created_by = db.Column(db.Integer, nullable=True, comment='提交用户')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.status}>'
+
+    @property
+    def finished(self):
+        return self.status not in self.ACTIVE_STATUSES
+
+    def is_stale(self, timeout):
+        """未结束且超过 timeout 秒没有更新，说明执行任务的工作进程已经退出"""
+        return not self.finished and (datetime.now() - self.updated_at).total_seconds() > timeout
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'file_name': self.file_name,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
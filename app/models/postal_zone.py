@@ -10,7 +10,8 @@ class PostalZone(db.Model):
     end_code = db.Column(db.String(100), nullable=True, comment='结束邮编')
     zone_name = db.Column(db.String(100), nullable=True, comment='区域名称')
     type = db.Column(db.String(50), nullable=False, comment='类型')
-    excel_content = db.Column(db.Text, nullable=True, comment='Excel文件内容')
+    # 分区表内容可能有数MB，默认延迟加载，需要时用 undefer 显式加载
+    excel_content = db.deferred(db.Column(db.Text, nullable=True, comment='Excel文件内容'))
     file_name = db.Column(db.String(255), nullable=True, comment='文件名')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -18,15 +19,31 @@ class PostalZone(db.Model):
     def __repr__(self):
         return f'<PostalZone {self.id}>'
     
+    # 列表接口只需要的元数据列（不包含 excel_content）
+    METADATA_COLUMNS = ('id', 'start_code', 'end_code', 'zone_name', 'type', 'file_name', 'created_at', 'updated_at')
+
+    @classmethod
+    def list_metadata(cls, type=None):
+        """只查询元数据列的轻量列表，返回 to_dict 格式的字典列表"""
+        query = db.session.query(*[getattr(cls, column) for column in cls.METADATA_COLUMNS])
+        if type:
+            query = query.filter(cls.type == type)
+        return [cls.metadata_to_dict(row) for row in query.order_by(cls.start_code)]
+
+    @staticmethod
+    def metadata_to_dict(row):
+        """将记录或元数据查询结果行转换为字典"""
+        return {
+            'id': row.id,
+            'start_code': row.start_code,
+            'end_code': row.end_code,
+            'zone_name': row.zone_name,
+            'type': row.type,
+            'file_name': row.file_name,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None
+        }
+
     def to_dict(self):
         """转换为字典"""
-        return {
-            'id': self.id,
-            'start_code': self.start_code,
-            'end_code': self.end_code,
-            'zone_name': self.zone_name,
-            'type': self.type,
-            'file_name': self.file_name,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        } 
\ No newline at end of file
+        return self.metadata_to_dict(self)
@@ -0,0 +1,35 @@
+from app.extensions import db
+
+class PostalZoneRange(db.Model):
+    """分区表中的邮编范围
+
+    由 PostalZone.excel_content 中的分区表展开，起始邮编和目的邮编范围都以整数保存，
+    目的邮编范围已换算为5位邮编空间内的闭区间，按 (origin, dest_start, dest_end) 建立索引。
+    """
+    __tablename__ = 'postal_zone_ranges'
+    __table_args__ = (
+        db.Index('ix_postal_zone_ranges_lookup', 'origin', 'dest_start', 'dest_end'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    postal_zone_id = db.Column(db.Integer, db.ForeignKey('postal_zones.id', ondelete='CASCADE'),
+                               nullable=False, index=True, comment='分区表记录')
+    origin = db.Column(db.Integer, nullable=False, comment='起始邮编')
+    dest_start = db.Column(db.Integer, nullable=False, comment='目的邮编范围开始')
+    dest_end = db.Column(db.Integer, nullable=False, comment='目的邮编范围结束')
+    zone = db.Column(db.Integer, nullable=True, comment='区域')
+    seq = db.Column(db.Integer, nullable=False, default=0, comment='在分区表中的顺序')
+
+    def __repr__(self):
+        return f'<PostalZoneRange {self.origin} {self.dest_start}-{self.dest_end}>'
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'postal_zone_id': self.postal_zone_id,
+            'origin': self.origin,
+            'dest_start': self.dest_start,
+            'dest_end': self.dest_end,
+            'zone': self.zone
+        }
@@ -1,5 +1,5 @@
 from flask import Blueprint
-from . import auth, users, products, postal_zones, fuel_rates, calculator, admin
+from . import auth, users, products, postal_zones, fuel_rates, calculator, admin, jobs
 
 # 创建主API蓝图
 bp = Blueprint('api', __name__, url_prefix='/api')
@@ -11,4 +11,5 @@ bp.register_blueprint(users.bp)
 bp.register_blueprint(products.bp)
 bp.register_blueprint(fuel_rates.bp)
 bp.register_blueprint(calculator.bp)
+bp.register_blueprint(jobs.bp)
 bp.register_blueprint(admin.bp, url_prefix='/admin')  # 添加 url_prefix 
\ No newline at end of file
@@ -5,6 +5,8 @@ from app.models.fuel_rate import FuelRate
 from app.utils.exceptions import ValidationError, ResourceNotFoundError, BusinessError
 from app.extensions import db
 from app.decorators import admin_required
+from app.services.tariff_snapshot import invalidate_tariff_snapshots
+from app.services.quote_cache import invalidate_quote_cache
 from datetime import datetime, date
 
 bp = Blueprint('fuel_rates', __name__, url_prefix='/fuel-rates')
@@ -153,6 +155,8 @@ def create_fuel_rate():
         
         db.session.add(fuel_rate)
         db.session.commit()
+        invalidate_tariff_snapshots()  # 燃油费率变化后已缓存的费率快照失效
+        invalidate_quote_cache()
         
         logger.info(f"创建燃油费率成功: {fuel_rate.id}")
         return jsonify({
@@ -237,6 +241,8 @@ def update_fuel_rate(id):
                 
         rate.updated_at = datetime.now()
         db.session.commit()
+        invalidate_tariff_snapshots()
+        invalidate_quote_cache()
         
         logger.info(f"更新燃油费率成功: {id}")
         return jsonify({
@@ -270,6 +276,8 @@ def delete_fuel_rate(id):
             
         db.session.delete(rate)
         db.session.commit()
+        invalidate_tariff_snapshots()
+        invalidate_quote_cache()
         
         logger.info(f"删除燃油费率成功: {id}")
         return '', 204
@@ -0,0 +1,30 @@
+import logging
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from app.utils.exceptions import ResourceNotFoundError
+from app.services.import_jobs import get_import_job
+
+bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+logger = logging.getLogger(__name__)
+
+@bp.route('/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """查询导入任务的状态、进度和结果，只有提交任务的用户和管理员可以查看"""
+    try:
+        job = get_import_job(job_id)
+        if job is None or (job.created_by is not None and job.created_by != current_user.id
+                           and current_user.role != 'admin'):
+            raise ResourceNotFoundError(f'导入任务不存在: {job_id}')
+
+        return jsonify({
+            'success': True,
+            'data': job.to_dict()
+        })
+
+    except ResourceNotFoundError as e:
+        logger.warning(str(e))
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except Exception as e:
+        logger.error(f"获取导入任务失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': '获取导入任务失败'}), 500
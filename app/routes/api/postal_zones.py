@@ -5,17 +5,38 @@ from app.models.postal_zone import PostalZone
 from app.utils.exceptions import ValidationError, ResourceNotFoundError, BusinessError
 from app.extensions import db
 from app.decorators import admin_required
+from app.services import zone_imports
+from app.services.import_jobs import submit_import_job
+from app.services.zone_arrays import remove_zone_array
+from app.utils.excel_reader import TABLE_EXTENSIONS
+from app.services.zone_lookup import (ZoneResolver, clear_zone_ranges, filter_rows_by_prefix, get_chart_rows,
+                                      invalidate_remote_index, sync_zone_ranges)
 from datetime import datetime
 import re
-import pandas as pd
-import os
-import tempfile
-from werkzeug.utils import secure_filename
-import json
 
 bp = Blueprint('postal_zones', __name__)
 logger = logging.getLogger(__name__)
 
+# 批量解析接口单次请求的最大邮编对数量
+MAX_RESOLVE_PAIRS = 20000
+# 分区表详情接口的默认和最大每页行数
+DETAILS_DEFAULT_LIMIT = 100
+DETAILS_MAX_LIMIT = 1000
+
+
+def get_details_page_args():
+    """解析分区表详情接口的分页和邮编前缀筛选参数"""
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', DETAILS_DEFAULT_LIMIT, type=int)
+    prefix = request.args.get('prefix', '').strip()
+    if offset < 0:
+        raise ValidationError('offset不能小于0')
+    if limit < 1 or limit > DETAILS_MAX_LIMIT:
+        raise ValidationError(f'limit必须在1到{DETAILS_MAX_LIMIT}之间')
+    if prefix and not prefix.isdigit():
+        raise ValidationError('邮编前缀只能包含数字')
+    return offset, limit, prefix
+
 @bp.route('', methods=['GET'])
 @login_required
 def get_postal_zones():
@@ -283,6 +304,59 @@ def check_postal_zone():
         logger.error(f"检查邮政编码失败: {str(e)}", exc_info=True)
         return jsonify({'message': '检查邮政编码失败'}), 500
 
+@bp.route('/resolve', methods=['POST'])
+@login_required
+def resolve_postal_zones():
+    """批量解析 (起始邮编, 目的邮编) 的区域和偏远地区类型
+
+    请求体: {"pairs": [{"origin": "91710", "destination": "10001"}, ...]}，
+    也接受 [["91710", "10001"], ...] 形式。按起始邮编分组，每个分区表只加载一次。
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data or 'pairs' not in data:
+            raise ValidationError('缺少邮编对数据')
+
+        raw_pairs = data['pairs']
+        if not isinstance(raw_pairs, list) or not raw_pairs:
+            raise ValidationError('邮编对数据必须是非空列表')
+        if len(raw_pairs) > MAX_RESOLVE_PAIRS:
+            raise ValidationError(f'单次最多解析{MAX_RESOLVE_PAIRS}个邮编对')
+
+        pairs = []
+        for i, pair in enumerate(raw_pairs):
+            if isinstance(pair, dict):
+                origin, destination = pair.get('origin'), pair.get('destination')
+            elif isinstance(pair, (list, tuple)) and len(pair) == 2:
+                origin, destination = pair
+            else:
+                raise ValidationError(f'第{i + 1}个邮编对格式错误')
+            if not origin or not destination:
+                raise ValidationError(f'第{i + 1}个邮编对缺少起始邮编或目的邮编')
+            pairs.append((str(origin).strip(), str(destination).strip()))
+
+        results = ZoneResolver().resolve_many(pairs)
+        items = []
+        for (origin, destination), result in zip(pairs, results):
+            item = {'origin': origin, 'destination': destination}
+            item.update(result)
+            items.append(item)
+
+        failed = sum(1 for result in results if 'error' in result)
+        logger.info(f"批量解析邮编区域: {len(pairs)} 个邮编对, {failed} 个失败")
+        return jsonify({
+            'success': True,
+            'data': items,
+            'message': '解析成功'
+        })
+
+    except ValidationError as e:
+        logger.warning(f"批量解析邮编区域验证错误: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"批量解析邮编区域失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'message': '系统错误，请稍后重试'}), 500
+
 # 错误处理器
 @bp.errorhandler(ValidationError)
 def handle_validation_error(e):
@@ -313,8 +387,7 @@ def handle_unexpected_error(e):
 def get_receiver_postal_zones():
     """获取收件邮编列表"""
     try:
-        postals = PostalZone.query.filter_by(type='receiver').order_by(PostalZone.start_code).all()
-        data = [postal.to_dict() for postal in postals]
+        data = PostalZone.list_metadata('receiver')
         return jsonify({
             'success': True,
             'data': data,
@@ -375,7 +448,7 @@ def create_receiver_postal():
 def update_receiver_postal(id):
     """更新收件邮编"""
     try:
-        postal = PostalZone.query.filter_by(id=id, type='receiver').first()
+        postal = PostalZone.query.options(db.undefer(PostalZone.excel_content)).filter_by(id=id, type='receiver').first()
         if not postal:
             raise ResourceNotFoundError(f'收件邮编不存在: {id}')
 
@@ -384,12 +457,17 @@ def update_receiver_postal(id):
             raise ValidationError('无效的请求数据')
 
         # 更新字段
+        previous_start_code = postal.start_code
         for field in ['start_code', 'zone_id']:
             if field in data:
                 setattr(postal, field, data[field])
 
         postal.updated_at = datetime.now()
+        sync_zone_ranges(postal)
         db.session.commit()
+        # 起始邮编变化后原起始邮编的分区数组文件已失效，删除以免继续按旧数组查找
+        if postal.start_code != previous_start_code:
+            remove_zone_array(previous_start_code)
 
         return jsonify({
             'message': '更新成功',
@@ -417,8 +495,11 @@ def delete_receiver_postal(id):
         if not postal:
             raise ResourceNotFoundError(f'收件邮编不存在: {id}')
 
+        start_code = postal.start_code
+        clear_zone_ranges(postal.id)
         db.session.delete(postal)
         db.session.commit()
+        remove_zone_array(start_code)
 
         return '', 204
 
@@ -432,35 +513,30 @@ def delete_receiver_postal(id):
 
 @bp.route('/receiver/<int:id>/details', methods=['GET'])
 def get_receiver_postal_details(id):
+    """获取收件邮编分区表详情
+
+    支持 offset / limit 分页和 prefix 目的邮编前缀筛选，从缓存的已解析分区表中读取。
+    """
     try:
-        postal = PostalZone.query.get(id)
-        if not postal or postal.type != 'receiver':
+        offset, limit, prefix = get_details_page_args()
+        chart = get_chart_rows(id)
+        if chart is None or chart['type'] != 'receiver':
             return jsonify({
                 'success': False,
                 'message': '找不到该邮编记录'
             })
 
-        if not postal.excel_content:
-            return jsonify({
-                'success': True,
-                'data': []
-            })
-
-        try:
-            # 从数据库中读取Excel内容
-            df = pd.read_json(postal.excel_content)
-            details = df.to_dict('records')
-            return jsonify({
-                'success': True,
-                'data': details
-            })
-        except Exception as e:
-            current_app.logger.error(f'解析Excel内容失败: {str(e)}')
-            return jsonify({
-                'success': False,
-                'message': f'解析Excel内容失败: {str(e)}'
-            })
+        rows = filter_rows_by_prefix(chart['rows'], prefix, columns=['Destination ZIP'])
+        return jsonify({
+            'success': True,
+            'data': rows[offset:offset + limit],
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit
+        })
 
+    except ValidationError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f'获取收件邮编详情失败: {str(e)}')
         return jsonify({
@@ -473,8 +549,7 @@ def get_receiver_postal_details(id):
 def get_remote_postal_zones():
     """获取偏远邮编列表"""
     try:
-        postals = PostalZone.query.filter_by(type='remote').order_by(PostalZone.start_code).all()
-        data = [postal.to_dict() for postal in postals]
+        data = PostalZone.list_metadata('remote')
         return jsonify({
             'success': True,
             'data': data,
@@ -550,6 +625,7 @@ def update_remote_postal(id):
 
         postal.updated_at = datetime.now()
         db.session.commit()
+        invalidate_remote_index()
 
         return jsonify({
             'message': '更新成功',
@@ -579,6 +655,7 @@ def delete_remote_postal(id):
 
         db.session.delete(postal)
         db.session.commit()
+        invalidate_remote_index()
 
         return '', 204
 
@@ -594,23 +671,23 @@ def delete_remote_postal(id):
 @login_required
 @admin_required
 def import_zone_excel():
-    """导入邮编分区Excel文件"""
+    """导入邮编分区Excel文件，提交导入任务后立即返回任务ID，进度和结果通过 /api/jobs/<id> 查询"""
     try:
         logger.info("开始处理Excel导入请求")
         
         # 检查文件是否存在
         if 'file' not in request.files:
             logger.warning("未找到上传的文件")
-            return jsonify({'success': False, 'message': '请选择Excel文件'}), 400
+            return jsonify({'success': False, 'message': '请选择文件'}), 400
         
         file = request.files['file']
         if not file or not file.filename:
             logger.warning("文件名为空")
             return jsonify({'success': False, 'message': '请选择文件'}), 400
             
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(TABLE_EXTENSIONS):
             logger.warning(f"文件格式错误: {file.filename}")
-            return jsonify({'success': False, 'message': '请选择正确的Excel文件格式(.xlsx或.xls)'}), 400
+            return jsonify({'success': False, 'message': '请选择正确的文件格式(.xlsx、.xls、.csv或.parquet)'}), 400
 
         # 检查并验证起始邮编
         start_code = request.form.get('start_code', '').strip()
@@ -618,107 +695,45 @@ def import_zone_excel():
             logger.warning(f"起始邮编格式错误: {start_code}")
             return jsonify({'success': False, 'message': '起始邮编必须是5位数字'}), 400
 
-        # 保存文件到临时目录
-        temp_path = os.path.join(tempfile.gettempdir(), secure_filename(file.filename))
-        file.save(temp_path)
-        logger.info(f"文件已保存到临时目录: {temp_path}")
+        job = submit_import_job('zone_excel', file, zone_imports.import_zone_excel, start_code=start_code)
+        return jsonify({
+            'success': True,
+            'message': '导入任务已提交',
+            'job_id': job.id,
+            'data': job.to_dict()
+        }), 202
 
-        try:
-            # 读取Excel文件内容
-            df = pd.read_excel(
-                temp_path,
-                dtype=str,  # 将所有列设置为字符串类型
-                keep_default_na=False  # 防止空值被转换为NaN
-            )
-            
-            # 立即处理所有列，确保保持原始格式
-            for col in df.columns:
-                # 先转为字符串并去除空格
-                df[col] = df[col].apply(lambda x: str(x).strip())
-                # 检查是否是邮编列
-                if any(name in col for name in ['ZIP', 'zip', '邮编']):
-                    # 直接使用字符串处理，保持原始格式
-                    df[col] = df[col].apply(lambda x: x.zfill(5) if x.isdigit() else x)
-            
-            logger.info(f"成功读取Excel文件，包含 {len(df)} 行数据")
-            logger.info(f"Excel列名: {df.columns.tolist()}")
-            logger.info(f"数据示例:\n{df.head().to_string()}")  # 打印前几行数据用于检查
-            
-            # 清理数据：删除所有空列
-            df = df.dropna(axis=1, how='all')
-            
-            # 检查并规范化列名
-            column_mappings = {
-                'col1': ['Destination ZIP Codes', 'ZIP', 'zip', '邮编', 'ZIP Codes', 'Destination ZIP codes'],
-                'col2': ['Destination ZIP Codes.1', 'ZIP.1', 'zip.1', '邮编.1'],
-                'col3': ['Destination ZIP Codes.2', 'ZIP.2', 'zip.2', '邮编.2'],
-                'col4': ['Destination ZIP Codes.3', 'ZIP.3', 'zip.3', '邮编.3'],
-                'col5': ['Destination ZIP Codes.4', 'ZIP.4', 'zip.4', '邮编.4']
-            }
-            
-            # 重命名列以统一格式
-            found_columns = {}
-            for target_col, possible_names in column_mappings.items():
-                for col_name in df.columns:
-                    if col_name.strip() in possible_names:
-                        found_columns[target_col] = col_name
-                        break
-            
-            df = df.rename(columns={v: k for k, v in found_columns.items()})
-            
-            # 最后一次确保所有邮编列的格式正确
-            for col in df.columns:
-                if col.startswith('col'):
-                    # 直接使用字符串处理，保持原始格式
-                    df[col] = df[col].apply(lambda x: x.zfill(5) if x.isdigit() else x)
-            
-            logger.info(f"处理后的数据示例:\n{df.head().to_string()}")  # 再次打印检查
-            
-            # 将Excel内容转换为JSON字符串
-            excel_content = df.to_json(orient='records', force_ascii=False)
-            logger.info(f"转换后的JSON内容(前200字符): {excel_content[:200]}")
+    except Exception as e:
+        logger.error(f"导入过程发生未预期的错误: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'导入失败：{str(e)}'
+        }), 500
+
+@bp.route('/import-zone-archive', methods=['POST'])
+@login_required
+@admin_required
+def import_zone_archive():
+    """批量导入ZIP压缩包中按起始邮编命名的分区表文件，提交导入任务后立即返回任务ID"""
+    try:
+        logger.info("开始处理分区表压缩包导入请求")
+        
+        file = request.files.get('file')
+        if not file or not file.filename:
+            logger.warning("未找到上传的文件")
+            return jsonify({'success': False, 'message': '请选择ZIP压缩包'}), 400
             
-        except Exception as e:
-            logger.error(f"读取Excel文件失败: {str(e)}")
-            return jsonify({'success': False, 'message': f'读取Excel文件失败: {str(e)}'}), 400
-        finally:
-            # 删除临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-
-        if len(df.columns) < 2:
-            logger.warning("Excel文件格式错误：列数不足")
-            return jsonify({'success': False, 'message': 'Excel文件必须包含至少两列：邮编范围和分区'}), 400
-
-        # 创建或更新记录
-        postal = PostalZone.query.filter_by(start_code=start_code, type='receiver').first()
-        if postal:
-            postal.excel_content = excel_content
-            postal.file_name = secure_filename(file.filename)
-        else:
-            postal = PostalZone(
-                start_code=start_code,
-                type='receiver',
-                excel_content=excel_content,
-                file_name=secure_filename(file.filename)
-            )
-            db.session.add(postal)
+        if not file.filename.lower().endswith('.zip'):
+            logger.warning(f"文件格式错误: {file.filename}")
+            return jsonify({'success': False, 'message': '请选择ZIP压缩包(.zip)'}), 400
 
-        try:
-            db.session.commit()
-            logger.info(f"数据库事务提交成功")
-            return jsonify({
-                'success': True,
-                'message': '导入成功',
-                'data': [postal.to_dict()]
-            })
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"数据库事务提交失败: {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': f'保存数据失败：{str(e)}'
-            }), 500
+        job = submit_import_job('zone_archive', file, zone_imports.import_zone_archive)
+        return jsonify({
+            'success': True,
+            'message': '导入任务已提交',
+            'job_id': job.id,
+            'data': job.to_dict()
+        }), 202
 
     except Exception as e:
         logger.error(f"导入过程发生未预期的错误: {str(e)}", exc_info=True)
@@ -729,6 +744,7 @@ def import_zone_excel():
 
 @bp.route('/receiver/import', methods=['POST'])
 def import_receiver_postal():
+    """导入收件邮编分区表，提交导入任务后立即返回任务ID"""
     try:
         logger.info("开始处理收件邮编导入请求")
         
@@ -736,11 +752,11 @@ def import_receiver_postal():
         file = request.files.get('file')
         if not file or not file.filename:
             logger.warning("未找到上传的文件")
-            return jsonify({'success': False, 'message': '请选择Excel文件'})
+            return jsonify({'success': False, 'message': '请选择文件'})
             
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(TABLE_EXTENSIONS):
             logger.warning(f"文件格式错误: {file.filename}")
-            return jsonify({'success': False, 'message': '请选择正确的Excel文件格式(.xlsx或.xls)'})
+            return jsonify({'success': False, 'message': '请选择正确的文件格式(.xlsx、.xls、.csv或.parquet)'})
 
         # 检查起始邮编
         start_code = request.form.get('start_code', '').strip()
@@ -748,92 +764,13 @@ def import_receiver_postal():
             logger.warning(f"起始邮编格式错误: {start_code}")
             return jsonify({'success': False, 'message': '起始邮编必须是5位数字'})
 
-        # 保存文件到临时路径
-        temp_path = os.path.join(tempfile.gettempdir(), secure_filename(file.filename))
-        file.save(temp_path)
-        logger.info(f"文件已保存到临时目录: {temp_path}")
-
-        try:
-            # 读取Excel文件内容
-            df = pd.read_excel(temp_path)
-            logger.info(f"成功读取Excel文件，包含 {len(df)} 行数据")
-            logger.info(f"Excel列名: {df.columns.tolist()}")
-            
-            # 检查并规范化列名
-            column_mappings = {
-                'Destination ZIP': ['Destination ZIP', 'destination_zip', 'zip', '目的地邮编', '邮编'],
-                'Zone': ['Zone', 'zone', '分区', '区域']
-            }
-            
-            found_columns = {}
-            for target_col, possible_names in column_mappings.items():
-                for col_name in df.columns:
-                    if col_name.strip().lower() in [name.strip().lower() for name in possible_names]:
-                        found_columns[target_col] = col_name
-                        break
-                        
-            if len(found_columns) != len(column_mappings):
-                missing_cols = set(column_mappings.keys()) - set(found_columns.keys())
-                logger.warning(f"Excel文件缺少必要的列: {missing_cols}")
-                return jsonify({
-                    'success': False,
-                    'message': f'Excel文件格式错误，缺少以下列: {", ".join(missing_cols)}'
-                })
-                
-            # 重命名列以统一格式
-            df = df.rename(columns=found_columns)
-            
-            # 将Excel内容转换为JSON字符串
-            excel_content = df.to_json(orient='records')
-            logger.info("成功将Excel内容转换为JSON格式")
-            
-            # 创建或更新postal记录
-            try:
-                postal = PostalZone.query.filter_by(start_code=start_code, type='receiver').first()
-                if postal:
-                    logger.info(f"更新现有记录，ID: {postal.id}")
-                    postal.excel_content = excel_content
-                    postal.file_name = secure_filename(file.filename)
-                    postal.updated_at = datetime.now()
-                    logger.info("已更新excel_content和file_name")
-                else:
-                    logger.info("创建新记录")
-                    postal = PostalZone(
-                        start_code=start_code,
-                        type='receiver',
-                        excel_content=excel_content,
-                        file_name=secure_filename(file.filename),
-                        created_at=datetime.now(),
-                        updated_at=datetime.now()
-                    )
-                    db.session.add(postal)
-                    logger.info("已创建新的PostalZone记录")
-                
-                db.session.commit()
-                logger.info("成功保存到数据库")
-                
-                result = postal.to_dict()
-                logger.info(f"返回结果: {result}")
-                
-                return jsonify({
-                    'success': True,
-                    'message': '导入成功',
-                    'data': result
-                })
-
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"数据库操作失败: {str(e)}", exc_info=True)
-                return jsonify({
-                    'success': False, 
-                    'message': f'保存数据失败: {str(e)}'
-                })
-
-        finally:
-            # 删除临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                logger.info("已删除临时文件")
+        job = submit_import_job('receiver', file, zone_imports.import_receiver_chart, start_code=start_code)
+        return jsonify({
+            'success': True,
+            'message': '导入任务已提交',
+            'job_id': job.id,
+            'data': job.to_dict()
+        }), 202
 
     except Exception as e:
         logger.error(f"导入过程发生未预期的错误: {str(e)}", exc_info=True)
@@ -844,6 +781,7 @@ def import_receiver_postal():
 
 @bp.route('/remote/import', methods=['POST'])
 def import_remote_postal():
+    """导入偏远邮编表，提交导入任务后立即返回任务ID"""
     try:
         logger.info("开始处理偏远邮编导入请求")
         
@@ -851,11 +789,11 @@ def import_remote_postal():
         file = request.files.get('file')
         if not file or not file.filename:
             logger.warning("未找到上传的文件")
-            return jsonify({'success': False, 'message': '请选择Excel文件'})
+            return jsonify({'success': False, 'message': '请选择文件'})
             
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(TABLE_EXTENSIONS):
             logger.warning(f"文件格式错误: {file.filename}")
-            return jsonify({'success': False, 'message': '请选择正确的Excel文件格式(.xlsx或.xls)'})
+            return jsonify({'success': False, 'message': '请选择正确的文件格式(.xlsx、.xls、.csv或.parquet)'})
 
         # 检查起始邮编
         start_code = request.form.get('start_code', '').strip()
@@ -863,113 +801,13 @@ def import_remote_postal():
             logger.warning(f"起始邮编格式错误: {start_code}")
             return jsonify({'success': False, 'message': '起始邮编必须是5位数字'})
 
-        # 保存文件到临时路径
-        temp_path = os.path.join(tempfile.gettempdir(), secure_filename(file.filename))
-        file.save(temp_path)
-        logger.info(f"文件已保存到临时目录: {temp_path}")
-
-        try:
-            # 读取Excel文件内容，确保所有数据都作为字符串读取
-            df = pd.read_excel(
-                temp_path,
-                dtype=str,  # 将所有列设置为字符串类型
-                keep_default_na=False,  # 防止空值被转换为NaN
-                na_filter=False  # 禁用NA过滤，保持原始数据
-            )
-            
-            logger.info(f"原始Excel列名: {df.columns.tolist()}")
-            logger.info(f"原始数据示例:\n{df.head().to_string()}")
-            
-            # 清理数据：删除所有空列
-            df = df.dropna(axis=1, how='all')
-            
-            # 删除不需要的列（Unnamed列）
-            df = df.loc[:, ~df.columns.str.contains('Unnamed')]
-            
-            # 获取原始列名和第一行（作为第二行表头）
-            original_columns = df.columns.tolist()
-            second_header = df.iloc[0].to_dict()
-            
-            # 保存表头信息
-            headers = {
-                'first_row': original_columns,
-                'second_row': second_header
-            }
-            
-            # 跳过第一行（第二行表头），处理实际数据
-            df = df.iloc[1:]
-            
-            # 处理所有列，确保邮编格式正确
-            for col in original_columns:
-                # 先转为字符串并去除空格
-                df[col] = df[col].astype(str).apply(lambda x: x.strip())
-                # 对数字进行补零处理，保持非数字值不变
-                df[col] = df[col].apply(lambda x: x.zfill(5) if x.isdigit() and len(x.strip()) <= 5 else x)
-                # 记录一些示例值用于调试
-                sample_values = df[col].head().tolist()
-                logger.info(f"列 {col} 处理后的示例值: {sample_values}")
-            
-            logger.info(f"处理后的列名: {original_columns}")
-            logger.info(f"处理后的数据示例:\n{df.head().to_string()}")
-            
-            # 将DataFrame转换为字典列表，确保保持字符串格式
-            records = df.to_dict('records')
-            
-            # 构建完整的数据结构
-            complete_data = {
-                'headers': headers,
-                'data': records
-            }
-            
-            # 转换为JSON字符串
-            excel_content = json.dumps(complete_data, ensure_ascii=False)
-            logger.info(f"JSON内容示例(前200字符): {excel_content[:200]}")
-            
-            # 创建或更新postal记录
-            try:
-                postal = PostalZone.query.filter_by(start_code=start_code, type='remote').first()
-                if postal:
-                    logger.info(f"更新现有记录，ID: {postal.id}")
-                    postal.excel_content = excel_content
-                    postal.file_name = secure_filename(file.filename)
-                    postal.updated_at = datetime.now()
-                else:
-                    logger.info("创建新记录")
-                    postal = PostalZone(
-                        start_code=start_code,
-                        type='remote',
-                        excel_content=excel_content,
-                        file_name=secure_filename(file.filename),
-                        created_at=datetime.now(),
-                        updated_at=datetime.now()
-                    )
-                    db.session.add(postal)
-                
-                db.session.commit()
-                logger.info("成功保存到数据库")
-                
-                result = postal.to_dict()
-                logger.info(f"返回结果: {result}")
-                
-                return jsonify({
-                    'success': True,
-                    'message': '导入成功',
-                    'data': result
-                })
-
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"数据库操作失败: {str(e)}", exc_info=True)
-                return jsonify({
-                    'success': False, 
-                    'message': f'保存数据失败: {str(e)}'
-                })
-
-        finally:
-            # 删除临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                logger.info("已删除临时文件")
+        job = submit_import_job('remote', file, zone_imports.import_remote_chart, start_code=start_code)
+        return jsonify({
+            'success': True,
+            'message': '导入任务已提交',
+            'job_id': job.id,
+            'data': job.to_dict()
+        }), 202
 
     except Exception as e:
         logger.error(f"导入过程发生未预期的错误: {str(e)}", exc_info=True)
@@ -980,57 +818,35 @@ def import_remote_postal():
 
 @bp.route('/remote/<int:id>/details', methods=['GET'])
 def get_remote_postal_details(id):
-    """获取偏远邮编详情"""
+    """获取偏远邮编详情
+
+    data 为当前页的数据行，表头单独在 headers 中返回。支持 offset / limit 分页和 prefix 邮编前缀筛选，
+    从缓存的已解析偏远邮编表中读取。
+    """
     try:
-        postal = PostalZone.query.get(id)
-        if not postal or postal.type != 'remote':
+        offset, limit, prefix = get_details_page_args()
+        chart = get_chart_rows(id)
+        if chart is None or chart['type'] != 'remote':
             return jsonify({
                 'success': False,
                 'message': '找不到该邮编记录'
             })
 
-        if not postal.excel_content:
-            return jsonify({
-                'success': True,
-                'data': []
-            })
-
-        try:
-            # 直接解析JSON字符串，避免pandas的自动类型转换
-            content = json.loads(postal.excel_content)
-            
-            # 从保存的数据中获取表头和数据
-            headers = content['headers']
-            data = content['data']
-            
-            # 构建第一行表头
-            first_header = {}
-            for col in headers['first_row']:
-                first_header[col] = col
-            
-            # 构建完整的数据列表，包含双层表头
-            formatted_data = [
-                first_header,  # 第一行表头
-                headers['second_row'],  # 第二行表头
-            ]
-            formatted_data.extend(data)  # 添加实际数据
-            
-            logger.info(f"处理后的数据示例: {str(formatted_data[:3])}")  # 记录前三条数据用于调试
-            
-            return jsonify({
-                'success': True,
-                'data': formatted_data
-            })
-        except Exception as e:
-            logger.error(f'解析Excel内容失败: {str(e)}')
-            return jsonify({
-                'success': False,
-                'message': f'解析Excel内容失败: {str(e)}'
-            })
+        rows = filter_rows_by_prefix(chart['rows'], prefix, normalize=True)
+        return jsonify({
+            'success': True,
+            'data': rows[offset:offset + limit],
+            'headers': chart['headers'],
+            'total': len(rows),
+            'offset': offset,
+            'limit': limit
+        })
 
+    except ValidationError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         logger.error(f'获取偏远邮编详情失败: {str(e)}')
         return jsonify({
             'success': False,
             'message': f'获取详情失败: {str(e)}'
-        }) 
\ No newline at end of file
+        })
@@ -6,10 +6,14 @@ from app.utils.exceptions import ValidationError, ResourceNotFoundError
 from app.extensions import db
 from app.decorators import admin_required
 from datetime import datetime
-import pandas as pd
 import os
-from werkzeug.utils import secure_filename
 from app.utils.excel_import import ExcelImporter
+from app.utils.excel_reader import TABLE_EXTENSIONS
+from app.services.rate_card import invalidate_rate_card
+from app.services.surcharge_rules import invalidate_surcharge_rules
+from app.services.tariff_snapshot import invalidate_tariff_snapshots
+from app.services.import_jobs import submit_import_job
+from app.services.product_import import preview_product_workbook
 import traceback
 import json
 import tempfile
@@ -108,6 +112,9 @@ def update_product(id):
             
         product.from_dict(data)
         db.session.commit()
+        invalidate_rate_card(id)
+        invalidate_surcharge_rules(id)
+        invalidate_tariff_snapshots(id)
         
         logger.info(f"更新产品成功: {id}")
         return jsonify(product.to_dict())
@@ -135,6 +142,9 @@ def delete_product(id):
             
         db.session.delete(product)
         db.session.commit()
+        invalidate_rate_card(id)
+        invalidate_surcharge_rules(id)
+        invalidate_tariff_snapshots(id)
         
         logger.info(f"删除产品成功: {id}")
         return '', 204
@@ -151,6 +161,7 @@ def delete_product(id):
 @login_required
 @admin_required
 def import_product():
+    """读取产品Excel文件预览，提交导入任务后立即返回任务ID，预览文本在任务结果的 data 中"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': '没有上传文件'}), 400
@@ -162,74 +173,16 @@ def import_product():
         if not file.filename.endswith('.xlsx'):
             return jsonify({'error': '请上传Excel文件'}), 400
 
-        # 保存临时文件
-        temp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(temp_dir, filename)
-        file.save(temp_path)
-
-        # 读取所有sheet
-        current_app.logger.info(f'开始读取Excel文件: {filename}')
-        df_dict = pd.read_excel(temp_path, sheet_name=None)
-        current_app.logger.info(f'Excel文件包含以下sheet: {list(df_dict.keys())}')
-        
-        # 将每个DataFrame转换为字符串格式
-        result = []
-        # 设置pandas显示选项
-        pd.set_option('display.max_columns', None)        # 显示所有列
-        pd.set_option('display.width', None)             # 不限制显示宽度
-        pd.set_option('display.max_rows', None)          # 显示所有行
-        pd.set_option('display.max_colwidth', None)      # 不限制列宽
-        pd.set_option('display.expand_frame_repr', False) # 不换行显示
-        pd.set_option('display.unicode.ambiguous_as_wide', True)  # 处理中文对齐
-        pd.set_option('display.unicode.east_asian_width', True)   # 处理中文对齐
-        pd.set_option('display.float_format', lambda x: '%.4f' % x if pd.notnull(x) else '')  # 统一数字格式化
-        
-        for sheet_name, df in df_dict.items():
-            current_app.logger.info(f'处理sheet: {sheet_name}, 行数: {len(df)}')
-            
-            # 计算每列的最大宽度
-            max_lengths = {}
-            for col in df.columns:
-                # 计算最大宽度（考虑中文字符）
-                max_lengths[col] = max(
-                    len(str(col)),
-                    df[col].astype(str).apply(lambda x: sum(2 if ord(c) > 127 else 1 for c in str(x))).max()
-                )
-            
-            # 格式化输出
-            formatted_df = df.to_string(
-                index=True,
-                justify='right',
-                col_space=max_lengths,
-                max_colwidth=None,  # 不限制列宽
-                na_rep='',
-                max_rows=None,      # 显示所有行
-                max_cols=None       # 显示所有列
-            )
-            
-            result.append(f"{sheet_name}\n{formatted_df}\n")
-            current_app.logger.info(f'sheet {sheet_name} 转换完成')
-
-        # 删除临时文件
-        os.remove(temp_path)
-        current_app.logger.info('临时文件已删除')
-
+        job = submit_import_job('product', file, preview_product_workbook)
         return jsonify({
-            'message': '成功读取Excel文件',
-            'data': '\n\n'.join(result)
-        }), 200
+            'message': '导入任务已提交',
+            'job_id': job.id,
+            'data': job.to_dict()
+        }), 202
 
     except Exception as e:
         current_app.logger.error(f'导入产品失败: {str(e)}')
         current_app.logger.error(traceback.format_exc())  # 添加详细的错误堆栈
-        # 确保临时文件被删除
-        try:
-            if 'temp_path' in locals():
-                os.remove(temp_path)
-        except:
-            pass
         return jsonify({'error': f'导入产品失败: {str(e)}'}), 500
 
 @bp.route('/batch-import', methods=['POST'])
@@ -358,39 +311,45 @@ def import_rates(id):
         # 检查文件
         if 'file' not in request.files:
             logger.warning('未找到上传的文件')
-            return jsonify({'success': False, 'message': '请选择Excel文件'})
+            return jsonify({'success': False, 'message': '请选择文件'})
             
         file = request.files['file']
         if not file or not file.filename:
             logger.warning('文件名为空')
             return jsonify({'success': False, 'message': '请选择文件'})
             
-        if not file.filename.endswith(('.xlsx', '.xls')):
+        if not file.filename.lower().endswith(TABLE_EXTENSIONS):
             logger.warning(f'文件格式错误: {file.filename}')
-            return jsonify({'success': False, 'message': '请选择正确的Excel文件格式(.xlsx或.xls)'})
+            return jsonify({'success': False, 'message': '请选择正确的文件格式(.xlsx、.xls、.csv或.parquet)'})
 
         # 获取产品
         product = Product.query.get_or_404(id)
         logger.info(f'找到产品: {product.name}')
         
-        # 保存文件到临时路径
-        temp_path = os.path.join(tempfile.gettempdir(), secure_filename(file.filename))
+        # 保存文件到临时路径，按扩展名识别文件格式（中文文件名经 secure_filename 处理后可能丢失扩展名）
+        fd, temp_path = tempfile.mkstemp(prefix='rates-', suffix=os.path.splitext(file.filename)[1].lower())
+        os.close(fd)
         file.save(temp_path)
         logger.info(f'文件已保存到临时目录: {temp_path}')
         
         try:
-            # 导入Excel文件
+            # 导入费率表文件
             importer = ExcelImporter(temp_path)
             result = importer.process_excel()
-            logger.info('Excel文件处理完成')
+            logger.info('费率表文件处理完成')
             
-            # 更新产品费率
+            # 更新产品费率，CSV 和 Parquet 文件只包含区域费率，附加费用和基本信息保持不变
             product.zone_rates = json.dumps(result['zone_rates'], ensure_ascii=False)
-            product.surcharges = json.dumps(result['surcharges'], ensure_ascii=False)
-            product.volume_weight_factor = result['product_info']['dim']
-            product.unit = result['product_info']['unit']
+            if 'surcharges' in result:
+                product.surcharges = json.dumps(result['surcharges'], ensure_ascii=False)
+            if 'product_info' in result:
+                product.volume_weight_factor = result['product_info']['dim']
+                product.unit = result['product_info']['unit']
             
             db.session.commit()
+            invalidate_rate_card(id)
+            invalidate_surcharge_rules(id)
+            invalidate_tariff_snapshots(id)
             logger.info('产品费率更新成功')
             
             return jsonify({
@@ -0,0 +1,225 @@
+import logging
+import numpy as np
+from app.services.rate_card import get_rate_card, parse_zone_number
+from app.services.surcharge_rules import OVERSIZE_LENGTH, OVERSIZE_LENGTH_GIRTH, OVERSIZE_MIN_WEIGHT
+from app.services.tariff_snapshot import get_tariff_snapshot
+
+logger = logging.getLogger(__name__)
+
+CM_TO_INCH = 0.393701
+KG_TO_LB = 2.20462
+
+
+def round_half_even(values, decimals=2):
+    """与内置 round() 结果一致的向量化舍入
+
+    np.round 先乘以 10**decimals 再取整，在恰好位于两个分值中间附近的数值上
+    可能与 round() 不同，这些少量数值回退到 round() 逐个计算。
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, decimals)
+    scaled = values * 10 ** decimals
+    ambiguous = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ambiguous:
+        rounded[i] = round(float(values[i]), decimals)
+    return rounded
+
+
+class BatchPricer:
+    """单产品批量运费计算引擎
+
+    与 calculator.calculate_for_zone 的计费规则一致，但一次处理 N 个包裹：
+    所有包裹的尺寸换算、计费重量、费率档位查找和附加费判断都以 NumPy 数组完成，
+    用于夜间重新计费等大批量场景。同一批次使用同一个计费日期的费率快照。
+    """
+
+    def __init__(self, product, as_of=None, snapshot=None):
+        self.product = product
+        self.rate_card = get_rate_card(product)
+        self.snapshot = snapshot or get_tariff_snapshot(product, as_of)
+        self.rules = self.snapshot.rules
+        self.dim_factor = float(product.volume_weight_factor if product.volume_weight_factor is not None else 250)
+        self.fuel_rate = self.snapshot.fuel_rate
+
+    @staticmethod
+    def zone_array(zones):
+        """将区域值（2 / '2' / 'Zone2'）转换为整数数组，无法解析的为 -1"""
+        zones = np.asarray(zones)
+        if np.issubdtype(zones.dtype, np.integer):
+            return zones.astype(np.int64)
+        parsed = [parse_zone_number(zone) for zone in zones.tolist()]
+        return np.array([-1 if zone is None else zone for zone in parsed], dtype=np.int64)
+
+    def price(self, weight_kg, length_cm, width_cm, height_cm, zones, remote_types=None, is_residential=True):
+        """批量计算运费
+
+        参数:
+            weight_kg, length_cm, width_cm, height_cm: 包裹重量(千克)和尺寸(厘米)数组
+            zones: 区域数组
+            remote_types: 偏远地区类型数组（DAS / DAS_EXT / ...），非偏远地区为 None
+            is_residential: 是否住宅地址，布尔值或布尔数组
+        返回:
+            dict: 字段名到 NumPy 数组的映射，error 中为计算失败的原因（成功时为 None）
+        """
+        weight_kg = np.asarray(weight_kg, dtype=float)
+        n = weight_kg.shape[0]
+        zones = self.zone_array(zones)
+        is_residential = np.broadcast_to(np.asarray(is_residential, dtype=bool), (n,))
+        errors = np.full(n, None, dtype=object)
+
+        def fail(mask, message):
+            mask = mask & np.equal(errors, None)
+            if mask.any():
+                errors[mask] = [message(i) for i in np.flatnonzero(mask)]
+
+        # 尺寸和重量换算，与单票计算一样向上取整
+        length_inch = np.ceil(np.asarray(length_cm, dtype=float) * CM_TO_INCH).astype(np.int64)
+        width_inch = np.ceil(np.asarray(width_cm, dtype=float) * CM_TO_INCH).astype(np.int64)
+        height_inch = np.ceil(np.asarray(height_cm, dtype=float) * CM_TO_INCH).astype(np.int64)
+        volume_weight_lb = np.ceil((length_inch * width_inch * height_inch) / self.dim_factor).astype(np.int64)
+        weight_lb = np.ceil(weight_kg * KG_TO_LB).astype(np.int64)
+        chargeable_weight = np.maximum(weight_lb, volume_weight_lb)
+        girth = 2 * (width_inch + height_inch)
+        total_length_girth = length_inch + girth
+
+        measures = {
+            'weight': weight_lb,
+            'length': length_inch,
+            'width': width_inch,
+            'length_girth': total_length_girth
+        }
+
+        # 不可发包裹：按规则顺序取第一个满足的条件，使用Zone 2的费率
+        is_unauthorized = np.zeros(n, dtype=bool)
+        unauthorized_fee = np.zeros(n)
+        unauthorized_reason = np.full(n, None, dtype=object)
+        if self.rules.unauthorized:
+            pss_amount = self.snapshot.pss_amount(self.rules.unauthorized)
+            for charge in self.rules.unauthorized.charges:
+                mask = charge.condition.mask(measures) & ~is_unauthorized
+                if not mask.any():
+                    continue
+                is_unauthorized |= mask
+                fee = charge.fee(2)
+                if fee is None:
+                    fail(mask, lambda i, charge=charge: f'附加费"{charge.name}"在区域2的费用未设置')
+                    continue
+                unauthorized_fee[mask] = fee + pss_amount
+                unauthorized_reason[mask] = [
+                    charge.reason.format(value=measures[charge.condition.measure][i]) for i in np.flatnonzero(mask)
+                ]
+        priced = ~is_unauthorized
+
+        # 基础运费（按计费重量查找档位，超尺寸90磅下限只影响展示的计费重量）
+        base_rate = self.rate_card.lookup_array(zones, chargeable_weight)
+        fail(priced & np.isnan(base_rate), lambda i: f'区域{zones[i]}的费率未设置')
+
+        # 额外处理费：多个条件同时满足时取费用最高的一个
+        handling_fee = np.zeros(n)
+        if self.rules.handling:
+            pss_amount = self.snapshot.pss_amount(self.rules.handling)
+            for charge in self.rules.handling.charges:
+                mask = priced & charge.condition.mask(measures)
+                if not mask.any():
+                    continue
+                fee = charge.fee_array(zones)
+                fail(mask & np.isnan(fee), lambda i, charge=charge: f'附加费"{charge.name}"在区域{zones[i]}的费用未设置')
+                fee = np.nan_to_num(fee)
+                better = mask & (fee > 0) & (fee + pss_amount > handling_fee)
+                handling_fee = np.where(better, fee + pss_amount, handling_fee)
+
+        # 超大超尺寸费：住宅和商业地址分别使用对应类别
+        oversize_fee = np.zeros(n)
+        is_oversize_length_girth = OVERSIZE_LENGTH_GIRTH.mask(measures)
+        is_oversize_length = OVERSIZE_LENGTH.mask(measures)
+        is_oversize = priced & (is_oversize_length_girth | is_oversize_length)
+        chargeable_weight = np.where(is_oversize, np.maximum(chargeable_weight, OVERSIZE_MIN_WEIGHT), chargeable_weight)
+        for residential in (True, False):
+            oversize_rule = self.rules.oversize(residential)
+            if not oversize_rule:
+                continue
+            group = is_oversize & (is_residential == residential)
+            length_girth_charge = oversize_rule.charge_for('length_girth')
+            length_charge = oversize_rule.charge_for('length')
+            pss_amount = self.snapshot.pss_amount(oversize_rule)
+            for charge, mask in (
+                    (length_girth_charge, group & is_oversize_length_girth),
+                    (length_charge, group & is_oversize_length &
+                     ~(is_oversize_length_girth & (length_girth_charge is not None)))):
+                if charge is None or not mask.any():
+                    continue
+                fee = charge.fee_array(zones)
+                fail(mask & np.isnan(fee), lambda i, charge=charge: f'附加费"{charge.name}"在区域{zones[i]}的费用未设置')
+                oversize_fee = np.where(mask, np.nan_to_num(fee) + pss_amount, oversize_fee)
+
+        # 住宅地址附加费：不区分地址类型，按实重选择服务类型，使用Zone 2的费率
+        residential_fee = np.zeros(n)
+        if self.rules.residential:
+            pss_amount = self.snapshot.pss_amount(self.rules.residential)
+            matched = np.zeros(n, dtype=bool)
+            for charge in self.rules.residential.charges:
+                mask = priced & charge.condition.mask(measures) & ~matched
+                matched |= mask
+                if not mask.any():
+                    continue
+                fee = charge.fee(2)
+                if fee is None:
+                    fail(mask, lambda i, charge=charge: f'附加费"{charge.name}"在区域2的费用未设置')
+                    continue
+                residential_fee[mask] = fee + pss_amount
+            fail(priced & ~matched, lambda i: '住宅地址附加费未设置')
+
+        # 偏远地区附加费：按偏远类型和地址类型查找，使用Zone 2的费率，没有PSS
+        remote_fee = np.zeros(n)
+        if remote_types is not None and self.rules.remote:
+            remote_types = np.asarray(remote_types, dtype=object)
+            for (remote_type, residential), charge in self.rules.remote.charges_by_type.items():
+                mask = priced & (remote_types == remote_type) & (is_residential == residential)
+                if not mask.any():
+                    continue
+                fee = charge.fee(2)
+                if fee is None:
+                    fail(mask, lambda i, charge=charge: f'附加费"{charge.name}"在区域2的费用未设置')
+                    continue
+                remote_fee[mask] = fee
+
+        # 额外处理费和超大超尺寸费只收取较大值
+        both = (handling_fee > 0) & (oversize_fee > 0)
+        keep_handling = handling_fee > oversize_fee
+        oversize_fee = np.where(both & keep_handling, 0, oversize_fee)
+        handling_fee = np.where(both & ~keep_handling, 0, handling_fee)
+
+        total_surcharges = oversize_fee + residential_fee + handling_fee + remote_fee
+        basis = base_rate + total_surcharges
+        if self.fuel_rate is not None:
+            fuel_surcharge = round_half_even(basis * self.fuel_rate / 100)
+        else:
+            fuel_surcharge = np.zeros(n)
+        total_amount = np.where(is_unauthorized, unauthorized_fee, round_half_even(basis + fuel_surcharge))
+
+        failed = ~np.equal(errors, None)
+        total_amount[failed] = np.nan
+        if failed.any():
+            logger.warning(f"批量计费: {int(failed.sum())}/{n} 个包裹计算失败")
+
+        return {
+            'zone': zones,
+            'actual_weight': weight_lb,
+            'volume_weight': volume_weight_lb,
+            'chargeable_weight': chargeable_weight,
+            'length': length_inch,
+            'width': width_inch,
+            'height': height_inch,
+            'girth': girth,
+            'total_length_girth': total_length_girth,
+            'is_unauthorized': is_unauthorized,
+            'unauthorized_reason': unauthorized_reason,
+            'base_rate': np.where(priced, base_rate, 0),
+            'handling_fee': handling_fee,
+            'oversize_fee': oversize_fee,
+            'residential_fee': residential_fee,
+            'remote_fee': remote_fee,
+            'fuel_surcharge': np.where(priced, fuel_surcharge, 0),
+            'total_amount': total_amount,
+            'error': errors
+        }
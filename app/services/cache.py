@@ -2,6 +2,9 @@ from functools import wraps
 from flask import current_app
 from datetime import datetime, timedelta
 import json
+import threading
+import time
+from collections import OrderedDict
 
 class CacheService:
     """缓存服务类"""
@@ -111,4 +114,125 @@ class CacheService:
         
     def clear_all_cache(self):
         """清除所有缓存"""
-        self.cache.clear() 
\ No newline at end of file
+        self.cache.clear()
+
+
+class VersionedCache:
+    """按版本失效的进程内缓存
+
+    用于缓存由数据库记录编译出来的只读对象（如费率卡），
+    版本号（通常是记录的 updated_at）变化时自动重建。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, builder):
+        """获取缓存对象，版本不一致时调用 builder 重建"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        value = builder()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def invalidate(self, key=None):
+        """使指定键（或全部）缓存失效"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class LRUCache:
+    """容量有限的进程内LRU缓存，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, builder):
+        """获取缓存对象，不存在时调用 builder 创建并放入缓存"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = builder()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, predicate=None):
+        """使满足 predicate(key) 的条目（或全部）缓存失效"""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+
+class LRUStore:
+    """进程内键值存储，接口与 CacheService 使用的缓存后端一致（get / set / delete / clear）
+
+    条目数超过 maxsize 时淘汰最久未使用的条目，timeout 为秒数（0 或 None 表示不过期）。
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """获取缓存值，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, timeout=None):
+        """写入缓存值"""
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """删除缓存值"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """清除全部缓存"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,206 @@
+import base64
+import gzip
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 压缩列式格式的版本标记，excel_content 以此开头时为压缩格式，否则为原来的 JSON
+CHART_FORMAT_PREFIX = 'zc1:'
+# 序列化时每累积这么多字符写入一次压缩流
+COMPRESS_CHUNK_SIZE = 64 * 1024
+# gzip 压缩级别，9 级比 6 级慢数倍而压缩后只小约2%
+COMPRESS_LEVEL = 6
+
+
+def is_compact_chart(excel_content):
+    """是否是压缩列式格式的分区表内容"""
+    return isinstance(excel_content, str) and excel_content.startswith(CHART_FORMAT_PREFIX)
+
+
+def _from_columns(table):
+    """将列式结构还原为记录列表"""
+    if 'rows' in table:
+        return table['rows']
+    columns = table['columns']
+    return [dict(zip(columns, values)) for values in zip(*table['values'])]
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class ChartWriter:
+    """逐行写入分区表内容，完成后编码为压缩列式格式
+
+    每列的值序列化为 JSON 后追加到该列的字节缓冲区，不保留逐个单元格的 Python 对象，
+    也不需要先构建完整的 DataFrame 或记录列表；各行的列不一致时退回逐行保存。
+    document 为 True 时编码为偏远邮编表的 {'headers', 'data'} 文档结构。
+    """
+
+    def __init__(self, document=False, headers=None):
+        self.document = document
+        self.headers = headers
+        self.columns = None
+        self.buffers = None
+        self.rows = None
+        self.count = 0
+
+    def append(self, row):
+        """写入一行记录"""
+        if self.rows is not None:
+            self.rows.append(row)
+            self.count += 1
+            return
+        keys = list(row.keys()) if isinstance(row, dict) else None
+        if self.columns is None and keys is not None:
+            self.columns = keys
+            self.buffers = [bytearray() for _ in keys]
+        if keys is None or keys != self.columns:
+            self.rows = self._buffered_rows() + [row]
+            self.columns = self.buffers = None
+            self.count += 1
+            return
+        separator = b',' if self.count else b''
+        for buffer, key in zip(self.buffers, keys):
+            buffer += separator
+            buffer += _encoder.encode(row[key]).encode('utf-8')
+        self.count += 1
+
+    def append_columns(self, columns, values):
+        """按列写入一批记录，values 为与 columns 对应的各列值列表，每列只序列化一次"""
+        count = len(values[0]) if values else 0
+        if not count:
+            return
+        if self.rows is not None or (self.columns is not None and list(columns) != self.columns):
+            for row in zip(*values):
+                self.append(dict(zip(columns, row)))
+            return
+        if self.columns is None:
+            self.columns = list(columns)
+            self.buffers = [bytearray() for _ in self.columns]
+        separator = b',' if self.count else b''
+        for buffer, column_values in zip(self.buffers, values):
+            buffer += separator
+            buffer += _encoder.encode(column_values)[1:-1].encode('utf-8')
+        self.count += count
+
+    def drop_columns(self, columns):
+        """删除指定的列"""
+        if self.rows is not None:
+            for row in self.rows:
+                if isinstance(row, dict):
+                    for column in columns:
+                        row.pop(column, None)
+            return
+        if self.columns is None:
+            return
+        keep = [i for i, column in enumerate(self.columns) if column not in columns]
+        self.columns = [self.columns[i] for i in keep]
+        self.buffers = [self.buffers[i] for i in keep]
+
+    def _buffered_rows(self):
+        """将已写入的列缓冲区还原为记录列表"""
+        if self.columns is None:
+            return []
+        values = [json.loads(b'[' + bytes(buffer) + b']') for buffer in self.buffers]
+        return [dict(zip(self.columns, row)) for row in zip(*values)]
+
+    def _chunks(self):
+        """按 JSON 文本顺序返回要写入压缩流的片段"""
+        if self.document:
+            yield '{"kind":"document","headers":' + _encoder.encode(self.headers) + ',"data":'
+        else:
+            yield '{"kind":"records","data":'
+        if self.columns is None:
+            yield from _encoder.iterencode({'rows': self.rows or []})
+        else:
+            yield '{"columns":' + _encoder.encode(self.columns) + ',"values":['
+            for i, buffer in enumerate(self.buffers):
+                yield (',[' if i else '[')
+                yield buffer
+                yield ']'
+            yield ']}'
+        yield '}'
+
+    def finish(self):
+        """编码为压缩列式格式的文本"""
+        output = io.BytesIO()
+        with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=COMPRESS_LEVEL, mtime=0) as stream:
+            pending = []
+            size = 0
+            for chunk in self._chunks():
+                if isinstance(chunk, bytearray):
+                    stream.write(''.join(pending).encode('utf-8'))
+                    stream.write(chunk)
+                    pending = []
+                    size = 0
+                    continue
+                pending.append(chunk)
+                size += len(chunk)
+                if size >= COMPRESS_CHUNK_SIZE:
+                    stream.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    size = 0
+            stream.write(''.join(pending).encode('utf-8'))
+        return CHART_FORMAT_PREFIX + base64.b64encode(output.getvalue()).decode('ascii')
+
+
+def encode_chart(content):
+    """将分区表内容编码为压缩列式格式
+
+    content 为记录列表（收件邮编分区表）或 {'headers': ..., 'data': [记录]}（偏远邮编表）。
+    列名只保存一次，每列的值连续存放，gzip 压缩后 base64 编码以便存入文本列。
+    """
+    if isinstance(content, dict) and isinstance(content.get('data'), list):
+        writer = ChartWriter(document=True, headers=content.get('headers'))
+        rows = content['data']
+    elif isinstance(content, list):
+        writer = ChartWriter()
+        rows = content
+    else:
+        raise ValueError('分区表内容必须是记录列表或包含data的文档')
+
+    for row in rows:
+        writer.append(row)
+    return writer.finish()
+
+
+def _decode_payload(excel_content):
+    raw = gzip.decompress(base64.b64decode(excel_content[len(CHART_FORMAT_PREFIX):]))
+    return json.loads(raw.decode('utf-8'))
+
+
+def decode_chart(excel_content):
+    """解码分区表内容，兼容压缩列式格式和原来的 JSON 文本，返回与原 JSON 相同的结构"""
+    if not isinstance(excel_content, str):
+        return excel_content
+    if not is_compact_chart(excel_content):
+        return json.loads(excel_content)
+
+    payload = _decode_payload(excel_content)
+    rows = _from_columns(payload['data'])
+    if payload.get('kind') == 'document':
+        return {'headers': payload.get('headers'), 'data': rows}
+    return rows
+
+
+def decode_chart_columns(excel_content, columns):
+    """直接读取分区表中指定列的值，返回 {列名: 值列表}，不构建逐行的字典
+
+    压缩列式格式直接取出列数组；原来的 JSON 文本或列不一致的表逐行取值，缺失的值为 None。
+    """
+    if is_compact_chart(excel_content):
+        payload = _decode_payload(excel_content)
+        table = payload['data']
+        if payload.get('kind') == 'records' and 'columns' in table:
+            count = len(table['values'][0]) if table['values'] else 0
+            return {
+                column: table['values'][table['columns'].index(column)] if column in table['columns'] else [None] * count
+                for column in columns
+            }
+        rows = _from_columns(table)
+    else:
+        rows = decode_chart(excel_content)
+    rows = [row for row in rows or [] if isinstance(row, dict)] if isinstance(rows, list) else []
+    return {column: [row.get(column) for row in rows] for column in columns}
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from flask_login import current_user
+from werkzeug.utils import secure_filename
+from app.extensions import db
+from app.models.import_job import ImportJob
+from app.utils.exceptions import BusinessError
+
+logger = logging.getLogger(__name__)
+
+# 导入任务线程池的默认线程数，可用 IMPORT_JOB_WORKERS 配置
+DEFAULT_IMPORT_JOB_WORKERS = 2
+# 未结束的任务超过这个时间（秒）没有更新，视为执行任务的工作进程已经退出，可用 IMPORT_JOB_STALE_SECONDS 配置
+DEFAULT_IMPORT_JOB_STALE_SECONDS = 3600
+# 进度写入数据库的最小间隔（秒）
+PROGRESS_INTERVAL = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(app):
+    """导入任务线程池，在第一次提交任务时创建（gunicorn 工作进程 fork 之后），每个进程一个"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = app.config.get('IMPORT_JOB_WORKERS', DEFAULT_IMPORT_JOB_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import-job')
+            logger.info(f"导入任务线程池已创建: {workers} 个线程")
+        return _executor
+
+
+def update_job(job_id, **values):
+    """在独立的连接和事务中更新任务状态，不会提前提交导入本身的会话事务"""
+    values['updated_at'] = datetime.now()
+    table = ImportJob.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.id == job_id).values(**values))
+
+
+class JobProgress:
+    """导入进度回调，调用方式为 progress(百分比, 步骤说明=None)
+
+    百分比限制在 0 到 99 之间（100 只在任务成功时写入），同一步骤内按 interval 节流写入数据库；
+    写入失败只记录日志，不影响导入。
+    """
+
+    def __init__(self, job_id, interval=PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self.percent = 0
+        self.message = None
+        self._written_at = None
+
+    def __call__(self, percent, message=None):
+        percent = max(0, min(99, int(percent)))
+        step_changed = message is not None and message != self.message
+        if not step_changed:
+            if percent <= self.percent:
+                return
+            if self._written_at is not None and time.monotonic() - self._written_at < self.interval:
+                return
+        self.percent = percent
+        values = {'progress': percent}
+        if step_changed:
+            self.message = message
+            values['message'] = message
+        try:
+            update_job(self.job_id, **values)
+            self._written_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"更新导入任务进度失败 {self.job_id}: {str(e)}")
+
+    def rows(self, count, total, start, end):
+        """按已处理行数和预计总行数换算为 start 到 end 之间的进度，总行数未知时不更新"""
+        if total:
+            self(start + (end - start) * min(count, total) / total)
+
+
+def submit_import_job(kind, file, handler, **kwargs):
+    """保存上传的文件并提交后台导入任务，返回 ImportJob
+
+    handler(path, file_name, progress, **kwargs) 在导入任务线程池中执行，返回可序列化为JSON的导入结果，
+    抛出 BusinessError 时以其消息作为任务的错误信息。
+    """
+    file_name = secure_filename(file.filename)
+    # 中文文件名经 secure_filename 处理后可能丢失扩展名，扩展名取自原文件名
+    suffix = os.path.splitext(file.filename)[1].lower()
+    fd, path = tempfile.mkstemp(prefix='import-', suffix=suffix)
+    os.close(fd)
+    try:
+        file.save(path)
+        job = ImportJob(
+            kind=kind,
+            file_name=file_name,
+            created_by=current_user.id if current_user.is_authenticated else None
+        )
+        db.session.add(job)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    logger.info(f"已提交导入任务 {job.id}: {kind} {file_name}")
+
+    app = current_app._get_current_object()
+    get_executor(app).submit(run_import_job, app, job.id, handler, path, file_name, kwargs)
+    return job
+
+
+def run_import_job(app, job_id, handler, path, file_name, kwargs):
+    """执行导入任务，结束后删除临时文件"""
+    with app.app_context():
+        try:
+            update_job(job_id, status=ImportJob.RUNNING, message='正在导入', started_at=datetime.now())
+            result = handler(path, file_name, JobProgress(job_id), **kwargs)
+            update_job(
+                job_id,
+                status=ImportJob.SUCCEEDED,
+                progress=100,
+                message=result.get('message', '导入成功'),
+                result=json.dumps(result, ensure_ascii=False),
+                finished_at=datetime.now()
+            )
+            logger.info(f"导入任务 {job_id} 完成")
+        except BusinessError as e:
+            db.session.rollback()
+            logger.warning(f"导入任务 {job_id} 失败: {e.message}")
+            _fail_job(job_id, e.message)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"导入任务 {job_id} 发生未预期的错误: {str(e)}", exc_info=True)
+            _fail_job(job_id, f'导入失败: {str(e)}')
+        finally:
+            db.session.remove()
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _fail_job(job_id, error):
+    try:
+        update_job(job_id, status=ImportJob.FAILED, message='导入失败', error=error, finished_at=datetime.now())
+    except Exception as e:
+        logger.error(f"保存导入任务 {job_id} 的失败状态失败: {str(e)}")
+
+
+def get_import_job(job_id):
+    """查询导入任务，长时间没有更新的未结束任务标记为失败"""
+    job = ImportJob.query.get(job_id)
+    if job is None:
+        return None
+    timeout = current_app.config.get('IMPORT_JOB_STALE_SECONDS', DEFAULT_IMPORT_JOB_STALE_SECONDS)
+    if job.is_stale(timeout):
+        logger.warning(f"导入任务 {job_id} 超过 {timeout} 秒没有更新，标记为失败")
+        job.status = ImportJob.FAILED
+        job.message = '导入失败'
+        job.error = '导入任务已中断，请重新导入'
+        job.finished_at = datetime.now()
+        db.session.commit()
+    return job
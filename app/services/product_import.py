@@ -0,0 +1,58 @@
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 产品Excel预览的 pandas 显示选项；导入任务在线程中执行，用 option_context 只在格式化期间生效，不修改全局选项
+DISPLAY_OPTIONS = (
+    'display.max_columns', None,        # 显示所有列
+    'display.width', None,              # 不限制显示宽度
+    'display.max_rows', None,           # 显示所有行
+    'display.max_colwidth', None,       # 不限制列宽
+    'display.expand_frame_repr', False, # 不换行显示
+    'display.unicode.ambiguous_as_wide', True,  # 处理中文对齐
+    'display.unicode.east_asian_width', True,   # 处理中文对齐
+    'display.float_format', lambda x: '%.4f' % x if pd.notnull(x) else '',  # 统一数字格式化
+)
+
+
+def format_sheet(df):
+    """将一个sheet格式化为按列对齐的文本"""
+    # 计算每列的最大宽度（考虑中文字符）
+    max_lengths = {}
+    for col in df.columns:
+        max_lengths[col] = max(
+            len(str(col)),
+            df[col].astype(str).apply(lambda x: sum(2 if ord(c) > 127 else 1 for c in str(x))).max()
+        )
+
+    with pd.option_context(*DISPLAY_OPTIONS):
+        return df.to_string(
+            index=True,
+            justify='right',
+            col_space=max_lengths,
+            max_colwidth=None,  # 不限制列宽
+            na_rep='',
+            max_rows=None,      # 显示所有行
+            max_cols=None       # 显示所有列
+        )
+
+
+def preview_product_workbook(path, file_name, progress):
+    """读取产品Excel文件的所有sheet并格式化为预览文本（导入任务），返回导入结果"""
+    logger.info(f'开始读取Excel文件: {file_name}')
+    progress(0, '正在读取Excel文件')
+    df_dict = pd.read_excel(path, sheet_name=None)
+    logger.info(f'Excel文件包含以下sheet: {list(df_dict.keys())}')
+
+    result = []
+    for i, (sheet_name, df) in enumerate(df_dict.items()):
+        logger.info(f'处理sheet: {sheet_name}, 行数: {len(df)}')
+        progress(50 + 50 * i / len(df_dict), f'正在处理sheet: {sheet_name}')
+        result.append(f"{sheet_name}\n{format_sheet(df)}\n")
+        logger.info(f'sheet {sheet_name} 转换完成')
+
+    return {
+        'message': '成功读取Excel文件',
+        'data': '\n\n'.join(result)
+    }
@@ -0,0 +1,37 @@
+import hashlib
+import logging
+from app.services.cache import CacheService, LRUStore
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CACHE_SIZE = 20000
+QUOTE_CACHE_TIMEOUT = 1800
+
+quote_cache = CacheService(LRUStore(maxsize=QUOTE_CACHE_SIZE))
+
+
+def quote_cache_key(product, snapshot, zone, weight_lb, length_inch, width_inch, height_inch,
+                    is_remote=False, is_residential=True, remote_type=None):
+    """生成单区域报价的缓存键
+
+    体积重量、计费重量和周长都由尺寸、实重和产品的体积重系数推导，不再单独放入键中；
+    产品版本（updated_at）、燃油费率（ID、费率值和更新时间）和计费日期保证费率变化后不会命中旧结果，
+    原地修改燃油费率百分比时ID不变，因此费率值和更新时间也要放入键中。
+    产品未保存（没有ID）时返回 None，不缓存。
+    """
+    if product.id is None:
+        return None
+    version = product.updated_at.isoformat() if product.updated_at else ''
+    fuel_version = snapshot.fuel_rate_updated_at.isoformat() if snapshot.fuel_rate_updated_at else ''
+    parts = (
+        product.id, version, length_inch, width_inch, height_inch, weight_lb, zone,
+        bool(is_remote), remote_type, bool(is_residential),
+        snapshot.fuel_rate_id, snapshot.fuel_rate, fuel_version, snapshot.as_of.isoformat()
+    )
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def invalidate_quote_cache():
+    """清除全部报价缓存（燃油费率变化时调用）"""
+    quote_cache.clear_all_cache()
+    logger.info("报价缓存已清除")
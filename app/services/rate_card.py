@@ -0,0 +1,149 @@
+import json
+import logging
+import re
+from bisect import bisect_left, bisect_right
+import numpy as np
+from app.services.cache import VersionedCache
+from app.utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+_ZONE_KEY_PATTERN = re.compile(r'^(?:zone)?\s*(\d+)$', re.IGNORECASE)
+
+
+def parse_zone_number(value):
+    """解析区域编号，兼容 2 / '2' / 'Zone2' / 'Zone 2' 等写法"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _ZONE_KEY_PATTERN.match(str(value).strip())
+    return int(match.group(1)) if match else None
+
+
+def chart_zone_number(label):
+    """解析分区表中匹配到的区域值为整数，无法解析时抛出 ValidationError
+
+    分区表的各种查找方式（区间索引、分区数组、分区范围表）都用它统一返回的区域类型，
+    匹配到范围但区域值无效属于分区表的错误，不能当作目的邮编不存在。
+    """
+    zone = parse_zone_number(label)
+    if zone is None:
+        raise ValidationError(f'分区表中的区域值无效: {label}，请检查分区表')
+    return zone
+
+
+class RateCard:
+    """编译后的产品费率卡
+
+    将 Product.zone_rates 解析一次，按区域保存升序的重量数组和对应的价格数组，
+    查找重量档位时使用二分查找，避免每次请求都重新解析和排序费率表。
+    """
+
+    def __init__(self, zone_rates):
+        if isinstance(zone_rates, str):
+            zone_rates = json.loads(zone_rates) if zone_rates.strip() else []
+
+        by_zone = {}
+        for row in zone_rates or []:
+            try:
+                weight = float(row.get('weight', 0))
+            except (TypeError, ValueError):
+                logger.warning(f"跳过重量无效的费率行: {row}")
+                continue
+
+            for key, value in row.items():
+                if key == 'weight':
+                    continue
+                zone = parse_zone_number(key)
+                if zone is None or value is None or value == '':
+                    continue
+                try:
+                    by_zone.setdefault(zone, []).append((weight, float(value)))
+                except (TypeError, ValueError):
+                    logger.warning(f"跳过无效的费率: 重量 {weight}, 区域 {key}, 值 {value}")
+
+        self._weights = {}
+        self._prices = {}
+        for zone, pairs in by_zone.items():
+            # 稳定排序，重量相同时保留费率表中先出现的行
+            pairs.sort(key=lambda pair: pair[0])
+            self._weights[zone] = [weight for weight, _ in pairs]
+            self._prices[zone] = [price for _, price in pairs]
+
+    def __bool__(self):
+        return bool(self._weights)
+
+    @property
+    def zones(self):
+        """费率卡中包含的区域"""
+        return sorted(self._weights)
+
+    def zone_table(self, zone):
+        """返回指定区域的 (重量数组, 价格数组)"""
+        zone_number = parse_zone_number(zone)
+        weights = self._weights.get(zone_number)
+        if not weights:
+            raise ValidationError(f'区域{zone}的费率未设置')
+        return weights, self._prices[zone_number]
+
+    def lookup(self, zone, weight):
+        """按重量档位查找运费
+
+        精确匹配时使用该档位，否则使用下一档位，超出费率表时使用最高档位。
+        """
+        weights, prices = self.zone_table(zone)
+        idx = bisect_left(weights, weight)
+        if idx == len(weights):
+            idx -= 1
+        return prices[idx]
+
+    def lookup_array(self, zones, weights):
+        """向量化版本的 lookup，费率卡中没有的区域返回 NaN"""
+        zones = np.asarray(zones)
+        weights = np.asarray(weights, dtype=float)
+        prices = np.full(weights.shape, np.nan)
+        for zone in np.unique(zones):
+            zone_weights = self._weights.get(int(zone))
+            if not zone_weights:
+                continue
+            mask = zones == zone
+            idx = np.searchsorted(zone_weights, weights[mask], side='left')
+            idx = np.minimum(idx, len(zone_weights) - 1)
+            prices[mask] = np.asarray(self._prices[int(zone)])[idx]
+        return prices
+
+    def interpolate(self, zone, weight, tolerance=0.01):
+        """按重量线性插值计算运费
+
+        低于最小重量时使用最小档位，高于最大重量时使用最高档位。
+        """
+        weights, prices = self.zone_table(zone)
+        if weight < weights[0]:
+            return prices[0]
+        if weight > weights[-1]:
+            return prices[-1]
+
+        idx = bisect_left(weights, weight - tolerance)
+        if idx < len(weights) and abs(weights[idx] - weight) < tolerance:
+            return prices[idx]
+
+        upper = bisect_right(weights, weight)
+        lower = upper - 1
+        weight_ratio = (weight - weights[lower]) / (weights[upper] - weights[lower])
+        return round(prices[lower] + (prices[upper] - prices[lower]) * weight_ratio, 2)
+
+
+_rate_cards = VersionedCache()
+
+
+def get_rate_card(product):
+    """获取产品的费率卡，按 (product.id, product.updated_at) 缓存"""
+    if product.id is None:
+        return RateCard(product.zone_rates)
+    return _rate_cards.get(product.id, product.updated_at, lambda: RateCard(product.zone_rates))
+
+
+def invalidate_rate_card(product_id=None):
+    """使产品费率卡缓存失效"""
+    _rate_cards.invalidate(product_id)
@@ -0,0 +1,349 @@
+import json
+import logging
+from bisect import bisect_right
+from datetime import datetime
+import numpy as np
+from app.services.cache import VersionedCache
+from app.services.rate_card import parse_zone_number
+
+logger = logging.getLogger(__name__)
+
+
+class Condition:
+    """数值区间条件: low < value ≤ high（high_inclusive=False 时为 value < high）"""
+
+    def __init__(self, measure, low=None, high=None, high_inclusive=True):
+        self.measure = measure
+        self.low = low
+        self.high = high
+        self.high_inclusive = high_inclusive
+
+    def matches(self, measures):
+        value = measures[self.measure]
+        if self.low is not None and not value > self.low:
+            return False
+        if self.high is None:
+            return True
+        return value <= self.high if self.high_inclusive else value < self.high
+
+    def mask(self, measures):
+        """向量化版本的 matches，measures 中的值为 NumPy 数组，返回布尔数组"""
+        value = measures[self.measure]
+        result = value > self.low if self.low is not None else np.ones(value.shape, dtype=bool)
+        if self.high is not None:
+            result &= value <= self.high if self.high_inclusive else value < self.high
+        return result
+
+
+# 包裹度量: weight(实重磅) / length(最长边英寸) / width(第二长边英寸) / length_girth(长+周长英寸)
+OVERSIZE_LENGTH_GIRTH = Condition('length_girth', 130, 165)
+OVERSIZE_LENGTH = Condition('length', 96, 108)
+OVERSIZE_MIN_WEIGHT = 90
+RESIDENTIAL_HOME_DELIVERY_MAX_WEIGHT = 70
+
+# (名称关键字, 条件, 原因)
+HANDLING_PATTERNS = [
+    ('weight: 50磅＜实际重量＜150磅', Condition('weight', 50, 150, high_inclusive=False), '重量处理费'),
+    ('48英寸＜最长边 ≤96英寸', Condition('length', 48, 96), '最长边处理费'),
+    ('105英寸＜长+周长[2*(宽+高)]≤130英寸', Condition('length_girth', 105, 130), '长度+周长处理费'),
+    ('第二长边＞30英寸', Condition('width', 30), '第二长边处理费'),
+]
+
+OVERSIZE_PATTERNS = [
+    ('130英寸＜长+[2*(宽+高)]≤165英寸', OVERSIZE_LENGTH_GIRTH, '超大超尺寸费'),
+    ('96英寸＜最长边≤108英寸', OVERSIZE_LENGTH, '超大超尺寸费'),
+]
+
+# (名称关键字, 条件, 原因模板)
+UNAUTHORIZED_PATTERNS = [
+    ('最长边+周长＞165英寸', Condition('length_girth', 165), '包裹长度+周长({value}英寸)超过165英寸'),
+    ('最长边＞108英寸', Condition('length', 108), '包裹最长边({value}英寸)超过108英寸'),
+    ('实重＞150磅', Condition('weight', 150), '包裹实际重量({value}磅)超过150磅'),
+]
+
+# (remote_type, 是否住宅) -> (名称关键字, 服务类型)
+REMOTE_PATTERNS = {
+    ('DAS', True): ('Residential (FedEx Home Delivery)', 'Residential Home Delivery'),
+    ('DAS_EXT', True): ('Extended Residential (FedEx Home Delivery)', 'Extended Residential Home Delivery'),
+    ('DAS_Remote', True): ('远端地带-DAS Remote Resi (FedEx Home Delivery)', 'Remote Residential Home Delivery'),
+    ('DAS', False): ('Commercial(FedEx Ground)', 'Commercial'),
+    ('DAS_EXT', False): ('Extended Commercial(FedEx Ground)', 'Extended Commercial'),
+    ('DAS_Remote', False): ('远端地带-DAS Remote Comm(FedEx Ground)', 'Remote Commercial'),
+    ('DAS_Alaska', False): ('DAS Alaska Comm', 'Alaska Commercial'),
+    ('DAS_Hawaii', False): ('DAS Hawaii Comm', 'Hawaii Commercial'),
+}
+
+FUEL_KEYWORDS = ['fuel', '燃油', '燃料']
+
+
+def fee_vector(fees):
+    """将 {'2': '8.49', ...} 转换为按区域编号索引的费用向量"""
+    parsed = {}
+    for key, value in (fees or {}).items():
+        zone = parse_zone_number(key)
+        if zone is None or value is None or value == '':
+            continue
+        try:
+            parsed[zone] = float(value)
+        except (TypeError, ValueError):
+            logger.warning(f"跳过无效的附加费: 区域 {key}, 值 {value}")
+
+    vector = [None] * (max(parsed) + 1 if parsed else 0)
+    for zone, value in parsed.items():
+        vector[zone] = value
+    return tuple(vector)
+
+
+class PssSchedule:
+    """PSS期间区间索引
+
+    pss_periods 在编译时解析一次，拆分为互不重叠的基本区间（按日期序数排序），
+    每个基本区间取原列表中第一个覆盖它的期间的金额，查询时一次二分查找即可，
+    结果与按列表顺序逐个比较日期相同。
+    """
+
+    def __init__(self, pss_periods):
+        periods = []
+        for period in pss_periods or []:
+            try:
+                start = datetime.strptime(period['start_date'], '%Y-%m-%d').date().toordinal()
+                end = datetime.strptime(period['end_date'], '%Y-%m-%d').date().toordinal()
+                periods.append((start, end, float(period['amount'])))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"PSS期间数据错误: {period}, {e}")
+
+        # 基本区间 [bounds[i], bounds[i+1]) 的金额为 amounts[i]
+        self.bounds = sorted({start for start, end, _ in periods if start <= end} |
+                             {end + 1 for start, end, _ in periods if start <= end})
+        self.amounts = []
+        for point in self.bounds[:-1]:
+            amount = next((amount for start, end, amount in periods if start <= point <= end), 0.0)
+            self.amounts.append(amount)
+
+    def __bool__(self):
+        return bool(self.amounts)
+
+    def amount(self, current_date):
+        """获取指定日期生效的PSS金额，没有生效期间时返回0"""
+        if isinstance(current_date, datetime):
+            current_date = current_date.date()
+        idx = bisect_right(self.bounds, current_date.toordinal()) - 1
+        if idx < 0 or idx >= len(self.amounts):
+            return 0.0
+        return self.amounts[idx]
+
+
+class Charge:
+    """附加费项目：触发条件和按区域索引的费用向量"""
+
+    def __init__(self, name, condition, fees, reason=None):
+        self.name = name
+        self.condition = condition
+        self.fees = fee_vector(fees)
+        self.reason = reason
+
+    def fee(self, zone):
+        """获取指定区域的费用，未设置时返回None"""
+        zone_number = parse_zone_number(zone)
+        if zone_number is None or zone_number >= len(self.fees):
+            return None
+        return self.fees[zone_number]
+
+    def fee_array(self, zones):
+        """向量化版本的 fee，zones 为整数区域数组，未设置的区域为 NaN"""
+        table = np.array([np.nan if fee is None else fee for fee in self.fees] + [np.nan], dtype=float)
+        zones = np.asarray(zones)
+        index = np.where((zones >= 0) & (zones < len(self.fees)), zones, len(self.fees))
+        return table[index]
+
+    def describe(self, measures):
+        """根据包裹度量生成原因描述"""
+        return self.reason.format(value=measures[self.condition.measure])
+
+
+class SurchargeRule:
+    """附加费类别规则"""
+
+    def __init__(self, title, pss_periods, charges):
+        self.title = title
+        self.pss = PssSchedule(pss_periods)
+        self.charges = charges
+
+    def __bool__(self):
+        return bool(self.charges)
+
+    def match(self, measures):
+        """返回第一个满足条件的附加费项目"""
+        return next((charge for charge in self.charges if charge.condition.matches(measures)), None)
+
+    def charge_for(self, measure):
+        """返回按指定度量触发的附加费项目"""
+        return next((charge for charge in self.charges if charge.condition.measure == measure), None)
+
+    def pss_amount(self, current_date):
+        return self.pss.amount(current_date)
+
+
+class RemoteRule(SurchargeRule):
+    """偏远地区附加费规则，按 (remote_type, 是否住宅) 查找费率项"""
+
+    def __init__(self, title, pss_periods, items):
+        charges = {}
+        for key, (keyword, service_type) in REMOTE_PATTERNS.items():
+            item = next((item for item in items if keyword in item.get('name', '')), None)
+            if item:
+                charges[key] = Charge(item['name'], None, item.get('fees'), service_type)
+
+        # CalculationService 按 (服务, 地址类型) 查找远端地带费率项
+        service_charges = {}
+        for service_key in ['Ground', 'Home Delivery']:
+            for delivery_type in ['Commercial', 'Residential']:
+                item = next((item for item in items
+                             if '远端地带' in item.get('name', '') and
+                             service_key in item['name'] and
+                             delivery_type in item['name']), None)
+                if item:
+                    service_charges[(service_key, delivery_type)] = Charge(item['name'], None, item.get('fees'))
+
+        super().__init__(title, pss_periods, list(charges.values()))
+        self.charges_by_type = charges
+        self.service_charges = service_charges
+
+    def charge_for_type(self, remote_type, is_residential):
+        return self.charges_by_type.get((remote_type, bool(is_residential)))
+
+
+class FuelRule(SurchargeRule):
+    """燃油附加费规则"""
+
+    def __init__(self, title, pss_periods, items):
+        super().__init__(title, pss_periods, [])
+        self.items = []
+        self.default_item = None
+        for item in items:
+            valid_from = item.get('valid_from', item.get('start_date'))
+            valid_to = item.get('valid_to', item.get('end_date'))
+            try:
+                valid_from = datetime.strptime(valid_from, '%Y-%m-%d').date() if valid_from else None
+                valid_to = datetime.strptime(valid_to, '%Y-%m-%d').date() if valid_to else None
+            except (TypeError, ValueError):
+                logger.warning(f"燃油附加费有效期格式错误: {item}")
+                valid_from = valid_to = None
+            compiled = {
+                'valid_from': valid_from,
+                'valid_to': valid_to,
+                'rate': float(item.get('rate', 0) or 0),
+                'min_charge': float(item.get('min_charge', 0) or 0),
+                'calculation_method': item.get('calculation_method', 'percentage')
+            }
+            self.items.append(compiled)
+            if self.default_item is None and (
+                    'default' in item.get('name', '').lower() or 'default' in item.get('description', '').lower()):
+                self.default_item = compiled
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def rate_item(self, current_date):
+        """获取指定日期适用的燃油费率项，没有时使用默认费率项"""
+        if isinstance(current_date, datetime):
+            current_date = current_date.date()
+        for item in self.items:
+            if item['valid_from'] and item['valid_to'] and item['valid_from'] <= current_date <= item['valid_to']:
+                return item
+        return self.default_item
+
+
+class SurchargeRules:
+    """编译后的产品附加费规则集
+
+    将 Product.surcharges 中按中文标题和项目名称组织的数据编译为类型化的规则，
+    计费时只需比较数值，不再进行字符串匹配和 float() 解析。
+    """
+
+    def __init__(self, surcharges):
+        if isinstance(surcharges, str):
+            surcharges = json.loads(surcharges) if surcharges.strip() else []
+        surcharges = [category for category in surcharges or [] if isinstance(category, dict)]
+
+        self.handling = None
+        self.oversize_residential = None
+        self.oversize_commercial = None
+        self.residential = None
+        self.remote = None
+        self.unauthorized = None
+        self.fuel = None
+
+        for category in surcharges:
+            title = category.get('title', '') or ''
+            items = category.get('items', []) or []
+            pss_periods = category.get('pss_periods')
+
+            if self.handling is None and title == '1. 额外处理费(Additional Handling Surcharge)':
+                self.handling = SurchargeRule(title, pss_periods, self._compile_charges(items, HANDLING_PATTERNS))
+            elif '超大超尺寸费(Oversize-住宅地址)' in title or '超大超尺寸费(Oversize-商业地址)' in title:
+                rule = SurchargeRule(title, pss_periods, self._compile_charges(items, OVERSIZE_PATTERNS))
+                if '住宅地址' in title and not self.oversize_residential:
+                    self.oversize_residential = rule
+                elif '商业地址' in title and not self.oversize_commercial:
+                    self.oversize_commercial = rule
+            elif self.residential is None and title.startswith('4. 住宅地址附加费'):
+                self.residential = SurchargeRule(title, pss_periods, self._compile_residential(items))
+            elif self.remote is None and title.startswith('5. 偏远地区附加费'):
+                self.remote = RemoteRule(title, pss_periods, items)
+            elif self.unauthorized is None and title.startswith('增值服务费项目'):
+                item = next((item for item in items if item.get('name') == '5. 不可发包裹(Unauthorized)'), None)
+                if item:
+                    self.unauthorized = SurchargeRule(
+                        item['name'], item.get('pss_periods'),
+                        self._compile_charges(item.get('items', []) or [], UNAUTHORIZED_PATTERNS))
+            elif self.fuel is None and any(keyword in title.lower() for keyword in FUEL_KEYWORDS):
+                self.fuel = FuelRule(title, pss_periods, items)
+
+    @staticmethod
+    def _compile_charges(items, patterns):
+        charges = []
+        for item in items:
+            name = item.get('name', '') or ''
+            for keyword, condition, reason in patterns:
+                if keyword in name:
+                    charges.append(Charge(name, condition, item.get('fees'), reason))
+                    break
+        return charges
+
+    @staticmethod
+    def _compile_residential(items):
+        charges = []
+        home = next((item for item in items if item.get('name') == 'FedEx Home Delivery'), None)
+        if home:
+            charges.append(Charge(home['name'], Condition('weight', None, RESIDENTIAL_HOME_DELIVERY_MAX_WEIGHT),
+                                  home.get('fees'), 'Home Delivery'))
+        ground = next((item for item in items if item.get('name') == 'FedEx Commercial Ground'), None)
+        if ground:
+            charges.append(Charge(ground['name'], Condition('weight', RESIDENTIAL_HOME_DELIVERY_MAX_WEIGHT),
+                                  ground.get('fees'), 'Commercial Ground'))
+        return charges
+
+    def oversize(self, is_residential):
+        return self.oversize_residential if is_residential else self.oversize_commercial
+
+    def all_rules(self):
+        """返回已配置的全部附加费类别规则"""
+        rules = [self.handling, self.oversize_residential, self.oversize_commercial,
+                 self.residential, self.remote, self.unauthorized, self.fuel]
+        return [rule for rule in rules if rule is not None]
+
+
+_surcharge_rules = VersionedCache()
+
+
+def get_surcharge_rules(product):
+    """获取产品的附加费规则集，按 (product.id, product.updated_at) 缓存"""
+    if product.id is None:
+        return SurchargeRules(product.surcharges)
+    return _surcharge_rules.get(product.id, product.updated_at, lambda: SurchargeRules(product.surcharges))
+
+
+def invalidate_surcharge_rules(product_id=None):
+    """使产品附加费规则缓存失效"""
+    _surcharge_rules.invalidate(product_id)
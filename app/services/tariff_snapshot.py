@@ -0,0 +1,103 @@
+import logging
+from datetime import date, datetime, time
+from flask import g, has_app_context
+from app.extensions import db
+from app.models.fuel_rate import FuelRate
+from app.services.cache import LRUCache
+from app.services.surcharge_rules import get_surcharge_rules
+from app.utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_as_of(value):
+    """解析计费日期，未提供时为今天"""
+    if value is None or value == '':
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(f'无效的计费日期格式: {value}，应为YYYY-MM-DD')
+
+
+def find_fuel_rate(as_of):
+    """查找指定日期生效的燃油费率（最近生效且未失效的启用费率）"""
+    day_end = datetime.combine(as_of, time.max)
+    day_start = datetime.combine(as_of, time.min)
+    return FuelRate.query.filter(
+        FuelRate.is_active == True,
+        FuelRate.effective_date <= day_end,
+        db.or_(FuelRate.expiry_date == None, FuelRate.expiry_date >= day_start)
+    ).order_by(FuelRate.effective_date.desc()).first()
+
+
+def fuel_rate_version():
+    """燃油费率表的版本：(最后更新时间, 行数)
+
+    新增、修改、停用和删除燃油费率都会改变版本，作为费率快照缓存键的一部分，使所有工作进程
+    （gunicorn 多个进程各自缓存快照）在燃油费率变化后都重新创建快照。每个请求只查询一次。
+    """
+    if has_app_context() and 'fuel_rate_version' in g:
+        return g.fuel_rate_version
+    latest, count = db.session.query(db.func.max(FuelRate.updated_at), db.func.count(FuelRate.id)).one()
+    version = (latest, count)
+    if has_app_context():
+        g.fuel_rate_version = version
+    return version
+
+
+class TariffSnapshot:
+    """指定日期生效的产品费率快照
+
+    冻结计费中所有与日期相关的部分：各附加费类别的PSS金额、燃油费率和产品燃油附加费项，
+    同一产品同一天的所有包裹共享一个快照。
+    """
+
+    def __init__(self, rules, as_of, fuel_rate=None, fuel_rate_id=None, fuel_rate_updated_at=None):
+        self.rules = rules
+        self.as_of = as_of
+        self.fuel_rate = fuel_rate
+        self.fuel_rate_id = fuel_rate_id
+        self.fuel_rate_updated_at = fuel_rate_updated_at
+        self.fuel_item = rules.fuel.rate_item(as_of) if rules.fuel else None
+        self._pss = {rule: rule.pss_amount(as_of) for rule in rules.all_rules()}
+
+    def pss_amount(self, rule):
+        """获取附加费类别在快照日期的PSS金额"""
+        return self._pss.get(rule, 0.0) if rule is not None else 0.0
+
+
+_snapshots = LRUCache(maxsize=256)
+
+
+def get_tariff_snapshot(product, as_of=None):
+    """获取产品在指定日期的费率快照，按 (产品, 产品版本, 日期, 燃油费率版本) 缓存"""
+    as_of = parse_as_of(as_of)
+
+    def build():
+        current_fuel_rate = find_fuel_rate(as_of)
+        logger.info(f"创建费率快照: 产品 {product.id}, 日期 {as_of}, 燃油费率 "
+                    f"{current_fuel_rate.rate if current_fuel_rate else '-'}")
+        if current_fuel_rate is None:
+            return TariffSnapshot(get_surcharge_rules(product), as_of)
+        return TariffSnapshot(get_surcharge_rules(product), as_of,
+                              current_fuel_rate.rate, current_fuel_rate.id, current_fuel_rate.updated_at)
+
+    if product.id is None:
+        return build()
+    return _snapshots.get((product.id, product.updated_at, as_of, fuel_rate_version()), build)
+
+
+def invalidate_tariff_snapshots(product_id=None):
+    """使本进程的费率快照失效，燃油费率变化时使全部快照失效
+
+    只是及时释放旧快照；其他工作进程通过缓存键中的产品版本和燃油费率版本发现变化。
+    """
+    if product_id is None:
+        _snapshots.invalidate()
+    else:
+        _snapshots.invalidate(lambda key: key[0] == product_id)
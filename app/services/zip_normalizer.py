@@ -0,0 +1,123 @@
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 每次规范化的行数，按块处理使内存占用与文件大小无关
+NORMALIZE_CHUNK_ROWS = 5000
+# 列名包含这些关键字的列视为邮编列
+ZIP_COLUMN_KEYWORDS = ('ZIP', 'zip', '邮编')
+
+
+def detect_columns(columns, column_mappings, ignore_case=False):
+    """按 column_mappings 识别列，返回 {原列名: 目标列名}
+
+    column_mappings 为 {目标列名: [可能的原列名]}，每个目标列取表中第一个匹配的列，比较时去除两端空白。
+    """
+    def key(name):
+        return name.strip().lower() if ignore_case else name.strip()
+
+    renames = {}
+    for target_col, possible_names in column_mappings.items():
+        candidates = {key(name) for name in possible_names}
+        for col_name in columns:
+            if key(col_name) in candidates:
+                renames[col_name] = target_col
+                break
+    return renames
+
+
+def keyword_zip_columns(columns, renames=None):
+    """邮编列：原列名包含邮编关键字，或重命名后为 colN 的列，返回重命名后的列名"""
+    renames = renames or {}
+    return [
+        renames.get(col, col) for col in columns
+        if any(name in col for name in ZIP_COLUMN_KEYWORDS) or renames.get(col, col).startswith('col')
+    ]
+
+
+# 可以使用 .str 方法的列类型
+_TEXT_DTYPES = ('string', 'empty', 'mixed', 'mixed-integer')
+
+
+def _text(values):
+    """列中有文本时返回 values.str，全是数字或空值的列返回 None"""
+    if pd.api.types.infer_dtype(values, skipna=True) not in _TEXT_DTYPES:
+        return None
+    return values.str
+
+
+class ZipNormalizer:
+    """邮编表的向量化规范化
+
+    按块把行数据转换为 DataFrame，用 pandas .str 方法一次处理整列：重命名识别出的列、去除空白、
+    数字邮编补齐5位、规范化邮编范围（起止邮编两侧去除空白），并记录每列是否出现过非空值，
+    全部处理完后由调用方删除空列。
+
+    source_columns 为读取到的列名，renames 为 detect_columns 的结果，exclude 中的原列名不输出；
+    zip_columns 和 range_columns 使用重命名后的列名；pad_max_length 不为 None 时只补齐不超过该长度的数字。
+    """
+
+    def __init__(self, source_columns, renames=None, exclude=(), strip=True, zip_columns=(),
+                 pad_max_length=None, range_columns=()):
+        renames = renames or {}
+        self.source_columns = list(source_columns)
+        self.selected = [col for col in self.source_columns if col not in set(exclude)]
+        self.columns = [renames.get(col, col) for col in self.selected]
+        self.strip = strip
+        self.zip_columns = [col for col in self.columns if col in set(zip_columns)]
+        self.pad_max_length = pad_max_length
+        self.range_columns = [col for col in self.columns if col in set(range_columns)]
+        self._nonempty = set()
+
+    def normalize(self, rows):
+        """规范化一块行数据，rows 为与 source_columns 对应的单元格值列表，返回 DataFrame"""
+        frame = pd.DataFrame(rows, columns=self.source_columns, dtype=object)[self.selected]
+        frame.columns = self.columns
+
+        for col in self.columns:
+            text = _text(frame[col])
+            if text is None:
+                continue
+            if self.strip:
+                frame[col] = text.strip()
+            if col in self.zip_columns:
+                self._pad(frame, col)
+            if col in self.range_columns:
+                self._join_range(frame, col)
+
+        nonempty = (frame.notna() & frame.ne('')).any()
+        self._nonempty.update(nonempty[nonempty].index)
+        return frame
+
+    def _pad(self, frame, col):
+        """数字邮编补齐5位，只对需要补零的单元格调用 zfill"""
+        values = frame[col]
+        digits = values.str.isdigit().fillna(False).astype(bool)
+        if self.pad_max_length is not None:
+            digits &= (values.str.len() <= self.pad_max_length).fillna(False).astype(bool)
+        if digits.any():
+            frame.loc[digits, col] = values[digits].str.zfill(5)
+
+    def _join_range(self, frame, col):
+        """起止邮编两侧去除空白后重新连接，不是 起始-结束 格式的单元格保持不变"""
+        values = frame[col]
+        parts = values.str.split('-')
+        is_range = (parts.str.len() == 2).fillna(False).astype(bool)
+        if is_range.any():
+            frame[col] = values.mask(is_range, parts.str[0].str.strip() + '-' + parts.str[1].str.strip())
+
+    def write(self, chunks, writer, progress=None):
+        """规范化每块行数据并按列写入 ChartWriter，返回写入的行数；progress 不为 None 时每块之后以已写入行数调用"""
+        count = 0
+        for rows in chunks:
+            frame = self.normalize(rows)
+            writer.append_columns(self.columns, [frame[col].tolist() for col in self.columns])
+            count += len(frame)
+            if progress is not None:
+                progress(count)
+        return count
+
+    def empty_columns(self):
+        """已处理的数据中没有任何非空值的列"""
+        return [col for col in self.columns if col not in self._nonempty]
@@ -0,0 +1,155 @@
+import json
+import logging
+import mmap
+import os
+import tempfile
+import numpy as np
+from flask import current_app
+from app.services.rate_card import chart_zone_number
+
+logger = logging.getLogger(__name__)
+
+# 5位邮编空间，数组下标即目的邮编
+ZONE_ARRAY_SIZE = 100000
+# 一个字节最多表示255个不同的区域值，0 表示邮编不在任何范围内
+MAX_ZONE_LABELS = 255
+
+
+def zone_array_dir():
+    """分区数组文件所在目录"""
+    return current_app.config.get('ZONE_ARRAY_DIR') or os.path.join(current_app.instance_path, 'zone_arrays')
+
+
+def zone_array_path(start_code, directory=None):
+    """起始邮编的分区数组文件路径"""
+    return os.path.join(directory or zone_array_dir(), f'{start_code}.zones')
+
+
+def is_zip5(value):
+    """是否是5位数字邮编"""
+    return isinstance(value, str) and len(value) == 5 and value.isascii() and value.isdigit()
+
+
+def zip5_bounds(start, end):
+    """将按字符串比较的邮编范围换算为5位邮编空间内的整数闭区间
+
+    分区表中的范围可能是3位前缀（如 005-299），5位邮编按字符串比较落在其中的恰好是
+    00500 到 29899 这个连续区间。范围包含非数字字符或不包含任何5位邮编时返回 None。
+    """
+    if not (start.isascii() and start.isdigit() and end.isascii() and end.isdigit()):
+        return None
+    dest_start = int(start.ljust(5, '0')) if len(start) <= 5 else int(start[:5]) + 1
+    if len(end) < 5:
+        dest_end = int(end.ljust(5, '0')) - 1
+    else:
+        dest_end = int(end[:5])
+    if dest_start > dest_end:
+        return None
+    return dest_start, dest_end
+
+
+def compile_zone_array(zone_index, base=None, intervals=None):
+    """将分区索引编译为 100000 项的 uint8 数组
+
+    数组第 i 项为目的邮编 i（补齐5位）对应区域在 labels 中的序号加1，0 表示没有匹配的范围。
+    区域值保持分区表中的原始值（如 3 / '3' / 'Zone3'，无效的值也保留），放在 labels 中，查找时再解析。
+    各范围用 zip5_bounds 换算为整数区间后按分区表顺序倒序整段赋值，范围重叠时表中顺序靠前的范围生效，
+    与区间索引的查找结果一致；包含非数字字符的范围不匹配任何5位邮编，与分区范围表一致。
+    base 为已有的 (codes, labels) 时只替换 intervals 中的邮编闭区间，其余邮编保持不变。
+    """
+    labels = list(base[1]) if base is not None else []
+    label_codes = {json.dumps(zone): i + 1 for i, zone in enumerate(labels)}
+
+    codes = np.zeros(ZONE_ARRAY_SIZE, dtype=np.uint8)
+    for start, end, zone in reversed(zone_index.ranges):
+        bounds = zip5_bounds(start, end)
+        if bounds is None:
+            continue
+        key = json.dumps(zone)
+        if key not in label_codes:
+            if len(labels) >= MAX_ZONE_LABELS:
+                raise ValueError(f'分区表中的区域值超过{MAX_ZONE_LABELS}个，无法编译为分区数组')
+            labels.append(zone)
+            label_codes[key] = len(labels)
+        codes[bounds[0]:bounds[1] + 1] = label_codes[key]
+
+    if base is not None:
+        patched = np.array(base[0], dtype=np.uint8)
+        for start, end in intervals or []:
+            patched[start:end + 1] = codes[start:end + 1]
+        codes = patched
+    return codes, labels
+
+
+def write_zone_array(postal, zone_index, directory=None, base=None, intervals=None):
+    """将起始邮编的分区数组写入文件
+
+    文件前 100000 字节为区域序号数组，之后是 JSON 格式的版本信息和区域值列表。
+    先写临时文件再替换，已打开旧文件的进程不受影响。base / intervals 见 compile_zone_array。
+    """
+    codes, labels = compile_zone_array(zone_index, base, intervals)
+    meta = {
+        'id': postal.id,
+        'updated_at': postal.updated_at.isoformat() if postal.updated_at else None,
+        'labels': labels
+    }
+    path = zone_array_path(postal.start_code, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(codes.tobytes())
+            f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"已生成分区数组: 起始邮编 {postal.start_code}, {len(labels)} 个区域值")
+    return path
+
+
+def remove_zone_array(start_code, directory=None):
+    """删除起始邮编的分区数组文件"""
+    path = zone_array_path(start_code, directory)
+    if os.path.exists(path):
+        os.remove(path)
+        logger.info(f"已删除分区数组: 起始邮编 {start_code}")
+
+
+class ZoneArray:
+    """以 mmap 打开的分区数组，多个工作进程共享同一份只读内存页"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.codes = np.frombuffer(self._mmap, dtype=np.uint8, count=ZONE_ARRAY_SIZE)
+        meta = json.loads(self._mmap[ZONE_ARRAY_SIZE:].decode('utf-8'))
+        self.id = meta.get('id')
+        self.updated_at = meta.get('updated_at')
+        self.labels = meta.get('labels', [])
+
+    def matches(self, postal_id, updated_at):
+        """文件是否由指定版本的分区表生成"""
+        return self.id == postal_id and self.updated_at == (updated_at.isoformat() if updated_at else None)
+
+    def find(self, to_postal):
+        """查找5位目的邮编的区域编号，没有匹配的范围时返回 None，区域值无效时抛出 ValidationError"""
+        code = int(self.codes[int(to_postal)])
+        return chart_zone_number(self.labels[code - 1]) if code else None
+
+
+def open_zone_array(start_code, postal_id, updated_at, directory=None):
+    """打开与分区表版本一致的分区数组文件，文件不存在、损坏或已过期时返回 None"""
+    path = zone_array_path(start_code, directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        zone_array = ZoneArray(path)
+    except Exception as e:
+        logger.warning(f"打开分区数组失败: {path}, {str(e)}")
+        return None
+    if not zone_array.matches(postal_id, updated_at):
+        return None
+    return zone_array
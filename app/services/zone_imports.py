@@ -0,0 +1,369 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app.extensions import db
+from app.models.postal_zone import PostalZone
+from app.services.chart_codec import ChartWriter
+from app.services.zip_normalizer import NORMALIZE_CHUNK_ROWS, ZipNormalizer, detect_columns, keyword_zip_columns
+from app.services.zone_lookup import invalidate_remote_index, refresh_zone_array, save_zone_chart
+from app.utils.excel_reader import TABLE_EXTENSIONS, open_table_reader
+from app.utils.exceptions import BusinessError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# 分区Excel导入的列名映射：目标列名 -> 可能的原列名
+ZONE_EXCEL_COLUMNS = {
+    'col1': ['Destination ZIP Codes', 'ZIP', 'zip', '邮编', 'ZIP Codes', 'Destination ZIP codes'],
+    'col2': ['Destination ZIP Codes.1', 'ZIP.1', 'zip.1', '邮编.1'],
+    'col3': ['Destination ZIP Codes.2', 'ZIP.2', 'zip.2', '邮编.2'],
+    'col4': ['Destination ZIP Codes.3', 'ZIP.3', 'zip.3', '邮编.3'],
+    'col5': ['Destination ZIP Codes.4', 'ZIP.4', 'zip.4', '邮编.4']
+}
+# 收件邮编分区表导入的列名映射，比较时不区分大小写
+RECEIVER_COLUMNS = {
+    'Destination ZIP': ['Destination ZIP', 'destination_zip', 'zip', '目的地邮编', '邮编'],
+    'Zone': ['Zone', 'zone', '分区', '区域']
+}
+# 读取和规范化文件占总进度的比例，其余为保存到数据库
+READ_PROGRESS = 80
+# 批量导入压缩包解压后的最大总大小
+ARCHIVE_MAX_BYTES = 512 * 1024 * 1024
+# 批量导入时从文件名识别起始邮编：独立的5位数字
+ORIGIN_PATTERN = re.compile(r'(?<!\d)(\d{5})(?!\d)')
+
+
+def _row_progress(progress, reader):
+    """ZipNormalizer.write 的进度回调：按已处理行数更新读取阶段的进度"""
+    return lambda count: progress.rows(count, reader.total_rows, 0, READ_PROGRESS)
+
+
+def read_zone_excel(path, progress=None):
+    """读取并规范化邮编分区表文件，返回 (分区表内容, 行数)
+
+    progress 为 JobProgress 时按已处理行数更新读取阶段的进度。批量导入时在进程池中调用，不访问数据库。
+    """
+    try:
+        # 逐行读取表格文件（Excel、CSV或Parquet）内容，所有单元格作为字符串读取
+        with open_table_reader(path, text=True) as reader:
+            logger.info(f"Excel列名: {reader.columns}")
+
+            # 识别列名并统一为 col1..col5
+            renames = detect_columns(reader.columns, ZONE_EXCEL_COLUMNS)
+
+            # 去除空白，邮编列（列名包含邮编关键字或重命名后的 colN）的数字补齐5位、规范化邮编范围，按块向量化处理
+            zip_columns = keyword_zip_columns(reader.columns, renames)
+            normalizer = ZipNormalizer(reader.columns, renames=renames, zip_columns=zip_columns,
+                                       range_columns=zip_columns)
+            writer = ChartWriter()
+            normalizer.write(reader.chunks(NORMALIZE_CHUNK_ROWS), writer,
+                             progress=_row_progress(progress, reader) if progress is not None else None)
+
+            # 清理数据：删除所有空列
+            empty_columns = normalizer.empty_columns()
+            writer.drop_columns(empty_columns)
+            columns = [col for col in normalizer.columns if col not in empty_columns]
+            excel_content = writer.finish()
+
+        logger.info(f"转换后的分区表: {writer.count} 行, 压缩后 {len(excel_content)} 字节")
+
+    except Exception as e:
+        logger.error(f"读取Excel文件失败: {str(e)}")
+        raise ValidationError(f'读取Excel文件失败: {str(e)}')
+
+    if len(columns) < 2:
+        logger.warning("Excel文件格式错误：列数不足")
+        raise ValidationError('Excel文件必须包含至少两列：邮编范围和分区')
+    return excel_content, writer.count
+
+
+def import_zone_excel(path, file_name, progress, start_code):
+    """导入邮编分区Excel文件（导入任务），返回导入结果"""
+    progress(0, '正在读取文件')
+    excel_content, _ = read_zone_excel(path, progress)
+
+    # 创建或更新记录，已有记录只写入变化的邮编范围
+    progress(READ_PROGRESS, '正在保存分区表')
+    try:
+        postal = PostalZone.query.options(db.undefer(PostalZone.excel_content)).filter_by(
+            start_code=start_code, type='receiver').first()
+        if not postal:
+            postal = PostalZone(start_code=start_code, type='receiver')
+            db.session.add(postal)
+
+        diff = save_zone_chart(postal, excel_content, file_name)
+        if diff.saved:
+            db.session.commit()
+            logger.info(f"数据库事务提交成功")
+            refresh_zone_array(postal, diff=diff)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"数据库事务提交失败: {str(e)}")
+        raise BusinessError(f'保存数据失败：{str(e)}')
+
+    return {
+        'message': '导入成功' if diff.saved else '分区表没有变化',
+        'data': [postal.to_dict()],
+        'diff': diff.to_dict()
+    }
+
+
+def import_receiver_chart(path, file_name, progress, start_code):
+    """导入收件邮编分区表（导入任务），返回导入结果"""
+    # 逐行读取表格文件（Excel、CSV或Parquet）内容
+    with open_table_reader(path) as reader:
+        logger.info(f"Excel列名: {reader.columns}")
+        progress(0, '正在读取文件')
+
+        # 检查并规范化列名
+        renames = detect_columns(reader.columns, RECEIVER_COLUMNS, ignore_case=True)
+        missing_cols = set(RECEIVER_COLUMNS) - set(renames.values())
+        if missing_cols:
+            logger.warning(f"Excel文件缺少必要的列: {missing_cols}")
+            raise ValidationError(f'Excel文件格式错误，缺少以下列: {", ".join(missing_cols)}')
+
+        # 重命名列以统一格式，规范化邮编范围，按块写入压缩列式格式
+        normalizer = ZipNormalizer(reader.columns, renames=renames, strip=False,
+                                   range_columns=['Destination ZIP'])
+        writer = ChartWriter()
+        normalizer.write(reader.chunks(NORMALIZE_CHUNK_ROWS), writer, progress=_row_progress(progress, reader))
+        excel_content = writer.finish()
+    logger.info(f"成功将Excel内容转换为压缩格式: {writer.count} 行, {len(excel_content)} 字节")
+
+    # 创建或更新postal记录
+    progress(READ_PROGRESS, '正在保存分区表')
+    try:
+        postal = PostalZone.query.options(db.undefer(PostalZone.excel_content)).filter_by(
+            start_code=start_code, type='receiver').first()
+        if postal:
+            logger.info(f"更新现有记录，ID: {postal.id}")
+        else:
+            logger.info("创建新记录")
+            postal = PostalZone(
+                start_code=start_code,
+                type='receiver',
+                created_at=datetime.now(),
+                updated_at=datetime.now()
+            )
+            db.session.add(postal)
+            logger.info("已创建新的PostalZone记录")
+
+        diff = save_zone_chart(postal, excel_content, file_name)
+        if diff.saved:
+            postal.updated_at = datetime.now()
+            db.session.commit()
+            logger.info(f"成功保存到数据库: 新增 {len(diff.added)}, 删除 {len(diff.removed)}, "
+                        f"修改 {len(diff.changed)} 个范围")
+            refresh_zone_array(postal, diff=diff)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"数据库操作失败: {str(e)}", exc_info=True)
+        raise BusinessError(f'保存数据失败: {str(e)}')
+
+    return {
+        'message': '导入成功' if diff.saved else '分区表没有变化',
+        'data': postal.to_dict(),
+        'diff': diff.to_dict()
+    }
+
+
+def import_remote_chart(path, file_name, progress, start_code):
+    """导入偏远邮编表（导入任务），返回导入结果"""
+    # 逐行读取表格文件（Excel、CSV或Parquet）内容，确保所有数据都作为字符串读取
+    with open_table_reader(path, text=True) as reader:
+        logger.info(f"原始Excel列名: {reader.columns}")
+        progress(0, '正在读取文件')
+
+        # 删除不需要的列（Unnamed列）
+        unnamed = [col for col in reader.columns if 'Unnamed' in col]
+        original_columns = [col for col in reader.columns if col not in unnamed]
+
+        chunks = reader.chunks(NORMALIZE_CHUNK_ROWS)
+        first_chunk = next(chunks, None)
+        if not first_chunk:
+            raise ValidationError('Excel文件没有数据')
+
+        # 第一行作为第二行表头，保存表头信息
+        second_header = dict(zip(reader.columns, first_chunk[0]))
+        headers = {
+            'first_row': original_columns,
+            'second_row': {col: second_header[col] for col in original_columns}
+        }
+
+        # 处理实际数据：去除空白，不超过5位的数字补零，保持非数字值不变，按块写入压缩列式格式
+        normalizer = ZipNormalizer(reader.columns, exclude=unnamed, zip_columns=original_columns,
+                                   pad_max_length=5)
+        writer = ChartWriter(document=True, headers=headers)
+        normalizer.write(itertools.chain([first_chunk[1:]], chunks), writer, progress=_row_progress(progress, reader))
+        excel_content = writer.finish()
+
+    logger.info(f"处理后的列名: {original_columns}")
+    logger.info(f"偏远邮编表: {writer.count} 行, 压缩后 {len(excel_content)} 字节")
+
+    # 创建或更新postal记录
+    progress(READ_PROGRESS, '正在保存偏远邮编表')
+    try:
+        postal = PostalZone.query.filter_by(start_code=start_code, type='remote').first()
+        if postal:
+            logger.info(f"更新现有记录，ID: {postal.id}")
+            postal.excel_content = excel_content
+            postal.file_name = file_name
+            postal.updated_at = datetime.now()
+        else:
+            logger.info("创建新记录")
+            postal = PostalZone(
+                start_code=start_code,
+                type='remote',
+                excel_content=excel_content,
+                file_name=file_name,
+                created_at=datetime.now(),
+                updated_at=datetime.now()
+            )
+            db.session.add(postal)
+
+        db.session.commit()
+        logger.info("成功保存到数据库")
+        invalidate_remote_index()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"数据库操作失败: {str(e)}", exc_info=True)
+        raise BusinessError(f'保存数据失败: {str(e)}')
+
+    return {
+        'message': '导入成功',
+        'data': postal.to_dict()
+    }
+
+
+def archive_members(archive):
+    """压缩包中的分区表文件，返回按起始邮编排序的 [(起始邮编, ZipInfo)]
+
+    起始邮编取自文件名中独立的5位数字（如 91710.xlsx、FedEx_91710_2025.csv），目录、隐藏文件和
+    不支持格式的文件忽略。文件名无法识别起始邮编、起始邮编重复或解压后总大小超过上限时抛出 ValidationError。
+    """
+    members = {}
+    unnamed = []
+    total_size = 0
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        if not name.lower().endswith(TABLE_EXTENSIONS):
+            continue
+        total_size += info.file_size
+        match = ORIGIN_PATTERN.search(os.path.splitext(name)[0])
+        if not match:
+            unnamed.append(name)
+            continue
+        origin = match.group(1)
+        if origin in members:
+            raise ValidationError(f'起始邮编 {origin} 有多个文件: '
+                                  f'{os.path.basename(members[origin].filename)}, {name}')
+        members[origin] = info
+
+    if unnamed:
+        raise ValidationError(f'以下文件名中没有5位起始邮编: {", ".join(unnamed)}')
+    if not members:
+        raise ValidationError('压缩包中没有分区表文件(.xlsx、.xls、.csv或.parquet)')
+    if total_size > ARCHIVE_MAX_BYTES:
+        raise ValidationError(f'压缩包解压后超过 {ARCHIVE_MAX_BYTES // (1024 * 1024)}MB')
+    return sorted(members.items())
+
+
+def import_zone_archive(path, file_name, progress):
+    """批量导入压缩包中按起始邮编命名的分区表（导入任务），返回导入结果
+
+    各文件在进程池中并行读取和规范化，任何文件读取失败时不导入任何数据；全部读取成功后在同一个事务中
+    创建或更新所有起始邮编的记录，只写入变化的邮编范围。
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ValidationError('文件不是有效的ZIP压缩包')
+
+    with archive, tempfile.TemporaryDirectory(prefix='zone-archive-') as directory:
+        members = archive_members(archive)
+        logger.info(f"压缩包包含 {len(members)} 个分区表: {[origin for origin, _ in members]}")
+
+        # 按起始邮编解压到临时目录，不使用压缩包中的路径
+        progress(0, f'正在解压 {len(members)} 个分区表文件')
+        paths = {}
+        for origin, info in members:
+            paths[origin] = os.path.join(directory, origin + os.path.splitext(info.filename)[1].lower())
+            with archive.open(info) as source, open(paths[origin], 'wb') as target:
+                shutil.copyfileobj(source, target)
+
+        charts = _read_zone_charts(paths, dict(members), progress)
+
+    # 在同一个事务中创建或更新所有起始邮编的记录
+    progress(READ_PROGRESS, f'正在保存 {len(charts)} 个分区表')
+    saved = []
+    try:
+        origins = [origin for origin, _ in members]
+        postals = {postal.start_code: postal for postal in PostalZone.query.options(
+            db.undefer(PostalZone.excel_content)).filter(
+            PostalZone.type == 'receiver', PostalZone.start_code.in_(origins))}
+        for origin, info in members:
+            postal = postals.get(origin)
+            if not postal:
+                postal = PostalZone(start_code=origin, type='receiver')
+                db.session.add(postal)
+            excel_content, count = charts[origin]
+            chart_name = secure_filename(os.path.basename(info.filename)) or os.path.basename(paths[origin])
+            saved.append((postal, count, save_zone_chart(postal, excel_content, chart_name)))
+        db.session.commit()
+        logger.info(f"批量导入事务提交成功: {len(saved)} 个起始邮编")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"批量导入事务提交失败: {str(e)}", exc_info=True)
+        raise BusinessError(f'保存数据失败：{str(e)}')
+
+    for postal, _, diff in saved:
+        if diff.saved:
+            refresh_zone_array(postal, diff=diff)
+
+    changed = sum(1 for _, _, diff in saved if diff.saved)
+    return {
+        'message': f'导入成功：{len(saved)} 个起始邮编，{changed} 个分区表有变化',
+        'data': [postal.to_dict() for postal, _, _ in saved],
+        'charts': [{
+            'start_code': postal.start_code,
+            'file_name': postal.file_name,
+            'rows': count,
+            'saved': diff.saved,
+            'diff': {key: value for key, value in diff.to_dict().items() if key != 'details'}
+        } for postal, count, diff in saved]
+    }
+
+
+def _read_zone_charts(paths, members, progress):
+    """在进程池中并行读取分区表文件，返回 {起始邮编: (分区表内容, 行数)}，任何文件失败时抛出 ValidationError"""
+    processes = current_app.config.get('IMPORT_ARCHIVE_PROCESSES') or os.cpu_count() or 1
+    processes = min(processes, len(paths))
+    progress(0, f'正在用 {processes} 个进程读取 {len(paths)} 个分区表文件')
+
+    charts = {}
+    errors = []
+    # 使用 spawn 启动子进程：gunicorn 工作进程有多个线程和数据库连接，fork 后的子进程可能死锁
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(read_zone_excel, path): origin for origin, path in paths.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            origin = futures[future]
+            try:
+                charts[origin] = future.result()
+            except Exception as e:
+                errors.append(f'{os.path.basename(members[origin].filename)}: {str(e)}')
+            progress.rows(done, len(futures), 0, READ_PROGRESS)
+
+    if errors:
+        logger.warning(f"批量导入有文件读取失败: {errors}")
+        raise ValidationError(f'以下分区表文件读取失败，没有导入任何数据：{"；".join(sorted(errors))}')
+    return charts
@@ -0,0 +1,579 @@
+import json
+import logging
+from bisect import bisect_right
+from app.extensions import db
+from app.models.postal_zone import PostalZone
+from app.models.postal_zone_range import PostalZoneRange
+from app.services.cache import LRUCache
+from app.services.chart_codec import decode_chart, decode_chart_columns
+from app.services.rate_card import chart_zone_number, parse_zone_number
+from app.services.zone_arrays import is_zip5, open_zone_array, write_zone_array, zip5_bounds
+from app.utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# 偏远邮编表中的列名关键字 -> 偏远地区类型，按顺序匹配
+REMOTE_COLUMN_TYPES = [
+    ('DAS_EXT', 'DAS_EXT'),
+    ('DAS_Remote', 'DAS_Remote'),
+    ('DAS_Alaska', 'DAS_Alaska'),
+    ('DAS_Hawaii', 'DAS_Hawaii'),
+]
+
+
+def normalize_postal_code(value):
+    """统一邮编格式：去除空白并补齐5位"""
+    return str(value).strip().zfill(5)
+
+
+def parse_remote_rows(excel_content):
+    """解析偏远邮编表内容，兼容 {'headers':..., 'data': [...]} 和直接的行列表"""
+    remote_data = decode_chart(excel_content)
+    if isinstance(remote_data, dict):
+        data = remote_data.get('data', [])
+        try:
+            # 如果 data 是字符串，尝试解析它
+            return json.loads(data) if isinstance(data, str) else data
+        except Exception as e:
+            logger.error(f"解析data字段失败: {str(e)}")
+            return []
+    return remote_data
+
+
+def remote_column_type(col_name):
+    """根据列名确定偏远地区类型"""
+    if col_name == 'DAS':
+        return 'DAS'
+    for keyword, remote_type in REMOTE_COLUMN_TYPES:
+        if keyword in col_name:
+            return remote_type
+    return None
+
+
+def build_remote_index(rows):
+    """构建 邮编 -> 偏远地区类型 的索引
+
+    与逐行扫描的结果一致：邮编第一次出现的行生效，同一行中先检查DAS列再按列顺序检查其他列。
+    """
+    index = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        das_value = row.get('DAS')
+        if das_value:
+            index.setdefault(normalize_postal_code(das_value), 'DAS')
+        for col_name, value in row.items():
+            if not value or col_name == 'DAS':
+                continue
+            index.setdefault(normalize_postal_code(value), remote_column_type(col_name))
+    return index
+
+
+def parse_zone_chart(excel_content):
+    """解析起始邮编的分区表，返回按表中顺序排列的 (起始邮编, 结束邮编, 区域) 列表
+
+    excel_content 为压缩列式格式时直接读取 Destination ZIP 和 Zone 两列，不还原逐行的记录。
+    """
+    if isinstance(excel_content, str):
+        columns = decode_chart_columns(excel_content, ['Destination ZIP', 'Zone'])
+        entries = zip(columns['Destination ZIP'], columns['Zone'])
+    else:
+        entries = ((entry.get('Destination ZIP', ''), entry.get('Zone')) for entry in excel_content or [])
+
+    ranges = []
+    for zip_range, zone in entries:
+        if not isinstance(zip_range, str) or '-' not in zip_range:
+            continue
+        parts = zip_range.split('-')
+        if len(parts) != 2:
+            logger.warning(f"跳过格式错误的邮编范围: {zip_range}")
+            continue
+        ranges.append((parts[0].strip(), parts[1].strip(), zone))
+    return ranges
+
+
+class ZoneIndex:
+    """起始邮编分区表的区间索引
+
+    分区表中的邮编范围按起始邮编排序后保存为平行的 starts / ends / zones 列表，
+    查找时二分定位，与逐行扫描（字符串比较、表中顺序第一个匹配的范围生效）结果一致。
+    范围之间有重叠时无法保证第一个匹配，回退为逐行扫描。
+    """
+
+    def __init__(self, ranges):
+        self.ranges = ranges
+        self.starts = []
+        self.ends = []
+        self.zones = []
+        self.overlapping = False
+
+        for start, end, zone in sorted((r for r in ranges if r[0] <= r[1]), key=lambda r: r[0]):
+            if self.ends and start <= self.ends[-1]:
+                logger.warning(f"分区表中的邮编范围有重叠: {start}-{end}，使用逐行查找")
+                self.overlapping = True
+                break
+            self.starts.append(start)
+            self.ends.append(end)
+            self.zones.append(zone)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def match(self, to_postal):
+        """查找目的邮编所在的范围，返回 (起始邮编, 结束邮编, 原始区域值)，没有匹配的范围时返回 None"""
+        if self.overlapping:
+            return next((r for r in self.ranges if r[0] <= to_postal <= r[1]), None)
+        i = bisect_right(self.starts, to_postal) - 1
+        if i >= 0 and to_postal <= self.ends[i]:
+            return self.starts[i], self.ends[i], self.zones[i]
+        return None
+
+    def find(self, to_postal):
+        """查找目的邮编的区域编号，没有匹配的范围时返回 None，区域值无效时抛出 ValidationError"""
+        matched = self.match(to_postal)
+        return chart_zone_number(matched[2]) if matched else None
+
+
+class Zip5ZoneIndex:
+    """5位目的邮编走 lookup（mmap 分区数组或分区范围表）的分区索引
+
+    其他格式的邮编按字符串比较的规则与5位邮编空间不一致，此时才加载分区表并使用区间索引。
+    """
+
+    def __init__(self, lookup, load_index):
+        self.lookup = lookup
+        self._load_index = load_index
+        self._index = None
+
+    def find(self, to_postal):
+        """查找目的邮编的区域编号，没有匹配的范围时返回 None"""
+        if is_zip5(to_postal):
+            return self.lookup.find(to_postal)
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index.find(to_postal)
+
+
+def zone_range_rows(postal, ranges, seqs=None):
+    """将分区表的范围列表展开为 postal_zone_ranges 表的行
+
+    seqs 为各范围在分区表中的顺序，默认按 ranges 的顺序编号。
+    """
+    rows = []
+    for i, (start, end, zone) in enumerate(ranges):
+        bounds = zip5_bounds(start, end)
+        if bounds is None:
+            continue
+        rows.append({
+            'postal_zone_id': postal.id,
+            'origin': int(postal.start_code),
+            'dest_start': bounds[0],
+            'dest_end': bounds[1],
+            'zone': parse_zone_number(zone),
+            'seq': seqs[i] if seqs is not None else i
+        })
+    return rows
+
+
+def clear_zone_ranges(postal_zone_id):
+    """删除记录的邮编范围行，在调用方的事务中执行"""
+    PostalZoneRange.query.filter_by(postal_zone_id=postal_zone_id).delete(synchronize_session=False)
+
+
+def sync_zone_ranges(postal):
+    """按分区表内容重建记录的邮编范围行，在调用方的事务中执行"""
+    if postal.id is not None:
+        clear_zone_ranges(postal.id)
+    if not is_zip5(postal.start_code) or not postal.excel_content:
+        return 0
+    if postal.id is None:
+        db.session.flush()
+    rows = zone_range_rows(postal, parse_zone_chart(postal.excel_content))
+    if rows:
+        db.session.bulk_insert_mappings(PostalZoneRange, rows)
+    logger.info(f"已更新分区范围表: 起始邮编 {postal.start_code}, {len(rows)} 个范围")
+    return len(rows)
+
+
+class ZoneRangeTable:
+    """通过 postal_zone_ranges 表的索引范围查询查找区域，不需要在内存中保存分区表"""
+
+    def __init__(self, origin):
+        self.origin = int(origin)
+
+    def find(self, to_postal):
+        """查找5位目的邮编的区域编号，没有匹配的范围时返回 None
+
+        区域值无法解析的范围以 NULL 保存，匹配到这样的范围时抛出 ValidationError。
+        """
+        dest = int(to_postal)
+        row = db.session.query(PostalZoneRange.zone).filter(
+            PostalZoneRange.origin == self.origin,
+            PostalZoneRange.dest_start <= dest,
+            PostalZoneRange.dest_end >= dest
+        ).order_by(PostalZoneRange.seq).first()
+        return chart_zone_number(row.zone) if row else None
+
+    @staticmethod
+    def exists(postal_zone_id):
+        """记录是否已有分区范围行，表不存在（未执行迁移）时返回 False"""
+        try:
+            return db.session.query(PostalZoneRange.id).filter_by(postal_zone_id=postal_zone_id).first() is not None
+        except Exception as e:
+            logger.warning(f"查询分区范围表失败: {str(e)}")
+            return False
+
+
+# 导入差异中每类最多返回的范围明细数
+MAX_DIFF_DETAILS = 100
+
+
+class ZoneChartDiff:
+    """新旧分区表在邮编范围级别的差异
+
+    以 (起始邮编, 结束邮编) 标识范围，同一范围出现多次时表中顺序第一个生效。
+    新旧分区表的范围都没有重叠时查找结果与范围的顺序无关，可以只更新变化的范围（incremental）；
+    有重叠时查找依赖表中顺序，需要完整重建。
+    """
+
+    def __init__(self, old_content, new_content):
+        old_ranges = parse_zone_chart(old_content) if old_content else []
+        new_ranges = parse_zone_chart(new_content) if new_content else []
+        self.content_changed = old_content != new_content
+        self.new_index = ZoneIndex(new_ranges)
+        self.incremental = not self.new_index.overlapping and not ZoneIndex(old_ranges).overlapping
+        self.previous_updated_at = None
+        self.saved = False
+
+        old = {}
+        for start, end, zone in old_ranges:
+            old.setdefault((start, end), zone)
+        self.seqs = {}
+        new = {}
+        for seq, (start, end, zone) in enumerate(new_ranges):
+            if (start, end) not in new:
+                new[(start, end)] = zone
+                self.seqs[(start, end)] = seq
+
+        self.added = [(start, end, zone) for (start, end), zone in new.items() if (start, end) not in old]
+        self.removed = [(start, end, zone) for (start, end), zone in old.items() if (start, end) not in new]
+        self.changed = [(start, end, old[(start, end)], zone) for (start, end), zone in new.items()
+                        if (start, end) in old and old[(start, end)] != zone]
+        self.unchanged = len(new) - len(self.added) - len(self.changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def changed_ranges(self):
+        """新增、删除和区域变化的 (起始邮编, 结束邮编) 列表"""
+        return ([(start, end) for start, end, _ in self.added + self.removed] +
+                [(start, end) for start, end, _, _ in self.changed])
+
+    def intervals(self):
+        """变化的范围在5位邮编空间内的闭区间，有范围无法换算时返回 None"""
+        intervals = []
+        for start, end in self.changed_ranges():
+            if start > end:
+                continue
+            bounds = zip5_bounds(start, end)
+            if bounds is None:
+                return None
+            intervals.append(bounds)
+        return intervals
+
+    def to_dict(self):
+        """返回给前端的差异摘要，每类最多 MAX_DIFF_DETAILS 条明细"""
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'changed': len(self.changed),
+            'unchanged': self.unchanged,
+            'details': {
+                'added': [{'range': f'{start}-{end}', 'zone': zone}
+                          for start, end, zone in self.added[:MAX_DIFF_DETAILS]],
+                'removed': [{'range': f'{start}-{end}', 'zone': zone}
+                            for start, end, zone in self.removed[:MAX_DIFF_DETAILS]],
+                'changed': [{'range': f'{start}-{end}', 'old_zone': old_zone, 'new_zone': new_zone}
+                            for start, end, old_zone, new_zone in self.changed[:MAX_DIFF_DETAILS]]
+            }
+        }
+
+
+def apply_zone_range_diff(postal, diff):
+    """只删除和插入变化范围的邮编范围行，在调用方的事务中执行"""
+    for start, end in [(start, end) for start, end, _ in diff.removed] + [(start, end) for start, end, _, _ in diff.changed]:
+        bounds = zip5_bounds(start, end)
+        if bounds is None:
+            continue
+        PostalZoneRange.query.filter_by(
+            postal_zone_id=postal.id, dest_start=bounds[0], dest_end=bounds[1]
+        ).delete(synchronize_session=False)
+
+    ranges = [(start, end, zone) for start, end, zone in diff.added] + \
+             [(start, end, zone) for start, end, _, zone in diff.changed]
+    rows = zone_range_rows(postal, ranges, [diff.seqs[(start, end)] for start, end, _ in ranges])
+    if rows:
+        db.session.bulk_insert_mappings(PostalZoneRange, rows)
+    logger.info(f"已按差异更新分区范围表: 起始邮编 {postal.start_code}, "
+                f"新增 {len(diff.added)}, 删除 {len(diff.removed)}, 修改 {len(diff.changed)}")
+
+
+def save_zone_chart(postal, excel_content, file_name):
+    """将新导入的分区表写入记录，只更新变化的邮编范围行，在调用方的事务中执行
+
+    返回 ZoneChartDiff。内容和文件名都没有变化时不修改记录，updated_at 不变，
+    各工作进程已缓存的分区索引和分区数组继续有效。
+    """
+    diff = ZoneChartDiff(postal.excel_content, excel_content)
+    if not diff.content_changed and postal.file_name == file_name:
+        logger.info(f"分区表没有变化: 起始邮编 {postal.start_code}")
+        return diff
+
+    diff.previous_updated_at = postal.updated_at
+    diff.saved = True
+    postal.excel_content = excel_content
+    postal.file_name = file_name
+    if postal.id is None or not diff.incremental or not ZoneRangeTable.exists(postal.id):
+        sync_zone_ranges(postal)
+    elif diff:
+        apply_zone_range_diff(postal, diff)
+    return diff
+
+
+def refresh_zone_array(postal, zone_index=None, diff=None):
+    """重新生成起始邮编的分区数组文件，失败时只记录日志，查询时回退为区间索引
+
+    diff 为 ZoneChartDiff 且原分区表的数组文件可用时，只重新计算变化范围内的邮编。
+    """
+    if not is_zip5(postal.start_code):
+        return None
+    try:
+        if diff is not None:
+            zone_index = zone_index or diff.new_index
+        zone_index = zone_index or ZoneIndex(parse_zone_chart(postal.excel_content))
+        base, intervals = _zone_array_base(postal, diff)
+        try:
+            write_zone_array(postal, zone_index, base=base, intervals=intervals)
+        except ValueError:
+            if base is None:
+                raise
+            # 累积的区域值超过上限时完整重新编译
+            write_zone_array(postal, zone_index)
+        return open_zone_array(postal.start_code, postal.id, postal.updated_at)
+    except Exception as e:
+        logger.warning(f"生成分区数组失败: 起始邮编 {postal.start_code}, {str(e)}")
+        return None
+
+
+def _zone_array_base(postal, diff):
+    """返回增量更新分区数组所需的 (原数组, 变化区间)，无法增量更新时返回 (None, None)"""
+    if diff is None or not diff.incremental or diff.previous_updated_at is None:
+        return None, None
+    intervals = diff.intervals()
+    if intervals is None:
+        return None, None
+    previous = open_zone_array(postal.start_code, postal.id, diff.previous_updated_at)
+    if previous is None:
+        return None, None
+    logger.info(f"增量更新分区数组: 起始邮编 {postal.start_code}, {len(intervals)} 个变化的范围")
+    return (previous.codes, previous.labels), intervals
+
+
+_zone_indexes = LRUCache(maxsize=512)
+
+
+def get_zone_index(from_postal):
+    """获取起始邮编的分区索引，按 (起始邮编, 记录, updated_at) 缓存，起始邮编不存在时返回 None
+
+    只查询记录ID和更新时间判断缓存是否有效。优先使用版本一致的 mmap 分区数组，
+    其次使用 postal_zone_ranges 表的范围查询；都没有时加载分区表建立区间索引。
+    查询过程中不生成数组文件，数组文件由导入分区表时的 refresh_zone_array 生成。
+    """
+    row = db.session.query(PostalZone.id, PostalZone.updated_at).filter_by(start_code=from_postal).first()
+    if row is None:
+        return None
+
+    def load_index():
+        postal = PostalZone.query.options(db.undefer(PostalZone.excel_content)).get(row.id)
+        index = ZoneIndex(parse_zone_chart(postal.excel_content))
+        logger.info(f"创建分区索引: 起始邮编 {from_postal}, {len(index)} 个邮编范围")
+        return index
+
+    def build():
+        if not is_zip5(from_postal):
+            return load_index()
+        zone_array = open_zone_array(from_postal, row.id, row.updated_at)
+        if zone_array is not None:
+            return Zip5ZoneIndex(zone_array, load_index)
+        if ZoneRangeTable.exists(row.id):
+            return Zip5ZoneIndex(ZoneRangeTable(from_postal), load_index)
+        return load_index()
+
+    return _zone_indexes.get((from_postal, row.id, row.updated_at), build)
+
+
+def invalidate_zone_indexes():
+    """使全部分区索引失效"""
+    _zone_indexes.invalidate()
+
+
+_remote_indexes = LRUCache(maxsize=4)
+
+
+def get_remote_index():
+    """获取 邮编 -> 偏远地区类型 的索引，按偏远邮编表的 (记录, updated_at) 缓存
+
+    偏远邮编表有数万个单元格，只在表变化后重新编译一次，没有偏远邮编表或解析失败时返回空索引。
+    """
+    row = db.session.query(PostalZone.id, PostalZone.updated_at).filter_by(type='remote').first()
+    if row is None:
+        return {}
+
+    def build():
+        remote_postal = PostalZone.query.options(db.undefer(PostalZone.excel_content)).get(row.id)
+        try:
+            index = build_remote_index(parse_remote_rows(remote_postal.excel_content))
+        except Exception as e:
+            logger.error(f"处理偏远邮编数据失败: {str(e)}")
+            return {}
+        logger.info(f"创建偏远邮编索引: {len(index)} 个邮编")
+        return index
+
+    return _remote_indexes.get((row.id, row.updated_at), build)
+
+
+def invalidate_remote_index():
+    """使偏远邮编索引失效"""
+    _remote_indexes.invalidate()
+
+
+_chart_rows = LRUCache(maxsize=8)
+
+
+def get_chart_rows(postal_id):
+    """获取分区表解析后的行，按 (记录, updated_at) 缓存，记录不存在时返回 None
+
+    返回 {'type': 记录类型, 'headers': 表头, 'rows': 数据行}，只有偏远邮编表有表头。
+    """
+    row = db.session.query(PostalZone.id, PostalZone.type, PostalZone.updated_at).filter_by(id=postal_id).first()
+    if row is None:
+        return None
+
+    def build():
+        postal = PostalZone.query.options(db.undefer(PostalZone.excel_content)).get(row.id)
+        chart = {'type': row.type, 'headers': None, 'rows': []}
+        if not postal.excel_content:
+            return chart
+        content = decode_chart(postal.excel_content)
+        if isinstance(content, dict):
+            chart['headers'] = content.get('headers')
+            chart['rows'] = parse_remote_rows(content)
+        elif isinstance(content, list):
+            chart['rows'] = content
+        return chart
+
+    return _chart_rows.get((row.id, row.updated_at), build)
+
+
+def filter_rows_by_prefix(rows, prefix, columns=None, normalize=False):
+    """筛选任一邮编列以 prefix 开头的行
+
+    columns 为 None 时检查所有列；normalize 为 True 时先将单元格补齐为5位邮编再比较。
+    """
+    if not prefix:
+        return rows
+    matched = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        values = row.values() if columns is None else (row.get(column) for column in columns)
+        for value in values:
+            if not value:
+                continue
+            text = normalize_postal_code(value) if normalize else str(value).strip()
+            if text.startswith(prefix):
+                matched.append(row)
+                break
+    return matched
+
+
+class ZoneResolver:
+    """邮编分区解析器
+
+    起始邮编的分区表和偏远邮编表只加载和解析一次，供同一批次中的多个包裹共享，
+    避免每个包裹都查询数据库并反序列化 excel_content。
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._remote_index = None
+
+    def zone_index(self, from_postal):
+        """获取起始邮编的分区索引，起始邮编不存在时返回 None"""
+        if from_postal not in self._indexes:
+            self._indexes[from_postal] = get_zone_index(from_postal)
+        return self._indexes[from_postal]
+
+    def remote_index(self):
+        """获取偏远邮编索引，没有偏远邮编表或解析失败时返回空索引"""
+        if self._remote_index is None:
+            self._remote_index = get_remote_index()
+        return self._remote_index
+
+    def find_zone(self, from_postal, to_postal):
+        """查找目的邮编所在的区域"""
+        index = self.zone_index(from_postal)
+        if index is None:
+            raise ValidationError('起始邮编不存在，请检查后重试')
+
+        zone = index.find(to_postal)
+        if not zone:
+            raise ValidationError('目的邮编不存在，请检查后重试')
+        return zone
+
+    def resolve_many(self, pairs):
+        """批量查找 (起始邮编, 目的邮编) 的区域和偏远地区信息
+
+        按起始邮编分组处理，每个起始邮编的分区索引只获取一次。返回与输入顺序一致的列表，
+        查找失败的项为 {'error': 原因}。
+        """
+        groups = {}
+        for i, (from_postal, to_postal) in enumerate(pairs):
+            groups.setdefault(from_postal, []).append(i)
+
+        remote_index = self.remote_index()
+        results = [None] * len(pairs)
+        for from_postal, indices in groups.items():
+            index = self.zone_index(from_postal)
+            for i in indices:
+                to_postal = pairs[i][1]
+                if index is None:
+                    results[i] = {'error': '起始邮编不存在，请检查后重试'}
+                    continue
+                try:
+                    zone = index.find(to_postal)
+                except ValidationError as e:
+                    results[i] = {'error': e.message}
+                    continue
+                if not zone:
+                    results[i] = {'error': '目的邮编不存在，请检查后重试'}
+                else:
+                    to_check = normalize_postal_code(to_postal)
+                    results[i] = {
+                        'zone': zone,
+                        'is_remote': to_check in remote_index,
+                        'remote_type': remote_index.get(to_check)
+                    }
+        return results
+
+    def resolve(self, from_postal, to_postal):
+        """查找区域和偏远地区信息"""
+        zone = self.find_zone(from_postal, to_postal)
+        to_check = normalize_postal_code(to_postal)
+        remote_index = self.remote_index()
+        is_remote = to_check in remote_index
+        return {
+            'zone': zone,
+            'is_remote': is_remote,
+            'remote_type': remote_index.get(to_check)
+        }
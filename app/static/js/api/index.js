@@ -165,7 +165,7 @@ window.api = {
   }
 }
 
-// 获取收件邮编详情
-window.getReceiverPostalDetails = (id) => {
-  return window.request.get(`/postal-zones/receiver/${id}/details`)
+// 获取收件邮编详情（params: offset / limit / prefix）
+window.getReceiverPostalDetails = (id, params = {}) => {
+  return window.request.get(`/postal-zones/receiver/${id}/details`, { params })
 } 
\ No newline at end of file
@@ -16,10 +16,13 @@ window.ReceiverPostalTable = {
         </div>
       </div>
 
-      <div class="d-flex justify-content-end mb-3">
+      <div class="d-flex justify-content-end gap-2 mb-3">
         <button class="btn btn-success" @click="importZoneExcel">
           <i class="bi bi-file-earmark-excel"></i> 导入收件邮编分区表
         </button>
+        <button class="btn btn-success" @click="importZoneArchive">
+          <i class="bi bi-file-earmark-zip"></i> 批量导入分区表压缩包
+        </button>
       </div>
 
       <div class="table-responsive">
@@ -163,10 +166,15 @@ window.ReceiverPostalTable = {
         }
       }
     },
+    formatImportResult(result) {
+      const diff = result && result.diff
+      if (!diff) return '导入成功'
+      return `${result.message}：新增 ${diff.added} 个范围，删除 ${diff.removed} 个，修改 ${diff.changed} 个，未变化 ${diff.unchanged} 个`
+    },
     async importReceiverPostal() {
       const input = document.createElement('input')
       input.type = 'file'
-      input.accept = '.xlsx'
+      input.accept = '.xlsx,.xls,.csv,.parquet'
       input.onchange = async (event) => {
         const file = event.target.files[0]
         if (!file) return
@@ -175,13 +183,18 @@ window.ReceiverPostalTable = {
         formData.append('file', file)
 
         try {
-          await axios.post('/api/postal-zones/receiver/import', formData, {
+          const response = await axios.post('/api/postal-zones/receiver/import', formData, {
             headers: {
               'Content-Type': 'multipart/form-data'
             }
           })
+          if (!response.data.job_id) {
+            throw new Error(response.data.message)
+          }
+          // 导入在后台任务中执行，等待任务结束
+          const result = await window.utils.waitForJob(response.data.job_id)
           await this.fetchReceiverPostals()
-          alert('导入成功')
+          alert(this.formatImportResult(result))
         } catch (error) {
           console.error('导入失败:', error)
           alert('导入失败')
@@ -192,7 +205,7 @@ window.ReceiverPostalTable = {
     async importZoneExcel() {
       const input = document.createElement('input')
       input.type = 'file'
-      input.accept = '.xlsx'
+      input.accept = '.xlsx,.xls,.csv,.parquet'
       input.onchange = async (event) => {
         const file = event.target.files[0]
         if (!file) return
@@ -201,20 +214,56 @@ window.ReceiverPostalTable = {
         formData.append('file', file)
 
         try {
-          await axios.post('/api/postal-zones/import-zone-excel', formData, {
+          const response = await axios.post('/api/postal-zones/import-zone-excel', formData, {
             headers: {
               'Content-Type': 'multipart/form-data'
             }
           })
+          if (!response.data.job_id) {
+            throw new Error(response.data.message)
+          }
+          // 导入在后台任务中执行，等待任务结束
+          const result = await window.utils.waitForJob(response.data.job_id)
           await this.fetchReceiverPostals()
           await this.fetchZones()
-          alert('导入成功')
+          alert(this.formatImportResult(result))
         } catch (error) {
           console.error('导入失败:', error)
           alert('导入失败')
         }
       }
       input.click()
+    },
+    // 批量导入ZIP压缩包中按起始邮编命名的分区表文件，如 91710.xlsx、90001.csv
+    async importZoneArchive() {
+      const input = document.createElement('input')
+      input.type = 'file'
+      input.accept = '.zip'
+      input.onchange = async (event) => {
+        const file = event.target.files[0]
+        if (!file) return
+
+        const formData = new FormData()
+        formData.append('file', file)
+
+        try {
+          const response = await axios.post('/api/postal-zones/import-zone-archive', formData, {
+            headers: {
+              'Content-Type': 'multipart/form-data'
+            }
+          })
+          // 导入在后台任务中执行，等待任务结束
+          const result = await window.utils.waitForJob(response.data.job_id)
+          await this.fetchReceiverPostals()
+          await this.fetchZones()
+          alert(result.message)
+        } catch (error) {
+          console.error('导入失败:', error)
+          const message = (error.response && error.response.data && error.response.data.message) || error.message
+          alert(`导入失败：${message}`)
+        }
+      }
+      input.click()
     }
   },
   mounted() {
@@ -166,7 +166,7 @@ window.StartPostalTable = {
     async importStartPostal() {
       const input = document.createElement('input')
       input.type = 'file'
-      input.accept = '.xlsx'
+      input.accept = '.xlsx,.xls,.csv,.parquet'
       input.onchange = async (event) => {
         const file = event.target.files[0]
         if (!file) return
@@ -192,7 +192,7 @@ window.StartPostalTable = {
     async importZoneExcel() {
       const input = document.createElement('input')
       input.type = 'file'
-      input.accept = '.xlsx'
+      input.accept = '.xlsx,.xls,.csv,.parquet'
       input.onchange = async (event) => {
         const file = event.target.files[0]
         if (!file) return
@@ -201,11 +201,13 @@ window.StartPostalTable = {
         formData.append('file', file)
 
         try {
-          await axios.post('/api/postal-zones/import-zone-excel', formData, {
+          const response = await axios.post('/api/postal-zones/import-zone-excel', formData, {
             headers: {
               'Content-Type': 'multipart/form-data'
             }
           })
+          // 导入在后台任务中执行，等待任务结束
+          await window.utils.waitForJob(response.data.job_id)
           await this.fetchStartPostals()
           await this.fetchZones()
           alert('导入成功')
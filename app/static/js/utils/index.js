@@ -320,5 +320,24 @@ window.utils = {
       XLSX.utils.book_append_sheet(wb, ws, sheetName);
     });
     XLSX.writeFile(wb, filename);
+  },
+
+  // 轮询导入任务直到结束，成功时返回任务结果，失败时抛出任务的错误信息
+  async waitForJob(jobId, { onProgress, interval = 1000 } = {}) {
+    while (true) {
+      const response = await fetch(`/api/jobs/${jobId}`, {
+        credentials: 'same-origin',
+        headers: { 'Cache-Control': 'no-cache' }
+      });
+      const body = await response.json();
+      if (!response.ok || !body.success) {
+        throw new Error(body.message || '获取导入任务失败');
+      }
+      const job = body.data;
+      if (onProgress) onProgress(job);
+      if (job.status === 'succeeded') return job.result;
+      if (job.status === 'failed') throw new Error(job.error || '导入失败');
+      await new Promise(resolve => setTimeout(resolve, interval));
+    }
   }
 } 
\ No newline at end of file
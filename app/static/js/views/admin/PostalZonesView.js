@@ -16,7 +16,16 @@ const PostalZonesView = {
     const showConfirmDialog = Vue.ref(false)
     const editingPostalDetails = Vue.ref({
       type: 'receiver',
-      data: []
+      data: [],
+      headerRows: []
+    })
+    // 详情分页：数据量大的分区表每次只加载一页，前缀筛选在服务端完成
+    const detailsPage = Vue.reactive({
+      postal: null,
+      offset: 0,
+      limit: 100,
+      total: 0,
+      prefix: ''
     })
     const importForm = Vue.reactive({
       start_code: '',
@@ -149,8 +158,8 @@ const PostalZonesView = {
         }
 
         // 验证文件格式
-        if (!importForm.file.name.match(/\.(xlsx|xls)$/i)) {
-          alert('请选择正确的Excel文件格式(.xlsx或.xls)')
+        if (!importForm.file.name.match(/\.(xlsx|xls|csv|parquet)$/i)) {
+          alert('请选择正确的文件格式(.xlsx、.xls、.csv或.parquet)')
           return
         }
 
@@ -162,10 +171,21 @@ const PostalZonesView = {
         formData.append('start_code', importForm.start_code)
 
         // 发送请求
-        await http.post('/api/postal-zones/receiver/import', formData)
+        const response = await http.post('/api/postal-zones/receiver/import', formData)
+        if (!response.data.job_id) {
+          throw new Error(response.data.message)
+        }
         
-        // 导入成功
-        alert('导入成功')
+        // 导入在后台任务中执行，等待任务结束
+        const result = await window.utils.waitForJob(response.data.job_id)
+        
+        // 导入成功，显示与原分区表的差异
+        const diff = result && result.diff
+        if (diff) {
+          alert(`${result.message}：新增 ${diff.added} 个范围，删除 ${diff.removed} 个，修改 ${diff.changed} 个，未变化 ${diff.unchanged} 个`)
+        } else {
+          alert('导入成功')
+        }
         
         // 关闭模态框
         const modalElement = document.getElementById('importModal')
@@ -180,36 +200,77 @@ const PostalZonesView = {
         
       } catch (error) {
         console.error('导入错误:', error)
-        alert('导入失败，请检查文件格式')
+        alert(error.message ? `导入失败：${error.message}` : '导入失败，请检查文件格式')
       } finally {
         loading.value = false
       }
     }
 
+    // 偏远邮编表的双层表头（headers 中的 first_row / second_row），每一页都显示在数据行之前
+    const remoteHeaderRows = (headers) => {
+      if (!headers) return []
+      const rows = []
+      if (Array.isArray(headers.first_row)) {
+        rows.push(Object.fromEntries(headers.first_row.map(col => [col, col])))
+      }
+      if (headers.second_row) {
+        rows.push(headers.second_row)
+      }
+      return rows
+    }
+
+    const fetchPostalDetails = async () => {
+      const { postal, type } = detailsPage.postal
+      const endpoint = type === 'receiver' ? 'receiver' : 'remote'
+      const url = `/api/postal-zones/${endpoint}/${postal.id}/details`
+      console.log('请求URL:', url)
+
+      const response = await http.get(url, {
+        params: {
+          offset: detailsPage.offset,
+          limit: detailsPage.limit,
+          prefix: detailsPage.prefix || undefined
+        }
+      })
+      console.log('获取详情响应:', response)
+
+      if (response.data && response.data.success) {
+        editingPostalDetails.value = {
+          type,
+          data: response.data.data || [],
+          headerRows: remoteHeaderRows(response.data.headers)
+        }
+        detailsPage.total = response.data.total || 0
+      } else {
+        console.warn('响应数据异常:', response.data)
+        throw new Error(response.data?.message || '获取详情失败')
+      }
+    }
+
+    const loadDetailsPage = async (offset) => {
+      try {
+        detailsPage.offset = Math.max(0, offset)
+        await fetchPostalDetails()
+      } catch (error) {
+        console.error('获取邮编详情失败:', error)
+        alert(error.response?.data?.message || error.message || '获取邮编详情失败')
+      }
+    }
+
+    const searchDetails = () => loadDetailsPage(0)
+
     const editPostal = async (postal, type = 'receiver') => {
       try {
         console.log('开始获取详情:', { postal, type })
-        const endpoint = type === 'receiver' ? 'receiver' : 'remote'
-        const url = `/api/postal-zones/${endpoint}/${postal.id}/details`
-        console.log('请求URL:', url)
-        
-        const response = await http.get(url)
-        console.log('获取详情响应:', response)
-        
-        if (response.data && response.data.success) {
-          console.log('设置详情数据:', response.data.data)
-          editingPostalDetails.value = {
-            type,
-            data: response.data.data || []
-          }
-          const modalElement = document.getElementById('editModal')
-          if (modalElement) {
-            const modal = new bootstrap.Modal(modalElement)
-            modal.show()
-          }
-        } else {
-          console.warn('响应数据异常:', response.data)
-          throw new Error(response.data?.message || '获取详情失败')
+        detailsPage.postal = { postal, type }
+        detailsPage.offset = 0
+        detailsPage.prefix = ''
+        await fetchPostalDetails()
+
+        const modalElement = document.getElementById('editModal')
+        if (modalElement) {
+          const modal = new bootstrap.Modal(modalElement)
+          modal.show()
         }
       } catch (error) {
         console.error('获取邮编详情失败:', error)
@@ -265,8 +326,8 @@ const PostalZonesView = {
         }
 
         // 验证文件格式
-        if (!remoteImportForm.file.name.match(/\.(xlsx|xls)$/i)) {
-          alert('请选择正确的Excel文件格式(.xlsx或.xls)')
+        if (!remoteImportForm.file.name.match(/\.(xlsx|xls|csv|parquet)$/i)) {
+          alert('请选择正确的文件格式(.xlsx、.xls、.csv或.parquet)')
           return
         }
 
@@ -278,9 +339,13 @@ const PostalZonesView = {
         formData.append('start_code', remoteImportForm.start_code)
 
         // 发送请求
-        await http.post('/api/postal-zones/remote/import', formData)
+        const response = await http.post('/api/postal-zones/remote/import', formData)
+        if (!response.data.job_id) {
+          throw new Error(response.data.message)
+        }
         
-        // 导入成功
+        // 导入在后台任务中执行，等待任务结束
+        await window.utils.waitForJob(response.data.job_id)
         alert('导入成功')
         
         // 关闭模态框
@@ -296,7 +361,7 @@ const PostalZonesView = {
         
       } catch (error) {
         console.error('导入错误:', error)
-        alert('导入失败，请检查文件格式')
+        alert(error.message ? `导入失败：${error.message}` : '导入失败，请检查文件格式')
       } finally {
         loading.value = false
       }
@@ -326,6 +391,9 @@ const PostalZonesView = {
       deleteType,
       showConfirmDialog,
       editingPostalDetails,
+      detailsPage,
+      loadDetailsPage,
+      searchDetails,
       importForm,
       handleFileSelect,
       handleImport,
@@ -495,10 +563,10 @@ const PostalZonesView = {
                          placeholder="请输入5位数字邮编">
                 </div>
                 <div class="mb-3">
-                  <label class="form-label">Excel文件</label>
+                  <label class="form-label">文件（Excel、CSV或Parquet）</label>
                   <input type="file" 
                          class="form-control" 
-                         accept=".xlsx,.xls" 
+                         accept=".xlsx,.xls,.csv,.parquet" 
                          @change="handleFileSelect"
                          required>
                 </div>
@@ -547,6 +615,14 @@ const PostalZonesView = {
               <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Close"></button>
             </div>
             <div class="modal-body">
+              <form class="d-flex gap-2 mb-3" @submit.prevent="searchDetails">
+                <input type="text"
+                       class="form-control form-control-sm"
+                       v-model="detailsPage.prefix"
+                       maxlength="5"
+                       placeholder="按邮编前缀筛选">
+                <button type="submit" class="btn btn-primary btn-sm text-nowrap">筛选</button>
+              </form>
               <div class="table-responsive">
                 <table class="table table-striped">
                   <thead>
@@ -574,8 +650,8 @@ const PostalZonesView = {
                     </tr>
                     <template v-else>
                       <template v-if="editingPostalDetails.type === 'receiver'">
-                        <tr v-for="(item, index) in editingPostalDetails.data" :key="index">
-                          <td>{{ index + 1 }}</td>
+                        <tr v-for="(item, index) in editingPostalDetails.data" :key="detailsPage.offset + index">
+                          <td>{{ detailsPage.offset + index + 1 }}</td>
                           <td>{{ item['Destination ZIP'] }}</td>
                           <td>{{ item['Zone'] }}</td>
                         </tr>
@@ -584,8 +660,16 @@ const PostalZonesView = {
                         </tr>
                       </template>
                       <template v-else>
-                        <tr v-for="(item, index) in editingPostalDetails.data" :key="index">
-                          <td>{{ index + 1 }}</td>
+                        <tr v-for="(header, index) in editingPostalDetails.headerRows" :key="'header-' + index" class="table-secondary">
+                          <td></td>
+                          <td>{{ header['DAS'] }}</td>
+                          <td>{{ header['DAS_EXT'] }}</td>
+                          <td>{{ header['DAS_Remote'] }}</td>
+                          <td>{{ header['DAS_Alaska'] }}</td>
+                          <td>{{ header['DAS_Hawaii'] }}</td>
+                        </tr>
+                        <tr v-for="(item, index) in editingPostalDetails.data" :key="detailsPage.offset + index">
+                          <td>{{ detailsPage.offset + index + 1 }}</td>
                           <td>{{ item['DAS'] }}</td>
                           <td>{{ item['DAS_EXT'] }}</td>
                           <td>{{ item['DAS_Remote'] }}</td>
@@ -602,6 +686,18 @@ const PostalZonesView = {
               </div>
             </div>
             <div class="modal-footer">
+              <span class="me-auto text-muted">
+                共 {{ detailsPage.total }} 条，
+                第 {{ detailsPage.total ? detailsPage.offset + 1 : 0 }} - {{ Math.min(detailsPage.offset + detailsPage.limit, detailsPage.total) }} 条
+              </span>
+              <button type="button"
+                      class="btn btn-outline-secondary"
+                      :disabled="detailsPage.offset === 0"
+                      @click="loadDetailsPage(detailsPage.offset - detailsPage.limit)">上一页</button>
+              <button type="button"
+                      class="btn btn-outline-secondary"
+                      :disabled="detailsPage.offset + detailsPage.limit >= detailsPage.total"
+                      @click="loadDetailsPage(detailsPage.offset + detailsPage.limit)">下一页</button>
               <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">关闭</button>
             </div>
           </div>
@@ -629,10 +725,10 @@ const PostalZonesView = {
                          placeholder="请输入5位数字邮编">
                 </div>
                 <div class="mb-3">
-                  <label class="form-label">Excel文件</label>
+                  <label class="form-label">文件（Excel、CSV或Parquet）</label>
                   <input type="file" 
                          class="form-control" 
-                         accept=".xlsx,.xls" 
+                         accept=".xlsx,.xls,.csv,.parquet" 
                          @change="handleRemoteFileSelect"
                          required>
                   <div class="form-text">
@@ -110,8 +110,10 @@ const ProductList = {
           throw new Error(result.error || '上传失败')
         }
 
-        if (result.data) {
-          excelData.value = result.data
+        // 文件在后台任务中读取，等待任务结束后取预览文本
+        const jobResult = await window.utils.waitForJob(result.job_id)
+        if (jobResult && jobResult.data) {
+          excelData.value = jobResult.data
           showExcelData.value = true
           console.log('设置预览数据:', excelData.value)
         } else {
@@ -3,19 +3,29 @@ import os
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import logging
+from app.utils.excel_reader import TABLE_EXTENSIONS, detect_csv_encoding
+from app.utils.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
 class ExcelImporter:
-    """Excel导入处理器"""
+    """费率表导入处理器
+
+    支持 Excel、CSV 和 Parquet 文件。Excel 文件包含基本信息、区域费率和附加费用三个工作表；
+    CSV 和 Parquet 文件只有一个表，作为区域费率表导入。
+    file 为上传的文件（作为上下文管理器使用时保存到临时文件）或已保存的文件路径。
+    """
     
     def __init__(self, file):
         self.file = file
-        self.temp_path = None
+        self.temp_path = file if isinstance(file, str) else None
         
     def __enter__(self):
-        # 保存临时文件
+        # 保存临时文件，中文文件名经 secure_filename 处理后可能丢失扩展名，扩展名取自原文件名
         filename = secure_filename(self.file.filename)
+        extension = os.path.splitext(self.file.filename)[1].lower()
+        if not filename.lower().endswith(extension):
+            filename = f'{filename}{extension}'
         # 使用项目的temp目录
         temp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp')
         # 确保temp目录存在
@@ -41,8 +51,32 @@ class ExcelImporter:
         if not file.filename:
             raise ValueError('文件名无效')
             
-        if not file.filename.lower().endswith(('.xls', '.xlsx')):
-            raise ValueError('只支持Excel文件格式(.xls, .xlsx)')
+        if not file.filename.lower().endswith(TABLE_EXTENSIONS):
+            raise ValueError('只支持Excel、CSV和Parquet文件格式(.xls, .xlsx, .csv, .parquet)')
+    
+    @property
+    def extension(self):
+        return os.path.splitext(self.temp_path)[1].lower()
+    
+    @property
+    def single_table(self):
+        """CSV 和 Parquet 文件只有一个表"""
+        return self.extension in ('.csv', '.parquet')
+    
+    def read_sheets(self):
+        """读取所有工作表，返回 DataFrame 列表
+
+        CSV 所有列按字符串读取，邮编和重量开头的0不会丢失，空单元格为 NaN；Parquet 保持文件中的列类型。
+        """
+        if self.extension == '.csv':
+            return [pd.read_csv(self.temp_path, dtype=str, encoding=detect_csv_encoding(self.temp_path))]
+        if self.extension == '.parquet':
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ValidationError('读取Parquet文件需要安装pyarrow，请转换为CSV格式后导入')
+            return [pq.read_table(self.temp_path).to_pandas()]
+        return list(pd.read_excel(self.temp_path, sheet_name=None).values())
     
     def process_basic_info(self, df):
         """处理基本信息sheet"""
@@ -281,18 +315,21 @@ class ExcelImporter:
         return surcharges
     
     def process_excel(self):
-        """处理Excel文件"""
+        """处理导入文件，CSV 和 Parquet 文件的结果只包含 zone_rates"""
         try:
             # 读取所有sheet
-            dfs = pd.read_excel(self.temp_path, sheet_name=None)
+            dfs = self.read_sheets()
+            
+            if self.single_table:
+                return {'zone_rates': self.process_zone_rates(dfs[0])}
             
             if len(dfs) < 3:
                 raise ValueError('Excel文件必须包含3个工作表')
             
             # 获取三个DataFrame
-            df_basic = list(dfs.values())[0]  # 基本信息sheet
-            df_rates = list(dfs.values())[1]  # 区域费率sheet
-            df_surcharges = list(dfs.values())[2]  # 附加费用sheet
+            df_basic = dfs[0]  # 基本信息sheet
+            df_rates = dfs[1]  # 区域费率sheet
+            df_surcharges = dfs[2]  # 附加费用sheet
             
             # 处理每个sheet
             product_info = self.process_basic_info(df_basic)
@@ -306,6 +343,8 @@ class ExcelImporter:
                 'surcharges': surcharges
             }
             
+        except ValidationError:
+            raise
         except Exception as e:
             logger.error(f"处理Excel文件失败: {str(e)}", exc_info=True)
             raise ValueError(f'处理Excel文件失败: {str(e)}')
\ No newline at end of file
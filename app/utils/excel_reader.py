@@ -0,0 +1,228 @@
+import codecs
+import csv
+import logging
+import os
+from datetime import date, datetime, time
+from app.utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# 支持导入的表格文件扩展名
+TABLE_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.parquet')
+# Parquet文件每批读取的行数
+PARQUET_BATCH_ROWS = 10000
+# 检测CSV文件编码时读取的字节数
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+
+def cell_value(value):
+    """规范化单元格值：空文本转换为 None、整数值的浮点数转换为整数（与 pandas read_excel 一致），日期时间转换为 ISO 格式文本"""
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def cell_text(value):
+    """单元格的文本，与 pandas read_excel(dtype=str, keep_default_na=False) 一致，空单元格为空字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def unique_headers(cells):
+    """生成列名，与 pandas 一致：空表头为 Unnamed: 序号，重复的列名依次加 .1 .2 后缀"""
+    columns = []
+    seen = set()
+    for i, cell in enumerate(cells):
+        name = f'Unnamed: {i}' if cell is None or cell == '' else cell_text(cell)
+        base, n = name, 0
+        while name in seen:
+            n += 1
+            name = f'{base}.{n}'
+        seen.add(name)
+        columns.append(name)
+    return columns
+
+
+class TableRowReader:
+    """逐行读取表格文件的基类
+
+    第一行为表头，之后每行按表头转换为字典，末尾的空行丢弃，表头范围之外的单元格忽略。
+    text 为 True 时所有单元格转换为文本。作为上下文管理器使用，退出时关闭文件。
+    total_rows 为文件记录或估算的数据行数（不含表头），只用于估算进度，无法获取时为 None。
+    子类实现 _open，返回逐行产生单元格元组的迭代器（包括表头行），并设置 _close。
+    """
+
+    def __init__(self, path, text=False):
+        self.path = path
+        self.text = text
+        self.columns = []
+        self.total_rows = None
+        self._close = None
+        self._rows = None
+
+    def __enter__(self):
+        self._rows = self._open()
+        header = list(next(self._rows, None) or [])
+        while header and (header[-1] is None or header[-1] == ''):
+            header.pop()
+        self.columns = unique_headers(header)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def _open(self):
+        raise NotImplementedError
+
+    def rows(self):
+        """逐行返回与 columns 对应的单元格值列表"""
+        width = len(self.columns)
+        convert = cell_text if self.text else cell_value
+        blank = [convert(None)] * width
+        # 与 pandas 一致，中间的空行保留，末尾的空行丢弃；空行只计数，遇到非空行时再输出
+        pending_blank = 0
+        for row in self._rows:
+            cells = list(row[:width])
+            if all(cell is None or cell == '' for cell in cells):
+                pending_blank += 1
+                continue
+            for _ in range(pending_blank):
+                yield list(blank)
+            pending_blank = 0
+            cells.extend([None] * (width - len(cells)))
+            yield [convert(cell) for cell in cells]
+
+    def records(self):
+        """逐行返回 {列名: 单元格值} 字典"""
+        for row in self.rows():
+            yield dict(zip(self.columns, row))
+
+    def chunks(self, size):
+        """按块返回行列表，每块最多 size 行"""
+        chunk = []
+        for row in self.rows():
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ExcelRowReader(TableRowReader):
+    """逐行读取Excel文件的第一个工作表
+
+    .xlsx 使用 openpyxl 的只读模式按行流式读取，不把整个工作簿加载到内存；.xls 使用 xlrd 读取。
+    """
+
+    def _open(self):
+        if self.path.lower().endswith('.xls'):
+            return self._open_xls()
+        return self._open_xlsx()
+
+    def _open_xlsx(self):
+        from openpyxl import load_workbook
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        self._close = workbook.close
+        sheet = workbook.worksheets[0]
+        if sheet.max_row:
+            self.total_rows = max(sheet.max_row - 1, 0)
+        return sheet.iter_rows(values_only=True)
+
+    def _open_xls(self):
+        try:
+            import xlrd
+        except ImportError:
+            raise ValidationError('读取.xls文件需要安装xlrd，请转换为.xlsx格式后导入')
+        book = xlrd.open_workbook(self.path, on_demand=True)
+        self._close = book.release_resources
+        sheet = book.sheet_by_index(0)
+        self.total_rows = max(sheet.nrows - 1, 0)
+
+        def convert(cell):
+            if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                return None
+            if cell.ctype == xlrd.XL_CELL_DATE:
+                return xlrd.xldate_as_datetime(cell.value, book.datemode)
+            if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+                return bool(cell.value)
+            return cell.value
+
+        return (tuple(convert(cell) for cell in sheet.row(i)) for i in range(sheet.nrows))
+
+
+
+class CsvRowReader(TableRowReader):
+    """逐行读取CSV文件
+
+    单元格都按文本读取，邮编开头的0不会丢失。UTF-8（可带BOM）无法解码时按 GB18030 读取，
+    兼容中文 Excel 另存的CSV文件。
+    """
+
+    def _open(self):
+        encoding = detect_csv_encoding(self.path)
+        self.total_rows = max(count_lines(self.path) - 1, 0)
+        f = open(self.path, newline='', encoding=encoding)
+        self._close = f.close
+        return csv.reader(f)
+
+
+class ParquetRowReader(TableRowReader):
+    """按批读取Parquet文件，列保持文件中的类型，字符串列原样读取"""
+
+    def _open(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValidationError('读取Parquet文件需要安装pyarrow，请转换为CSV格式后导入')
+        parquet = pq.ParquetFile(self.path)
+        self._close = parquet.close
+        self.total_rows = parquet.metadata.num_rows
+
+        def rows():
+            yield tuple(parquet.schema_arrow.names)
+            for batch in parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS):
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+
+        return rows()
+
+
+def detect_csv_encoding(path):
+    """CSV文件的编码：开头部分能按 UTF-8 解码时为 utf-8-sig，否则为 gb18030"""
+    with open(path, 'rb') as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+
+def count_lines(path):
+    """按换行符统计文件行数，单元格内的换行也会计入，只用于估算进度"""
+    lines = 0
+    last = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            lines += block.count(b'\n')
+            last = block
+    return lines + (1 if last and not last.endswith(b'\n') else 0)
+
+
+def open_table_reader(path, text=False):
+    """按扩展名选择逐行读取器：.csv 和 .parquet 按对应格式读取，其余按Excel文件读取"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CsvRowReader(path, text)
+    if extension == '.parquet':
+        return ParquetRowReader(path, text)
+    return ExcelRowReader(path, text)
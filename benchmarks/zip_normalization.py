@@ -0,0 +1,103 @@
+"""邮编表规范化的性能对比
+
+对比三种处理方式在同一份分区表数据上的耗时（不含读取Excel文件）：
+- apply: 原来的整表 DataFrame + 逐个单元格 apply(lambda) 两遍处理，再 to_json
+- per-cell: 逐行逐个单元格处理后写入 ChartWriter
+- vectorized: ZipNormalizer 按块用 pandas .str 方法处理整列后按列写入 ChartWriter
+
+在项目根目录运行: python -m benchmarks.zip_normalization [行数]
+"""
+import json
+import random
+import sys
+import time
+import pandas as pd
+from app.services.chart_codec import ChartWriter, encode_chart
+from app.services.zip_normalizer import NORMALIZE_CHUNK_ROWS, ZipNormalizer, detect_columns, keyword_zip_columns
+
+COLUMNS = ['Destination ZIP Codes', 'Destination ZIP Codes.1', 'Destination ZIP Codes.2', 'Zone', 'Note']
+COLUMN_MAPPINGS = {
+    'col1': ['Destination ZIP Codes'],
+    'col2': ['Destination ZIP Codes.1'],
+    'col3': ['Destination ZIP Codes.2'],
+}
+
+
+def make_rows(count, seed=1):
+    """生成模拟分区表的行：邮编、邮编范围、带空白的单元格和空单元格"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        start = rng.randint(0, 99000)
+        rows.append([
+            f' {rng.randint(100, 99999)} ',
+            f'{start:05d}-{start + rng.randint(0, 999):05d}',
+            str(rng.randint(0, 999)) if rng.random() < 0.8 else '',
+            str(rng.randint(2, 8)),
+            '',
+        ])
+    return rows
+
+
+def run_apply(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    for col in df.columns:
+        df[col] = df[col].apply(lambda x: str(x).strip())
+        if any(name in col for name in ['ZIP', 'zip', '邮编']):
+            df[col] = df[col].apply(lambda x: x.zfill(5) if x.isdigit() else x)
+    renames = detect_columns(df.columns, COLUMN_MAPPINGS)
+    df = df.rename(columns=renames)
+    for col in df.columns:
+        if col.startswith('col'):
+            df[col] = df[col].apply(lambda x: x.zfill(5) if x.isdigit() else x)
+    return encode_chart(json.loads(df.to_json(orient='records', force_ascii=False)))
+
+
+def run_per_cell(rows):
+    renames = detect_columns(COLUMNS, COLUMN_MAPPINGS)
+    columns = [renames.get(col, col) for col in COLUMNS]
+    zip_columns = set(keyword_zip_columns(COLUMNS, renames))
+    writer = ChartWriter()
+    for cells in rows:
+        row = {}
+        for col, value in zip(columns, cells):
+            value = value.strip()
+            if col in zip_columns and value.isdigit():
+                value = value.zfill(5)
+            row[col] = value
+        writer.append(row)
+    return writer.finish()
+
+
+def run_vectorized(rows):
+    renames = detect_columns(COLUMNS, COLUMN_MAPPINGS)
+    zip_columns = keyword_zip_columns(COLUMNS, renames)
+    normalizer = ZipNormalizer(COLUMNS, renames=renames, zip_columns=zip_columns)
+    writer = ChartWriter()
+    chunks = (rows[i:i + NORMALIZE_CHUNK_ROWS] for i in range(0, len(rows), NORMALIZE_CHUNK_ROWS))
+    normalizer.write(chunks, writer)
+    return writer.finish()
+
+
+def best_of(func, rows, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    rows = make_rows(count)
+    print(f'{count} 行 x {len(COLUMNS)} 列')
+    results = {}
+    for name, func in [('apply', run_apply), ('per-cell', run_per_cell), ('vectorized', run_vectorized)]:
+        seconds, results[name] = best_of(func, rows)
+        print(f'{name:>10}: {seconds * 1000:8.1f} ms')
+    print('结果一致' if len(set(results.values())) == 1 else '结果不一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -51,6 +51,15 @@ class Config:
     LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
     LOG_FILE = os.path.join(basedir, 'logs', 'app.log')
     
+    # 分区数组配置（按起始邮编编译的 mmap 文件，由所有工作进程共享）
+    ZONE_ARRAY_DIR = os.path.join(basedir, 'data', 'zone_arrays')
+
+    # 导入任务配置（每个工作进程的导入线程数；未结束的任务超过该秒数没有更新时视为中断）
+    IMPORT_JOB_WORKERS = 2
+    IMPORT_JOB_STALE_SECONDS = 3600
+    # 批量导入压缩包时读取分区表文件的进程数，为 None 时使用全部CPU核心
+    IMPORT_ARCHIVE_PROCESSES = None
+    
     @staticmethod
     def init_app(app):
         """初始化应用配置"""
@@ -0,0 +1,105 @@
+"""add postal_zone_ranges
+
+Revision ID: 3f9c2a7d41b6
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+import json
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d41b6'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+_ZONE_PATTERN = re.compile(r'^(?:zone)?\s*(\d+)$', re.IGNORECASE)
+
+
+def _zone_number(value):
+    """解析区域编号，与 rate_card.parse_zone_number 一致"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _ZONE_PATTERN.match(str(value).strip())
+    return int(match.group(1)) if match else None
+
+
+def _zip5_bounds(start, end):
+    """将按字符串比较的邮编范围换算为5位邮编的整数闭区间，与 zone_lookup.zip5_bounds 一致"""
+    if not (start.isascii() and start.isdigit() and end.isascii() and end.isdigit()):
+        return None
+    dest_start = int(start.ljust(5, '0')) if len(start) <= 5 else int(start[:5]) + 1
+    dest_end = int(end.ljust(5, '0')) - 1 if len(end) < 5 else int(end[:5])
+    return (dest_start, dest_end) if dest_start <= dest_end else None
+
+
+def _range_rows(postal_zone_id, start_code, excel_content):
+    """从分区表内容展开邮编范围行"""
+    try:
+        zone_data = json.loads(excel_content)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(zone_data, list):
+        return []
+
+    rows = []
+    for seq, entry in enumerate(zone_data):
+        if not isinstance(entry, dict):
+            continue
+        parts = str(entry.get('Destination ZIP', '')).split('-')
+        if len(parts) != 2:
+            continue
+        bounds = _zip5_bounds(parts[0].strip(), parts[1].strip())
+        if bounds is None:
+            continue
+        rows.append({
+            'postal_zone_id': postal_zone_id,
+            'origin': int(start_code),
+            'dest_start': bounds[0],
+            'dest_end': bounds[1],
+            'zone': _zone_number(entry.get('Zone')),
+            'seq': seq
+        })
+    return rows
+
+
+def upgrade():
+    ranges = op.create_table(
+        'postal_zone_ranges',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('postal_zone_id', sa.Integer(), nullable=False, comment='分区表记录'),
+        sa.Column('origin', sa.Integer(), nullable=False, comment='起始邮编'),
+        sa.Column('dest_start', sa.Integer(), nullable=False, comment='目的邮编范围开始'),
+        sa.Column('dest_end', sa.Integer(), nullable=False, comment='目的邮编范围结束'),
+        sa.Column('zone', sa.Integer(), nullable=True, comment='区域'),
+        sa.Column('seq', sa.Integer(), nullable=False, comment='在分区表中的顺序'),
+        sa.ForeignKeyConstraint(['postal_zone_id'], ['postal_zones.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_postal_zone_ranges_lookup', 'postal_zone_ranges', ['origin', 'dest_start', 'dest_end'])
+    op.create_index('ix_postal_zone_ranges_postal_zone_id', 'postal_zone_ranges', ['postal_zone_id'])
+
+    # 从已有的收件邮编分区表回填
+    conn = op.get_bind()
+    postals = conn.execute(sa.text(
+        "SELECT id, start_code, excel_content FROM postal_zones WHERE type = 'receiver'"
+    )).fetchall()
+    for postal_zone_id, start_code, excel_content in postals:
+        start_code = (start_code or '').strip()
+        if not (len(start_code) == 5 and start_code.isdigit()) or not excel_content:
+            continue
+        rows = _range_rows(postal_zone_id, start_code, excel_content)
+        if rows:
+            op.bulk_insert(ranges, rows)
+
+
+def downgrade():
+    op.drop_index('ix_postal_zone_ranges_postal_zone_id', table_name='postal_zone_ranges')
+    op.drop_index('ix_postal_zone_ranges_lookup', table_name='postal_zone_ranges')
+    op.drop_table('postal_zone_ranges')
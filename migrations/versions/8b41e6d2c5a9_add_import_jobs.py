@@ -0,0 +1,41 @@
+"""add import_jobs
+
+Revision ID: 8b41e6d2c5a9
+Revises: 3f9c2a7d41b6
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41e6d2c5a9'
+down_revision = '3f9c2a7d41b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False, comment='导入类型'),
+        sa.Column('status', sa.String(length=20), nullable=False, comment='状态'),
+        sa.Column('progress', sa.Integer(), nullable=False, comment='进度百分比'),
+        sa.Column('message', sa.String(length=255), nullable=True, comment='当前步骤'),
+        sa.Column('file_name', sa.String(length=255), nullable=True, comment='文件名'),
+        sa.Column('result', sa.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=True, comment='导入结果'),
+        sa.Column('error', sa.Text(), nullable=True, comment='错误信息'),
+        sa.Column('created_by', sa.Integer(), nullable=True, comment='提交用户'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('import_jobs')
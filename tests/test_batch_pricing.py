@@ -0,0 +1,77 @@
+import json
+import unittest
+import numpy as np
+from datetime import date
+from app.services.batch_pricing import BatchPricer, round_half_even
+from app.services.surcharge_rules import SurchargeRules
+from app.services.tariff_snapshot import TariffSnapshot
+
+class _Product:
+    """只包含计费所需字段的产品"""
+    id = None
+    updated_at = None
+    volume_weight_factor = 250
+    zone_rates = json.dumps([
+        {'weight': 1, '2': '10.00', '3': '11.00'},
+        {'weight': 50, '2': '50.00', '3': '55.00'},
+        {'weight': 100, '2': '100.00', '3': '110.00'},
+    ])
+    surcharges = json.dumps([
+        {
+            'title': '1. 额外处理费(Additional Handling Surcharge)',
+            'items': [{'name': '第二长边＞30英寸', 'fees': {'2': '20.00', '3': '22.00'}}]
+        },
+        {
+            'title': '4. 住宅地址附加费(Residential Surcharge)',
+            'items': [
+                {'name': 'FedEx Home Delivery', 'fees': {'2': '5.00'}},
+                {'name': 'FedEx Commercial Ground', 'fees': {'2': '6.00'}},
+            ]
+        },
+        {
+            'title': '增值服务费项目',
+            'items': [{
+                'name': '5. 不可发包裹(Unauthorized)',
+                'items': [{'name': 'a) 实重＞150磅', 'fees': {'2': '1000'}}]
+            }]
+        },
+    ], ensure_ascii=False)
+
+class BatchPricerTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        product = _Product()
+        snapshot = TariffSnapshot(SurchargeRules(product.surcharges), date(2024, 6, 1), fuel_rate=10)
+        self.pricer = BatchPricer(product, snapshot=snapshot)
+
+    def test_price_batch(self):
+        """测试批量计费结果"""
+        result = self.pricer.price(
+            weight_kg=[2, 2, 80, 2],
+            length_cm=[20, 20, 20, 20],
+            width_cm=[20, 80, 20, 20],
+            height_cm=[20, 20, 20, 20],
+            zones=[2, 'Zone3', 2, 8]
+        )
+        # 2kg -> 5磅，8x8x8英寸 -> 体积重3磅，使用50磅档位
+        self.assertEqual(result['chargeable_weight'][0], 5)
+        self.assertEqual(result['total_amount'][0], 60.5)
+        # 第二长边32英寸触发额外处理费
+        self.assertEqual(result['handling_fee'][1], 22.0)
+        self.assertEqual(result['total_amount'][1], round((55 + 5 + 22) * 1.1, 2))
+        # 实重177磅为不可发包裹
+        self.assertTrue(result['is_unauthorized'][2])
+        self.assertEqual(result['total_amount'][2], 1000.0)
+        # 区域8没有费率
+        self.assertEqual(result['error'][3], '区域8的费率未设置')
+        self.assertTrue(np.isnan(result['total_amount'][3]))
+        self.assertIsNone(result['error'][0])
+
+    def test_round_half_even_matches_builtin(self):
+        """测试向量化舍入与内置 round() 一致"""
+        values = np.array([0.285, 1.005, 2.675, 10.125, 3.14159, 7.5])
+        expected = [round(value, 2) for value in values.tolist()]
+        self.assertEqual(round_half_even(values).tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
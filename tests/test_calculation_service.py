@@ -0,0 +1,73 @@
+import unittest
+from datetime import date, datetime
+from unittest import mock
+from app.services.calculation import CalculationService, _services
+from app.services.rate_card import RateCard
+from app.services.surcharge_rules import SurchargeRules
+from app.services.tariff_snapshot import TariffSnapshot
+
+class _Product:
+    def __init__(self, updated_at):
+        self.id = 1
+        self.name = '测试产品'
+        self.updated_at = updated_at
+        self.zone_rates = [{'weight': 1, 'unit': 'lb', 'Zone2': 10.0}]
+        self.surcharges = []
+
+class CalculationServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        _services.invalidate()
+        rules = SurchargeRules([])
+        self.snapshot = TariffSnapshot(rules, date(2026, 1, 1))
+        self.patches = [
+            mock.patch('app.services.calculation.get_rate_card', return_value=RateCard([])),
+            mock.patch('app.services.calculation.get_surcharge_rules', return_value=rules),
+            mock.patch('app.services.calculation.get_tariff_snapshot', return_value=self.snapshot),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        for patch in self.patches:
+            patch.stop()
+        _services.invalidate()
+
+    def test_service_reused_per_product_version(self):
+        """测试同一产品版本复用服务实例，updated_at 变化时重建"""
+        product = _Product(datetime(2026, 1, 1))
+        first = CalculationService.for_product(product)
+        self.assertIs(CalculationService.for_product(product), first)
+        product.updated_at = datetime(2026, 1, 2)
+        self.assertIsNot(CalculationService.for_product(product), first)
+
+    def test_failed_service_not_cached(self):
+        """测试创建服务失败时抛出异常且不缓存"""
+        product = _Product(datetime(2026, 1, 1))
+        with mock.patch('app.services.calculation.get_surcharge_rules', side_effect=RuntimeError('数据库错误')):
+            with self.assertRaises(RuntimeError):
+                CalculationService.for_product(product)
+        service = CalculationService.for_product(product)
+        self.assertIs(service.snapshot, self.snapshot)
+        self.assertIs(CalculationService.for_product(product), service)
+
+    def test_oversize_fee_by_address_type(self):
+        """测试超大超尺寸费按住宅地址和商业地址分别取费，与 /calculate 一致"""
+        oversize_item = 'a)实际重量＜150磅，且130英寸＜长+[2*(宽+高)]≤165英寸'
+        rules = SurchargeRules([
+            {'title': '2. 超大超尺寸费(Oversize-商业地址)', 'items': [{'name': oversize_item, 'fees': {'3': '80.00'}}]},
+            {'title': '3. 超大超尺寸费(Oversize-住宅地址)', 'items': [{'name': oversize_item, 'fees': {'3': '100.00'}}]},
+        ])
+        snapshot = TariffSnapshot(rules, date(2026, 1, 1))
+        with mock.patch('app.services.calculation.get_surcharge_rules', return_value=rules), \
+                mock.patch('app.services.calculation.get_tariff_snapshot', return_value=snapshot):
+            service = CalculationService.for_product(_Product(datetime(2026, 1, 1)))
+        # 长度+周长 = 60 + 2 * (20 + 20) = 140 英寸
+        residential, _ = service._calculate_surcharges(3, 60, 60, 20, 20, True, False)
+        commercial, _ = service._calculate_surcharges(3, 60, 60, 20, 20, False, False)
+        self.assertEqual([s['total_fee'] for s in residential], [100.0])
+        self.assertEqual([s['total_fee'] for s in commercial], [80.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime
+from flask import Flask
+from app.extensions import db, init_extensions
+from app.models import PostalZone, Product, User
+from app.models.fuel_rate import FuelRate
+from app.routes.api import bp as api_bp
+from app.services.quote_cache import invalidate_quote_cache
+from app.services.tariff_snapshot import invalidate_tariff_snapshots
+from app.services.zone_lookup import invalidate_remote_index, invalidate_zone_indexes
+
+PARCEL = {'fromPostalCode': '91710', 'toPostalCode': '10001', 'weight': 5, 'length': 40, 'width': 30, 'height': 20}
+
+class CalculatorApiTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        self.zone_array_dir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config.update(
+            TESTING=True,
+            SECRET_KEY='test',
+            SQLALCHEMY_DATABASE_URI='sqlite://',
+            ZONE_ARRAY_DIR=self.zone_array_dir
+        )
+        init_extensions(self.app)
+        self.app.register_blueprint(api_bp)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        for invalidate in (invalidate_quote_cache, invalidate_tariff_snapshots,
+                           invalidate_zone_indexes, invalidate_remote_index):
+            invalidate()
+
+        user = User(username='john', email='john@example.com', role='user')
+        user.set_password('cat')
+        chart = [{'Destination ZIP': '005-299', 'Zone': '3'}, {'Destination ZIP': '300-999', 'Zone': 'Zone5'}]
+        rates = [{'weight': w, 'Zone3': 10 + w, 'Zone5': 20 + w} for w in range(1, 151)]
+        self.product = Product(name='Ground', carrier='FEDEX', start_date=date(2025, 1, 1),
+                               zone_rates=json.dumps(rates), surcharges='[]')
+        db.session.add_all([
+            user, self.product,
+            Product(name='Express', carrier='UPS', start_date=date(2025, 1, 1), zone_rates=json.dumps(
+                [{'weight': w, 'Zone3': 5 + w, 'Zone5': 8 + w} for w in range(1, 151)]), surcharges='[]'),
+            PostalZone(start_code='91710', type='receiver', excel_content=json.dumps(chart)),
+            PostalZone(start_code='60601', type='receiver', excel_content=json.dumps(
+                [{'Destination ZIP': '005-999', 'Zone': '5'}])),
+            PostalZone(start_code='remote', type='remote', excel_content=json.dumps(
+                {'headers': {}, 'data': [{'DAS': '35004'}]})),
+            FuelRate(rate=10.0, effective_date=datetime(2025, 1, 1), is_active=True)
+        ])
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.zone_array_dir)
+
+    def test_rate_shop(self):
+        """测试多产品比价按总费用排序"""
+        response = self.client.post('/api/calculator/rate-shop', json=PARCEL)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(data['zone'], 3)
+        self.assertEqual([result['product']['name'] for result in data['results']], ['Express', 'Ground'])
+        amounts = [result['totalAmount'] for result in data['results']]
+        self.assertEqual(amounts, sorted(amounts))
+        self.assertEqual(data['errors'], [])
+
+        # 比价结果中添加的产品信息不能写入缓存的报价
+        response = self.client.post('/api/calculator/calculate', json=dict(PARCEL, product_id=self.product.id))
+        single = response.get_json()['data']
+        self.assertNotIn('product', single)
+        ground = next(result for result in data['results'] if result['product']['name'] == 'Ground')
+        self.assertEqual(single['totalAmount'], ground['totalAmount'])
+
+    def test_rate_shop_validation(self):
+        """测试比价缺少必填字段和邮编不存在"""
+        response = self.client.post('/api/calculator/rate-shop', json=dict(PARCEL, weight=None))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'success': False, 'message': '缺少必填字段: weight'})
+        response = self.client.post('/api/calculator/rate-shop', json=dict(PARCEL, fromPostalCode='00000'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.get_json()['success'])
+
+    def test_best_origin(self):
+        """测试选择最便宜的起始邮编，找不到区域的起始邮编放在 errors 中"""
+        body = dict(PARCEL, fromPostalCodes=['60601', '91710', '00000'], product_id=self.product.id)
+        response = self.client.post('/api/calculator/best-origin', json=body)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(data['bestOrigin'], '91710')
+        self.assertEqual([result['origin'] for result in data['results']], ['91710', '60601'])
+        self.assertEqual([error['origin'] for error in data['errors']], ['00000'])
+
+    def test_best_origin_validation(self):
+        """测试候选起始邮编不是列表"""
+        body = dict(PARCEL, fromPostalCodes='91710', product_id=self.product.id)
+        response = self.client.post('/api/calculator/best-origin', json=body)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'], 'fromPostalCodes 必须是起始邮编列表')
+
+    def test_calculate_batch_ndjson(self):
+        """测试NDJSON批量计算逐行输出结果，单个包裹失败不影响其他包裹"""
+        lines = [json.dumps(PARCEL), '{bad json', json.dumps(dict(PARCEL, toPostalCode='50000'))]
+        response = self.client.post(f'/api/calculator/calculate-batch?product_id={self.product.id}',
+                                    data='\n'.join(lines), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([(result['index'], result['success']) for result in results], [(0, True), (1, False), (2, True)])
+        self.assertEqual((results[0]['data']['zone'], results[2]['data']['zone']), (3, 5))
+        self.assertTrue(results[1]['message'].startswith('无效的JSON行'))
+
+        # 相同包裹再次计算命中报价缓存，返回的结果不受上一次响应的影响
+        response = self.client.post(f'/api/calculator/calculate-batch?product_id={self.product.id}', json=[PARCEL])
+        again = json.loads(response.get_data(as_text=True).splitlines()[0])
+        self.assertEqual(again['data'], results[0]['data'])
+
+    def test_calculate_batch_validation(self):
+        """测试批量计算缺少产品和产品不存在"""
+        response = self.client.post('/api/calculator/calculate-batch', json=[PARCEL])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'], '缺少必填字段: product_id')
+        response = self.client.post('/api/calculator/calculate-batch?product_id=999', json=[PARCEL])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'], '产品不存在')
+
+if __name__ == '__main__':
+    unittest.main()
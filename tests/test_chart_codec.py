@@ -0,0 +1,48 @@
+import json
+import unittest
+from app.services.chart_codec import ChartWriter, decode_chart, decode_chart_columns, encode_chart, is_compact_chart
+from app.services.zone_lookup import build_remote_index, parse_remote_rows, parse_zone_chart
+
+class ChartCodecTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        self.records = [{'Destination ZIP': f'{i:03d}-{i + 4:03d}', 'Zone': 2 + i % 7} for i in range(5, 1000, 5)]
+        self.document = {
+            'headers': {'first_row': ['DAS', 'DAS_EXT'], 'second_row': {'DAS': '偏远', 'DAS_EXT': '超偏远'}},
+            'data': [{'DAS': f'{i:05d}', 'DAS_EXT': ''} for i in range(1000, 3000)]
+        }
+
+    def test_round_trip(self):
+        """测试编码后解码得到相同内容"""
+        for content in (self.records, self.document, [{'a': 1}, {'b': 2}], []):
+            encoded = encode_chart(content)
+            self.assertTrue(is_compact_chart(encoded))
+            self.assertEqual(decode_chart(encoded), content)
+        self.assertLess(len(encode_chart(self.records)), len(json.dumps(self.records)) / 5)
+
+    def test_legacy_json_compatible(self):
+        """测试原来的JSON内容和压缩格式解析结果一致"""
+        legacy = json.dumps(self.records)
+        self.assertFalse(is_compact_chart(legacy))
+        self.assertEqual(parse_zone_chart(encode_chart(self.records)), parse_zone_chart(legacy))
+        self.assertEqual(decode_chart_columns(legacy, ['Zone'])['Zone'], [row['Zone'] for row in self.records])
+        self.assertEqual(build_remote_index(parse_remote_rows(encode_chart(self.document))),
+                         build_remote_index(parse_remote_rows(json.dumps(self.document))))
+
+    def test_chart_writer(self):
+        """测试逐行写入的结果与一次编码相同，列不一致时退回逐行保存"""
+        writer = ChartWriter(document=True, headers=self.document['headers'])
+        for row in self.document['data']:
+            writer.append(row)
+        self.assertEqual(writer.count, len(self.document['data']))
+        self.assertEqual(decode_chart(writer.finish()), self.document)
+
+        rows = [{'a': 1}, {'a': '2'}, {'b': None}, {'a': 4}]
+        writer = ChartWriter()
+        for row in rows:
+            writer.append(row)
+        self.assertIsNone(writer.columns)
+        self.assertEqual(decode_chart(writer.finish()), rows)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from openpyxl import Workbook
+from app.utils.excel_import import ExcelImporter
+from app.utils.excel_reader import ExcelRowReader, cell_text, open_table_reader, unique_headers
+from app.utils.exceptions import ValidationError
+
+class ExcelRowReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in [
+            ['ZIP', 'ZIP', None, 'Zone', None],
+            ['00501', 501, 'x', 3.0, None],
+            [None, None, None, None, None],
+            ['005-299', 7.5, None, 'Zone5', None],
+            [None, None, None, None, None],
+        ]:
+            sheet.append(row)
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        workbook.save(self.path)
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        os.remove(self.path)
+
+    def test_unique_headers(self):
+        """测试列名与 pandas 一致：空表头为 Unnamed，重复列名加后缀"""
+        self.assertEqual(unique_headers(['ZIP', 'ZIP', None, 'ZIP']), ['ZIP', 'ZIP.1', 'Unnamed: 2', 'ZIP.2'])
+        self.assertEqual(cell_text(3.0), '3')
+        self.assertEqual(cell_text(datetime(2024, 1, 2)), '2024-01-02 00:00:00')
+        self.assertEqual(cell_text(None), '')
+
+    def test_records(self):
+        """测试逐行读取：中间的空行保留，末尾的空行和无表头的列丢弃"""
+        with ExcelRowReader(self.path, text=True) as reader:
+            self.assertEqual(reader.columns, ['ZIP', 'ZIP.1', 'Unnamed: 2', 'Zone'])
+            records = list(reader.records())
+        self.assertEqual(records, [
+            {'ZIP': '00501', 'ZIP.1': '501', 'Unnamed: 2': 'x', 'Zone': '3'},
+            {'ZIP': '', 'ZIP.1': '', 'Unnamed: 2': '', 'Zone': ''},
+            {'ZIP': '005-299', 'ZIP.1': '7.5', 'Unnamed: 2': '', 'Zone': 'Zone5'},
+        ])
+
+        with ExcelRowReader(self.path) as reader:
+            records = list(reader.records())
+        self.assertEqual(records[0], {'ZIP': '00501', 'ZIP.1': 501, 'Unnamed: 2': 'x', 'Zone': 3})
+        self.assertEqual(records[1]['ZIP'], None)
+
+    def test_csv_and_parquet_match_excel(self):
+        """测试CSV和Parquet文件的读取结果与Excel文件一致，邮编开头的0保留"""
+        with ExcelRowReader(self.path, text=True) as reader:
+            expected = list(reader.records())
+
+        lines = ['ZIP,ZIP,,Zone,', '00501,501,x,3,', ',,,,', '005-299,7.5,,Zone5,', ',,,,', '']
+        for encoding in ('utf-8-sig', 'gb18030'):
+            fd, path = tempfile.mkstemp(suffix='.csv')
+            os.close(fd)
+            try:
+                with open(path, 'w', encoding=encoding, newline='') as f:
+                    f.write('\r\n'.join(lines))
+                with open_table_reader(path, text=True) as reader:
+                    self.assertEqual(reader.total_rows, 4)
+                    self.assertEqual(list(reader.records()), expected)
+            finally:
+                os.remove(path)
+
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('未安装pyarrow')
+        fd, path = tempfile.mkstemp(suffix='.parquet')
+        os.close(fd)
+        try:
+            pq.write_table(pa.table({'ZIP': ['00501', '', '005-299'], 'ZIP.1': [501, None, 7.5],
+                                     'Unnamed: 2': ['x', None, None], 'Zone': ['3', None, 'Zone5']}), path)
+            with open_table_reader(path, text=True) as reader:
+                self.assertEqual(list(reader.records()), expected)
+            with open_table_reader(path) as reader:
+                self.assertEqual(next(reader.records()), {'ZIP': '00501', 'ZIP.1': 501, 'Unnamed: 2': 'x', 'Zone': '3'})
+        finally:
+            os.remove(path)
+
+    def test_parquet_without_pyarrow(self):
+        """测试未安装pyarrow时读取Parquet文件，费率表导入和逐行读取都抛出 ValidationError"""
+        fd, path = tempfile.mkstemp(suffix='.parquet')
+        os.close(fd)
+        try:
+            with mock.patch.dict(sys.modules, {'pyarrow.parquet': None}):
+                with self.assertRaises(ValidationError) as cm:
+                    ExcelImporter(path).process_excel()
+                self.assertEqual(cm.exception.message, '读取Parquet文件需要安装pyarrow，请转换为CSV格式后导入')
+                with self.assertRaises(ValidationError):
+                    with open_table_reader(path) as reader:
+                        list(reader.records())
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from app.models.import_job import ImportJob
+from app.services.import_jobs import JobProgress
+
+class ImportJobTestCase(unittest.TestCase):
+    def test_progress_throttled(self):
+        """测试进度更新按步骤和时间间隔节流"""
+        with mock.patch('app.services.import_jobs.update_job') as update_job:
+            progress = JobProgress('job', interval=60)
+            progress(0, '正在读取Excel文件')
+            progress(10)
+            progress(20)
+            progress(80, '正在保存分区表')
+            progress(120)
+        self.assertEqual(update_job.call_args_list, [
+            mock.call('job', progress=0, message='正在读取Excel文件'),
+            mock.call('job', progress=80, message='正在保存分区表'),
+        ])
+
+    def test_progress_rows(self):
+        """测试按行数换算进度，总行数未知时不更新"""
+        with mock.patch('app.services.import_jobs.update_job') as update_job:
+            progress = JobProgress('job', interval=0)
+            progress.rows(50, None, 0, 80)
+            progress.rows(50, 200, 0, 80)
+            progress.rows(500, 200, 0, 80)
+        self.assertEqual(update_job.call_args_list, [mock.call('job', progress=20), mock.call('job', progress=80)])
+
+    def test_progress_write_failure_ignored(self):
+        """测试进度写入失败不影响导入"""
+        with mock.patch('app.services.import_jobs.update_job', side_effect=RuntimeError('db')):
+            progress = JobProgress('job')
+            progress(30, '正在读取Excel文件')
+        self.assertEqual(progress.percent, 30)
+
+    def test_job_stale_and_dict(self):
+        """测试未结束任务的超时判断和结果解析"""
+        job = ImportJob(id='a' * 32, kind='receiver', status=ImportJob.RUNNING, progress=40,
+                        updated_at=datetime.now() - timedelta(seconds=120))
+        self.assertTrue(job.is_stale(60))
+        self.assertFalse(job.is_stale(600))
+        job.status = ImportJob.SUCCEEDED
+        job.result = json.dumps({'message': '导入成功', 'data': {'id': 1}}, ensure_ascii=False)
+        self.assertFalse(job.is_stale(60))
+        self.assertEqual(job.to_dict()['result']['data'], {'id': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
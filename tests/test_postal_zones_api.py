@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask
+from app.extensions import db, init_extensions
+from app.models import PostalZone, User
+from app.routes.api import bp as api_bp
+from app.services.zone_lookup import invalidate_remote_index, invalidate_zone_indexes
+
+class PostalZonesApiTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        self.zone_array_dir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config.update(
+            TESTING=True,
+            SECRET_KEY='test',
+            SQLALCHEMY_DATABASE_URI='sqlite://',
+            ZONE_ARRAY_DIR=self.zone_array_dir
+        )
+        init_extensions(self.app)
+        self.app.register_blueprint(api_bp)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        invalidate_zone_indexes()
+        invalidate_remote_index()
+
+        user = User(username='john', email='john@example.com', role='user')
+        user.set_password('cat')
+        chart = [{'Destination ZIP': '005-299', 'Zone': '3'},
+                 {'Destination ZIP': '300-699', 'Zone': 'Zone5'},
+                 {'Destination ZIP': '700-999', 'Zone': 'N/A'}]
+        self.receiver = PostalZone(start_code='91710', type='receiver', excel_content=json.dumps(chart))
+        self.remote = PostalZone(start_code='remote', type='remote', excel_content=json.dumps({
+            'headers': {
+                'first_row': ['DAS', 'DAS_EXT'],
+                'second_row': {'DAS': 'Destination ZIP Codes', 'DAS_EXT': 'Destination ZIP Codes'}
+            },
+            'data': [{'DAS': '35004', 'DAS_EXT': '35005'}, {'DAS': '36001', 'DAS_EXT': ''}]
+        }))
+        db.session.add_all([user, self.receiver, self.remote])
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    def tearDown(self):
+        """测试后的清理工作"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.zone_array_dir)
+
+    def test_resolve(self):
+        """测试批量解析区域和偏远地区类型，单个邮编对失败不影响其他邮编对"""
+        pairs = [{'origin': '91710', 'destination': '10001'}, ['91710', '35005'],
+                 ['00000', '10001'], ['91710', '80000']]
+        response = self.client.post('/api/postal-zones/resolve', json={'pairs': pairs})
+        self.assertEqual(response.status_code, 200)
+        items = response.get_json()['data']
+        self.assertEqual((items[0]['zone'], items[0]['is_remote']), (3, False))
+        self.assertEqual((items[1]['zone'], items[1]['remote_type']), (5, 'DAS_EXT'))
+        self.assertEqual(items[2]['error'], '起始邮编不存在，请检查后重试')
+        self.assertTrue(items[3]['error'].startswith('分区表中的区域值无效'))
+        # 查询时不生成分区数组文件，由导入分区表时生成
+        self.assertEqual(os.listdir(self.zone_array_dir), [])
+
+    def test_resolve_validation(self):
+        """测试批量解析的请求格式和数量上限"""
+        response = self.client.post('/api/postal-zones/resolve', json={'pairs': []})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/postal-zones/resolve', json={'pairs': [['91710']]})
+        self.assertEqual(response.get_json()['message'], '第1个邮编对格式错误')
+        with mock.patch('app.routes.api.postal_zones.MAX_RESOLVE_PAIRS', 2):
+            response = self.client.post('/api/postal-zones/resolve', json={'pairs': [['91710', '10001']] * 3})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['message'], '单次最多解析2个邮编对')
+            response = self.client.post('/api/postal-zones/resolve', json={'pairs': [['91710', '10001']] * 2})
+            self.assertEqual(response.status_code, 200)
+
+    def test_receiver_details_paging(self):
+        """测试收件邮编详情分页、前缀筛选和超出末尾的页"""
+        url = f'/api/postal-zones/receiver/{self.receiver.id}/details'
+        data = self.client.get(url, query_string={'offset': 1, 'limit': 1}).get_json()
+        self.assertEqual((data['total'], data['offset'], data['limit']), (3, 1, 1))
+        self.assertEqual(data['data'], [{'Destination ZIP': '300-699', 'Zone': 'Zone5'}])
+        data = self.client.get(url, query_string={'offset': 10}).get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual((data['data'], data['total']), ([], 3))
+        data = self.client.get(url, query_string={'prefix': '7'}).get_json()
+        self.assertEqual([row['Zone'] for row in data['data']], ['N/A'])
+
+    def test_remote_details_headers(self):
+        """测试偏远邮编详情每一页都返回表头，分页只计算数据行"""
+        url = f'/api/postal-zones/remote/{self.remote.id}/details'
+        data = self.client.get(url, query_string={'offset': 1, 'limit': 1}).get_json()
+        self.assertEqual(data['headers']['first_row'], ['DAS', 'DAS_EXT'])
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['data'], [{'DAS': '36001', 'DAS_EXT': ''}])
+        data = self.client.get(url, query_string={'prefix': '35005'}).get_json()
+        self.assertEqual(data['data'], [{'DAS': '35004', 'DAS_EXT': '35005'}])
+
+    def test_details_page_args_validation(self):
+        """测试详情分页参数的边界"""
+        url = f'/api/postal-zones/receiver/{self.receiver.id}/details'
+        for args in ({'limit': 0}, {'limit': 1001}, {'offset': -1}, {'prefix': '9a'}):
+            response = self.client.get(url, query_string=args)
+            self.assertEqual(response.status_code, 400, args)
+            self.assertFalse(response.get_json()['success'])
+        self.assertEqual(self.client.get(url, query_string={'limit': 1000}).status_code, 200)
+        # 不是整数的 limit 使用默认每页行数
+        self.assertEqual(self.client.get(url, query_string={'limit': 'abc'}).get_json()['limit'], 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from datetime import date, datetime
+from app.services.cache import CacheService, LRUStore
+from app.services.quote_cache import quote_cache_key
+from app.services.surcharge_rules import SurchargeRules
+from app.services.tariff_snapshot import TariffSnapshot
+
+class _Product:
+    id = 1
+    updated_at = datetime(2026, 1, 1)
+
+class QuoteCacheTestCase(unittest.TestCase):
+    def test_lru_store(self):
+        """测试LRU存储的淘汰和过期"""
+        store = LRUStore(maxsize=2)
+        store.set('a', 1)
+        store.set('b', 2)
+        self.assertEqual(store.get('a'), 1)
+        store.set('c', 3)
+        self.assertIsNone(store.get('b'))
+        store.set('d', 4, timeout=-1)
+        self.assertIsNone(store.get('d'))
+        self.assertEqual(store.get('c'), 3)
+
+    def test_cached_calculation_is_copy(self):
+        """测试缓存的计算结果不受调用方修改影响"""
+        cache = CacheService(LRUStore())
+        result = {'zone': 2, 'total_amount': 12.5}
+        cache.cache_calculation('key', result)
+        cache.get_cached_calculation('key')['product'] = 'x'
+        self.assertEqual(cache.get_cached_calculation('key'), result)
+
+    def test_quote_cache_key(self):
+        """测试报价缓存键包含燃油费率和计费日期"""
+        rules = SurchargeRules([])
+        product = _Product()
+        snapshot = TariffSnapshot(rules, date(2026, 1, 1), fuel_rate=10, fuel_rate_id=1)
+        key = quote_cache_key(product, snapshot, 2, 5, 10, 8, 6)
+        self.assertEqual(key, quote_cache_key(product, snapshot, 2, 5, 10, 8, 6))
+        self.assertNotEqual(key, quote_cache_key(product, snapshot, 3, 5, 10, 8, 6))
+        self.assertNotEqual(key, quote_cache_key(
+            product, TariffSnapshot(rules, date(2026, 1, 1), fuel_rate=12, fuel_rate_id=2), 2, 5, 10, 8, 6))
+        self.assertNotEqual(key, quote_cache_key(
+            product, TariffSnapshot(rules, date(2026, 1, 2), fuel_rate=10, fuel_rate_id=1), 2, 5, 10, 8, 6))
+
+    def test_quote_cache_key_fuel_rate_edited(self):
+        """测试原地修改燃油费率（ID不变）后缓存键改变"""
+        rules = SurchargeRules([])
+        product = _Product()
+        as_of = date(2026, 1, 1)
+        snapshot = TariffSnapshot(rules, as_of, 10, 1, datetime(2026, 1, 1, 8))
+        key = quote_cache_key(product, snapshot, 2, 5, 10, 8, 6)
+        self.assertNotEqual(key, quote_cache_key(
+            product, TariffSnapshot(rules, as_of, 12, 1, datetime(2026, 1, 1, 8)), 2, 5, 10, 8, 6))
+        self.assertNotEqual(key, quote_cache_key(
+            product, TariffSnapshot(rules, as_of, 10, 1, datetime(2026, 1, 1, 9)), 2, 5, 10, 8, 6))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from app.services.rate_card import RateCard, parse_zone_number
+from app.utils.exceptions import ValidationError
+
+class RateCardTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        # 故意打乱顺序，并混用 '2' 与 'Zone3' 两种区域写法
+        self.card = RateCard([
+            {'weight': 10, '2': '20.00', 'Zone3': 25},
+            {'weight': 1, '2': '5.00', 'Zone3': 6},
+            {'weight': 5, '2': '12.00', 'Zone3': 14},
+            {'weight': 90, '2': '150.00', 'Zone3': 160},
+        ])
+
+    def test_parse_zone_number(self):
+        """测试区域编号解析"""
+        self.assertEqual(parse_zone_number('2'), 2)
+        self.assertEqual(parse_zone_number('Zone8'), 8)
+        self.assertEqual(parse_zone_number('zone 5'), 5)
+        self.assertEqual(parse_zone_number(4), 4)
+        self.assertIsNone(parse_zone_number('weight'))
+
+    def test_lookup_exact_and_next_tier(self):
+        """测试精确匹配和下一档位"""
+        self.assertEqual(self.card.lookup(2, 5), 12.0)
+        self.assertEqual(self.card.lookup(2, 6), 20.0)
+        self.assertEqual(self.card.lookup('3', 1), 6.0)
+        self.assertEqual(self.card.lookup(3, 90), 160.0)
+
+    def test_lookup_above_max_uses_highest_tier(self):
+        """测试超出费率表时使用最高档位"""
+        self.assertEqual(self.card.lookup(2, 120), 150.0)
+
+    def test_interpolate(self):
+        """测试线性插值"""
+        self.assertEqual(self.card.interpolate(2, 0.5), 5.0)
+        self.assertEqual(self.card.interpolate(2, 7.5), 16.0)
+        self.assertEqual(self.card.interpolate(2, 10), 20.0)
+        self.assertEqual(self.card.interpolate(2, 200), 150.0)
+
+    def test_missing_zone(self):
+        """测试区域不存在"""
+        with self.assertRaises(ValidationError):
+            self.card.lookup(8, 5)
+
+    def test_empty_card(self):
+        """测试空费率表"""
+        self.assertFalse(RateCard('[]'))
+        self.assertTrue(self.card)
@@ -0,0 +1,91 @@
+import random
+import unittest
+from datetime import date, timedelta
+from app.services.surcharge_rules import PssSchedule, SurchargeRules
+
+class SurchargeRulesTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        self.rules = SurchargeRules([
+            {
+                'title': '1. 额外处理费(Additional Handling Surcharge)',
+                'pss_periods': [{'start_date': '2024-01-01', 'end_date': '2024-12-31', 'amount': '2.5'}],
+                'items': [
+                    {'name': 'weight: 50磅＜实际重量＜150磅', 'fees': {'2': '30.00', 'Zone3': '32'}},
+                    {'name': '第二长边＞30英寸', 'fees': {'2': '20.00', '3': ''}},
+                ]
+            },
+            {
+                'title': '4. 住宅地址附加费(Residential Surcharge)',
+                'items': [
+                    {'name': 'FedEx Home Delivery', 'fees': {'2': '5.00'}},
+                    {'name': 'FedEx Commercial Ground', 'fees': {'2': '6.00'}},
+                ]
+            },
+            {
+                'title': '增值服务费项目',
+                'items': [{
+                    'name': '5. 不可发包裹(Unauthorized)',
+                    'items': [{'name': 'a) 实重＞150磅', 'fees': {'2': '1000'}}]
+                }]
+            },
+        ])
+
+    def test_handling_charges(self):
+        """测试额外处理费的条件匹配和区域费用"""
+        charge = self.rules.handling.match({'weight': 60, 'length': 20, 'width': 10, 'length_girth': 80})
+        self.assertEqual(charge.fee(2), 30.0)
+        self.assertEqual(charge.fee('Zone3'), 32.0)
+        self.assertIsNone(self.rules.handling.charge_for('width').fee(3))
+        self.assertIsNone(self.rules.handling.match({'weight': 150, 'length': 20, 'width': 10, 'length_girth': 80}))
+
+    def test_residential_by_weight(self):
+        """测试住宅地址附加费按重量选择服务类型"""
+        self.assertEqual(self.rules.residential.match({'weight': 70}).reason, 'Home Delivery')
+        self.assertEqual(self.rules.residential.match({'weight': 70.5}).reason, 'Commercial Ground')
+
+    def test_pss_amount(self):
+        """测试PSS金额按日期生效"""
+        self.assertEqual(self.rules.handling.pss_amount(date(2024, 6, 1)), 2.5)
+        self.assertEqual(self.rules.handling.pss_amount(date(2025, 1, 1)), 0.0)
+
+    def test_pss_schedule_first_match(self):
+        """测试重叠PSS期间按列表顺序取第一个生效期间"""
+        rng = random.Random(7)
+        origin = date(2024, 1, 1)
+        periods = []
+        for _ in range(8):
+            start = origin + timedelta(days=rng.randint(0, 300))
+            end = start + timedelta(days=rng.randint(-5, 90))
+            periods.append({'start_date': start.isoformat(), 'end_date': end.isoformat(), 'amount': str(rng.randint(1, 9))})
+        periods.append({'start_date': 'bad', 'end_date': '2024-12-31', 'amount': '100'})
+        schedule = PssSchedule(periods)
+
+        for offset in range(-10, 420):
+            day = origin + timedelta(days=offset)
+            expected = next((float(p['amount']) for p in periods[:-1]
+                             if date.fromisoformat(p['start_date']) <= day <= date.fromisoformat(p['end_date'])), 0.0)
+            self.assertEqual(schedule.amount(day), expected, day)
+
+    def test_category_title_prefix(self):
+        """测试住宅地址和偏远地区附加费按标题前缀匹配，标题中提到这些名称的其他类别不会被当作该附加费"""
+        rules = SurchargeRules([
+            {'title': '6. 住宅地址附加费减免(Residential Surcharge Waiver)',
+             'items': [{'name': 'FedEx Home Delivery', 'fees': {'2': '-5.00'}}]},
+            {'title': '7. 偏远地区附加费说明', 'items': []},
+            {'title': '4. 住宅地址附加费(Residential Surcharge)',
+             'items': [{'name': 'FedEx Home Delivery', 'fees': {'2': '5.00'}}]},
+            {'title': '5. 偏远地区附加费(Delivery Area Surcharge)', 'items': []},
+        ])
+        self.assertEqual(rules.residential.title, '4. 住宅地址附加费(Residential Surcharge)')
+        self.assertEqual(rules.residential.match({'weight': 10}).fee(2), 5.0)
+        self.assertEqual(rules.remote.title, '5. 偏远地区附加费(Delivery Area Surcharge)')
+
+    def test_missing_categories(self):
+        """测试缺失的附加费类别"""
+        self.assertEqual(self.rules.unauthorized.charge_for('weight').fee(2), 1000.0)
+        self.assertIsNone(self.rules.remote)
+        self.assertIsNone(self.rules.fuel)
+
+if __name__ == '__main__':
+    unittest.main()
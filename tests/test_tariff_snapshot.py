@@ -0,0 +1,68 @@
+import unittest
+from datetime import date, datetime
+from unittest import mock
+from app.services.cache import LRUCache
+from app.services.surcharge_rules import SurchargeRules
+from app.services.tariff_snapshot import TariffSnapshot, get_tariff_snapshot, invalidate_tariff_snapshots, parse_as_of
+from app.utils.exceptions import ValidationError
+
+class TariffSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        """测试前的准备工作"""
+        self.rules = SurchargeRules([{
+            'title': '4. 住宅地址附加费(Residential Surcharge)',
+            'pss_periods': [{'start_date': '2024-10-01', 'end_date': '2025-01-15', 'amount': '1.5'}],
+            'items': [{'name': 'FedEx Home Delivery', 'fees': {'2': '5.00'}}]
+        }])
+
+    def test_snapshot_pss_by_date(self):
+        """测试快照冻结计费日期的PSS金额"""
+        peak = TariffSnapshot(self.rules, date(2024, 12, 1), fuel_rate=12.5)
+        off_peak = TariffSnapshot(self.rules, date(2025, 3, 1))
+        self.assertEqual(peak.pss_amount(self.rules.residential), 1.5)
+        self.assertEqual(off_peak.pss_amount(self.rules.residential), 0.0)
+        self.assertEqual(peak.pss_amount(self.rules.handling), 0.0)
+        self.assertEqual(peak.fuel_rate, 12.5)
+
+    def test_parse_as_of(self):
+        """测试计费日期解析"""
+        self.assertEqual(parse_as_of('2024-12-01'), date(2024, 12, 1))
+        self.assertEqual(parse_as_of(None), date.today())
+        with self.assertRaises(ValidationError):
+            parse_as_of('12/01/2024')
+
+    def test_snapshot_rebuilt_when_fuel_rates_change(self):
+        """测试燃油费率版本变化时重新创建快照，不依赖本进程的失效调用"""
+        class _Product:
+            id = 1
+            updated_at = datetime(2026, 1, 1)
+
+        class _FuelRate:
+            id = 1
+            rate = 10.0
+            updated_at = datetime(2026, 1, 1)
+
+        invalidate_tariff_snapshots()
+        with mock.patch('app.services.tariff_snapshot.get_surcharge_rules', return_value=self.rules), \
+                mock.patch('app.services.tariff_snapshot.find_fuel_rate', return_value=_FuelRate()), \
+                mock.patch('app.services.tariff_snapshot.fuel_rate_version') as version:
+            version.return_value = (datetime(2026, 1, 1), 1)
+            first = get_tariff_snapshot(_Product(), '2026-01-05')
+            self.assertIs(get_tariff_snapshot(_Product(), '2026-01-05'), first)
+            version.return_value = (datetime(2026, 1, 2), 1)
+            self.assertIsNot(get_tariff_snapshot(_Product(), '2026-01-05'), first)
+        invalidate_tariff_snapshots()
+
+    def test_lru_eviction(self):
+        """测试LRU缓存淘汰最久未使用的条目"""
+        cache = LRUCache(maxsize=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 0)
+        cache.get('c', lambda: 3)
+        self.assertEqual(cache.get('a', lambda: 0), 1)
+        self.assertEqual(cache.get('b', lambda: 20), 20)
+        self.assertEqual(len(cache), 2)
+
+if __name__ == '__main__':
+    unittest.main()
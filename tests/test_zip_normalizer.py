@@ -0,0 +1,48 @@
+import unittest
+from app.services.chart_codec import ChartWriter, decode_chart
+from app.services.zip_normalizer import ZipNormalizer, detect_columns, keyword_zip_columns
+
+class ZipNormalizerTestCase(unittest.TestCase):
+    def test_detect_columns(self):
+        """测试按列名映射识别列，每个目标列取第一个匹配的列"""
+        mappings = {'Destination ZIP': ['Destination ZIP', 'zip'], 'Zone': ['Zone', '分区']}
+        self.assertEqual(detect_columns(['ZIP ', '分区', 'Zone'], mappings, ignore_case=True),
+                         {'ZIP ': 'Destination ZIP', '分区': 'Zone'})
+        self.assertEqual(detect_columns(['ZIP ', 'Zone'], mappings), {'Zone': 'Zone'})
+        self.assertEqual(keyword_zip_columns(['ZIP', 'Note', 'x'], {'x': 'col2'}), ['ZIP', 'col2'])
+
+    def test_normalize(self):
+        """测试去除空白、数字邮编补零、规范化邮编范围和识别空列"""
+        normalizer = ZipNormalizer(
+            ['ZIP', 'Zone', 'Empty', 'Unnamed: 3'],
+            renames={'ZIP': 'col1'},
+            exclude=['Unnamed: 3'],
+            zip_columns=['col1'],
+            pad_max_length=5,
+            range_columns=['col1']
+        )
+        writer = ChartWriter()
+        normalizer.write([
+            [[' 501 ', ' 2 ', '', 'x'], ['005 - 299', '3', '', 'y']],
+            [['123456', 'Zone4', ' ', 'z'], ['ab1', '', '', '']],
+        ], writer)
+        self.assertEqual(normalizer.empty_columns(), ['Empty'])
+        writer.drop_columns(normalizer.empty_columns())
+        self.assertEqual(decode_chart(writer.finish()), [
+            {'col1': '00501', 'Zone': '2'},
+            {'col1': '005-299', 'Zone': '3'},
+            {'col1': '123456', 'Zone': 'Zone4'},
+            {'col1': 'ab1', 'Zone': ''},
+        ])
+
+    def test_raw_values(self):
+        """测试不去除空白时保留非文本单元格"""
+        normalizer = ZipNormalizer(['Destination ZIP', 'Zone'], strip=False, range_columns=['Destination ZIP'])
+        frame = normalizer.normalize([[' 005 - 299 ', 2], [501, None]])
+        self.assertEqual(frame['Destination ZIP'].tolist(), ['005-299', 501])
+        self.assertEqual(frame['Zone'].tolist(), [2, None])
+        frame = normalizer.normalize([[501, None], [None, 3]])
+        self.assertEqual(frame['Destination ZIP'].tolist(), [501, None])
+
+if __name__ == '__main__':
+    unittest.main()
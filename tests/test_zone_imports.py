@@ -0,0 +1,52 @@
+import io
+import os
+import pickle
+import tempfile
+import unittest
+import zipfile
+from app.services.chart_codec import decode_chart
+from app.services.zone_imports import archive_members, read_zone_excel
+from app.utils.exceptions import ValidationError
+
+def make_archive(names):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as archive:
+        for name in names:
+            archive.writestr(name, 'Destination ZIP,Zone\n005-299,3\n')
+    buf.seek(0)
+    return zipfile.ZipFile(buf)
+
+class ZoneImportsTestCase(unittest.TestCase):
+    def test_archive_members(self):
+        """测试从压缩包文件名识别起始邮编，忽略目录、隐藏文件和不支持的文件"""
+        archive = make_archive(['charts/91710.xlsx', 'FedEx_90001_2025.csv', '10001.parquet', 'README.txt',
+                                '__MACOSX/._91710.xlsx', 'charts/.hidden_12345.csv'])
+        self.assertEqual([(origin, info.filename) for origin, info in archive_members(archive)], [
+            ('10001', '10001.parquet'), ('90001', 'FedEx_90001_2025.csv'), ('91710', 'charts/91710.xlsx')])
+
+    def test_archive_members_invalid(self):
+        """测试文件名没有起始邮编、起始邮编重复和没有分区表文件时报错"""
+        for names, message in [(['91710.csv', 'chart.csv'], 'chart.csv'),
+                               (['91710.csv', '917101.csv'], '917101.csv'),
+                               (['a/91710.csv', 'b/91710.xlsx'], '91710'),
+                               (['README.txt'], '没有分区表文件')]:
+            with self.assertRaises(ValidationError) as context:
+                archive_members(make_archive(names))
+            self.assertIn(message, context.exception.message)
+
+    def test_read_zone_excel(self):
+        """测试读取分区表文件，结果可以在进程间传递"""
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write('Destination ZIP,Zone,Note\n 005 - 299 ,3,\n501,4,\n')
+        try:
+            excel_content, count = pickle.loads(pickle.dumps(read_zone_excel(path)))
+        finally:
+            os.remove(path)
+        self.assertEqual(count, 2)
+        self.assertEqual(decode_chart(excel_content), [{'Destination ZIP': '005-299', 'Zone': '3'},
+                                                       {'Destination ZIP': '00501', 'Zone': '4'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import json
+import random
+import tempfile
+import unittest
+from datetime import datetime
+from app.services.zone_arrays import compile_zone_array, open_zone_array, write_zone_array
+from app.services.zone_lookup import (ZoneChartDiff, ZoneIndex, build_remote_index, parse_remote_rows, parse_zone_chart,
+                                      zip5_bounds, zone_range_rows)
+from app.utils.exceptions import ValidationError
+
+class ZoneLookupTestCase(unittest.TestCase):
+    def test_parse_zone_chart(self):
+        """测试分区表解析"""
+        ranges = parse_zone_chart('[{"Destination ZIP": "005-299", "Zone": "3"}, {"Destination ZIP": "300", "Zone": "4"}]')
+        self.assertEqual(ranges, [('005', '299', '3')])
+
+    def test_zone_index_matches_scan(self):
+        """测试分区索引与逐行扫描的结果一致"""
+        rng = random.Random(11)
+        for overlap in (False, True):
+            ranges = []
+            end = 0
+            for _ in range(60):
+                start = end + (rng.randint(1, 5) if not overlap else rng.randint(-8, 5))
+                end = start + rng.randint(0, 10)
+                ranges.append((str(max(start, 0)).zfill(3), str(max(end, 0)).zfill(3), str(rng.randint(2, 8))))
+            rng.shuffle(ranges)
+            index = ZoneIndex(ranges)
+            self.assertEqual(index.overlapping, overlap)
+            for code in range(0, 700, 3):
+                for to_postal in (str(code).zfill(3), str(code * 10 + 3).zfill(5)):
+                    expected = next((int(zone) for s, e, zone in ranges if s <= to_postal <= e), None)
+                    self.assertEqual(index.find(to_postal), expected, to_postal)
+
+    def test_zone_array_matches_index(self):
+        """测试mmap分区数组与区间索引的结果一致"""
+        class _Postal:
+            id = 1
+            start_code = '91710'
+            updated_at = datetime(2026, 1, 1)
+
+        index = ZoneIndex(parse_zone_chart([
+            {'Destination ZIP': '005-299', 'Zone': '3'},
+            {'Destination ZIP': '30000-69999', 'Zone': 5},
+            {'Destination ZIP': '700-899', 'Zone': 'Zone8'},
+            {'Destination ZIP': '900-999', 'Zone': 'N/A'},
+        ]))
+        with tempfile.TemporaryDirectory() as directory:
+            write_zone_array(_Postal(), index, directory)
+            self.assertIsNone(open_zone_array('91710', 1, datetime(2026, 1, 2), directory))
+            zone_array = open_zone_array('91710', 1, _Postal.updated_at, directory)
+            for code in range(0, 90000, 37):
+                to_postal = f'{code:05d}'
+                self.assertEqual(zone_array.find(to_postal), index.find(to_postal), to_postal)
+            self.assertEqual(zone_array.find('29899'), 3)
+            self.assertEqual(zone_array.find('75000'), 8)
+            self.assertIsNone(zone_array.find('00499'))
+            for lookup in (index, zone_array):
+                with self.assertRaises(ValidationError):
+                    lookup.find('95000')
+
+    def test_zone_array_overlapping_ranges(self):
+        """测试范围重叠时分区数组与逐行扫描一致，表中顺序靠前的范围生效"""
+        rng = random.Random(3)
+        ranges = []
+        for i in range(300):
+            start = rng.randint(0, 998)
+            width = rng.choice([3, 5])
+            ranges.append((str(start).zfill(3) if width == 3 else str(start * 100).zfill(5),
+                           str(start + rng.randint(0, 20)).zfill(3) if width == 3
+                           else str(start * 100 + rng.randint(0, 3000)).zfill(5),
+                           str(2 + i % 7)))
+        ranges.append(('A00', 'B99', '9'))
+        index = ZoneIndex(ranges)
+        self.assertTrue(index.overlapping)
+        codes, labels = compile_zone_array(index)
+        for code in range(0, 100000, 7):
+            to_postal = f'{code:05d}'
+            matched = index.match(to_postal)
+            self.assertEqual(labels[codes[code] - 1] if codes[code] else None,
+                             matched[2] if matched else None, to_postal)
+
+    def test_zone_range_rows(self):
+        """测试分区范围表的行保存整数区域，无效的区域值保存为 NULL"""
+        class _Postal:
+            id = 1
+            start_code = '91710'
+
+        rows = zone_range_rows(_Postal(), [('005', '299', 'Zone3'), ('300', '399', 'N/A'), ('A00', 'A99', '4')])
+        self.assertEqual([(row['dest_start'], row['dest_end'], row['zone']) for row in rows],
+                         [(500, 29899, 3), (30000, 39899, None)])
+
+    def test_zip5_bounds(self):
+        """测试字符串比较的邮编范围换算为5位邮编整数区间"""
+        rng = random.Random(5)
+        zips = [f'{code:05d}' for code in range(0, 100000, 97)] + ['00000', '99999', '29899', '29900']
+        for _ in range(200):
+            start = str(rng.randint(0, 10 ** rng.randint(2, 6) - 1)).zfill(rng.randint(2, 6))
+            end = str(rng.randint(0, 10 ** rng.randint(2, 6) - 1)).zfill(rng.randint(2, 6))
+            bounds = zip5_bounds(start, end)
+            for to_postal in zips:
+                expected = start <= to_postal <= end
+                actual = bounds is not None and bounds[0] <= int(to_postal) <= bounds[1]
+                self.assertEqual(actual, expected, (start, end, to_postal))
+        self.assertEqual(zip5_bounds('005', '299'), (500, 29899))
+        self.assertIsNone(zip5_bounds('A01', '299'))
+
+    def test_zone_chart_diff(self):
+        """测试分区表差异，并按差异增量编译的分区数组与完整编译一致"""
+        old = [{'Destination ZIP': f'{i:03d}-{i + 4:03d}', 'Zone': 2 + i % 7} for i in range(5, 1000, 5)]
+        new = [dict(entry) for entry in old]
+        new[3]['Zone'] = 9
+        new[10]['Destination ZIP'] = '055-057'
+        new.insert(11, {'Destination ZIP': '058-059', 'Zone': 8})
+        del new[50]
+
+        self.assertFalse(ZoneChartDiff(json.dumps(old), json.dumps(old)))
+        diff = ZoneChartDiff(json.dumps(old), json.dumps(new))
+        self.assertTrue(diff.incremental)
+        self.assertEqual([(start, end) for start, end, _ in diff.added], [('055', '057'), ('058', '059')])
+        self.assertEqual([(start, end) for start, end, _ in diff.removed], [('055', '059'), ('250', '254')])
+        self.assertEqual(diff.changed, [('020', '024', 8, 9)])
+        self.assertEqual(diff.unchanged, 196)
+        self.assertEqual(diff.to_dict()['changed'], 1)
+
+        base = compile_zone_array(ZoneIndex(parse_zone_chart(old)))
+        patched = compile_zone_array(diff.new_index, base, diff.intervals())
+        full = compile_zone_array(diff.new_index)
+        for code in range(100000):
+            self.assertEqual(patched[0][code] and patched[1][patched[0][code] - 1],
+                             full[0][code] and full[1][full[0][code] - 1], code)
+
+        overlapping = new + [{'Destination ZIP': '100-200', 'Zone': 4}]
+        self.assertFalse(ZoneChartDiff(json.dumps(old), json.dumps(overlapping)).incremental)
+
+    def test_remote_index_first_match(self):
+        """测试偏远邮编索引：先出现的行生效，同一行中DAS列优先"""
+        rows = parse_remote_rows({'headers': {}, 'data': [
+            {'DAS_EXT': '35004', 'DAS': '35004'},
+            {'DAS': '', 'DAS_Remote': '1001', 'DAS_Hawaii': '96701'},
+            {'DAS': '96701'},
+        ]})
+        index = build_remote_index(rows)
+        self.assertEqual(index['35004'], 'DAS')
+        self.assertEqual(index['01001'], 'DAS_Remote')
+        self.assertEqual(index['96701'], 'DAS_Hawaii')
+        self.assertNotIn('00000', index)
+
+if __name__ == '__main__':
+    unittest.main()